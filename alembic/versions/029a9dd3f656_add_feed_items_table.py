@@ -0,0 +1,68 @@
+"""add feed_items table
+
+Revision ID: 029a9dd3f656
+Revises: 2cce9d7c2944
+Create Date: 2026-10-17 16:20:37.551902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '029a9dd3f656'
+down_revision: Union[str, Sequence[str], None] = '2cce9d7c2944'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Backfill: tipo -> (tabela, filtro do feed, campos do cartão)
+FEED_SOURCES = {
+    "service": ("services", "status = 'Ativo'", (
+        "id", "title", "description", "price", "category", "tags", "status", "company_id",
+        "image_url", "views", "leads", "likes", "is_promoted", "created_at",
+    )),
+    "company": ("companies", "true", (
+        "id", "name", "description", "logo_url", "cover_url", "province", "district",
+        "address", "nationality", "website", "email", "whatsapp", "created_at",
+    )),
+    "user": ("users", "is_active", ("id", "full_name", "email", "profile_photo_url", "cover_photo_url", "gender", "created_at")),
+    "portfolio": ("company_portfolios", "true", ("id", "title", "description", "media_url", "link", "company_id", "created_at")),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema: unified feed table, backfilled from the source tables."""
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS feed_items (
+            id SERIAL PRIMARY KEY,
+            type VARCHAR(20) NOT NULL,
+            entity_id INTEGER NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            score DOUBLE PRECISION NOT NULL DEFAULT 0,
+            payload JSONB NOT NULL,
+            updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT timezone('utc', now())
+        );
+        """
+    )
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_feed_items_type_entity ON feed_items (type, entity_id);")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_feed_items_feed ON feed_items (created_at DESC, id DESC);")
+    for kind, (table, where, fields) in FEED_SOURCES.items():
+        payload = ", ".join(f"'{field}', {field}" for field in fields)
+        op.execute(
+            f"""
+            INSERT INTO feed_items (type, entity_id, created_at, payload)
+            SELECT '{kind}', id, coalesce(created_at, timezone('utc', now())), jsonb_build_object({payload})
+            FROM {table} WHERE {where}
+            ORDER BY created_at, id
+            ON CONFLICT (type, entity_id) DO NOTHING;
+            """
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop the unified feed table."""
+    op.execute("DROP TABLE IF EXISTS feed_items;")
@@ -0,0 +1,32 @@
+"""add services company listing index
+
+Revision ID: 192ce675ac2a
+Revises: 632e52e6c55f
+Create Date: 2026-10-17 20:21:44.918305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '192ce675ac2a'
+down_revision: Union[str, Sequence[str], None] = '632e52e6c55f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: composite index for the paginated services of a company."""
+    # Por status, mais recentes primeiro: cada página de /services/company/{id} é uma leitura do índice
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_services_company_status_created "
+        "ON services (company_id, status, created_at DESC, id DESC);"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop the company listing index."""
+    op.execute("DROP INDEX IF EXISTS ix_services_company_status_created;")
@@ -0,0 +1,41 @@
+"""backfill feed cards
+
+Revision ID: 26dbb91d16cc
+Revises: a5e973bb23a2
+Create Date: 2026-10-18 09:48:20.731954
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '26dbb91d16cc'
+down_revision: Union[str, Sequence[str], None] = 'a5e973bb23a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# CARD_DESCRIPTION_CHARS por omissão; com outro valor, python -m app.rebuild_feed reescreve os cartões
+CARD_DESCRIPTION_CHARS = 200
+
+
+def upgrade() -> None:
+    """Upgrade schema: bring the stored feed cards to the current card format, once."""
+    # Descrições cortadas num excerto, como em search_backend.card_column
+    op.execute(
+        f"""
+        UPDATE feed_items
+        SET payload = jsonb_set(
+            payload, '{{description}}', to_jsonb(left(payload ->> 'description', {CARD_DESCRIPTION_CHARS}) || '…')
+        )
+        WHERE char_length(payload ->> 'description') > {CARD_DESCRIPTION_CHARS};
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema: nothing to undo (the cards keep the current format)."""
+    pass
@@ -0,0 +1,50 @@
+"""add feed timestamps and indexes
+
+Revision ID: 2cce9d7c2944
+Revises: 97ae5bd71398
+Create Date: 2026-10-17 15:02:11.418337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2cce9d7c2944'
+down_revision: Union[str, Sequence[str], None] = '97ae5bd71398'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Índices (created_at DESC, id DESC) de cada fonte do feed, parciais com o filtro do feed
+FEED_INDEXES = {
+    "ix_services_feed": ("services", "WHERE status = 'Ativo'"),
+    "ix_companies_feed": ("companies", ""),
+    "ix_users_feed": ("users", "WHERE is_active"),
+    "ix_company_portfolios_feed": ("company_portfolios", ""),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema: created_at on companies/users and feed ordering indexes."""
+    # Linhas existentes ficam com o instante da migração (o desempate é feito pelo id)
+    for table in ("companies", "users"):
+        op.execute(
+            f"""
+            ALTER TABLE {table}
+            ADD COLUMN IF NOT EXISTS created_at TIMESTAMP WITHOUT TIME ZONE
+            NOT NULL DEFAULT timezone('utc', now());
+            """
+        )
+    for index_name, (table, where) in FEED_INDEXES.items():
+        op.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} (created_at DESC, id DESC) {where};")
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop feed indexes and the added timestamps."""
+    for index_name in FEED_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {index_name};")
+    for table in ("companies", "users"):
+        op.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS created_at;")
@@ -0,0 +1,67 @@
+"""add full-text search vectors
+
+Revision ID: 3dbee33ee07e
+Revises: f742ca1b099b
+Create Date: 2026-10-17 09:12:41.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3dbee33ee07e'
+down_revision: Union[str, Sequence[str], None] = 'f742ca1b099b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SEARCH_VECTORS = {
+    "services": (
+        "setweight(to_tsvector('portuguese', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('portuguese', coalesce(category, '')), 'B') || "
+        "setweight(to_tsvector('portuguese', coalesce(description, '')), 'C')"
+    ),
+    "companies": (
+        "setweight(to_tsvector('portuguese', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('portuguese', coalesce(province, '') || ' ' || coalesce(district, '')), 'B') || "
+        "setweight(to_tsvector('portuguese', coalesce(description, '')), 'C') || "
+        "setweight(to_tsvector('portuguese', coalesce(address, '') || ' ' || coalesce(nationality, '')), 'D')"
+    ),
+    "users": (
+        "setweight(to_tsvector('portuguese', coalesce(full_name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(email, '')), 'B')"
+    ),
+    "company_portfolios": (
+        "setweight(to_tsvector('portuguese', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('portuguese', coalesce(description, '')), 'C')"
+    ),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema: generated tsvector columns + GIN indexes.
+
+    STORED generated columns are computed for every existing row when the
+    column is added, so this also backfills the vectors.
+    """
+    for table, expression in SEARCH_VECTORS.items():
+        op.execute(
+            f"""
+            ALTER TABLE {table}
+            ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS ({expression}) STORED;
+            """
+        )
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING gin (search_vector);"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop search vectors and their indexes."""
+    for table in SEARCH_VECTORS:
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_search_vector;")
+        op.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector;")
@@ -0,0 +1,43 @@
+"""add service tags index and tag stats
+
+Revision ID: 4b1457aacf3b
+Revises: d6cbe3166c04
+Create Date: 2026-10-17 11:26:05.318842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b1457aacf3b'
+down_revision: Union[str, Sequence[str], None] = 'd6cbe3166c04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: GIN index on services.tags + aggregated tag usage view."""
+    op.execute("CREATE INDEX IF NOT EXISTS ix_services_tags ON services USING gin (tags);")
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS service_tag_stats AS
+        SELECT tag, count(*) AS usage_count
+        FROM services, unnest(tags) AS tag
+        WHERE status = 'Ativo'
+        GROUP BY tag;
+        """
+    )
+    # Unique index required by REFRESH MATERIALIZED VIEW CONCURRENTLY
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_service_tag_stats_tag ON service_tag_stats (tag);")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_service_tag_stats_usage ON service_tag_stats (usage_count DESC, tag);"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop tag stats view and tags index."""
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS service_tag_stats;")
+    op.execute("DROP INDEX IF EXISTS ix_services_tags;")
@@ -0,0 +1,140 @@
+"""add row counts
+
+Revision ID: 4f752312c41d
+Revises: ec2e1ce810fb
+Create Date: 2026-10-17 19:48:02.370914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f752312c41d'
+down_revision: Union[str, Sequence[str], None] = 'ec2e1ce810fb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Tabelas com total exato em row_counts (o contador tem o nome da tabela)
+COUNTED_TABLES = ("services", "companies", "users", "company_portfolios")
+
+
+def upgrade() -> None:
+    """Upgrade schema: exact row counters kept by statement-level triggers."""
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS row_counts (
+            name VARCHAR(50) PRIMARY KEY,
+            value BIGINT NOT NULL DEFAULT 0
+        );
+        """
+    )
+    # Um UPDATE do contador por instrução (não por linha), a partir das transition tables
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION f_row_counts() RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            delta BIGINT;
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                SELECT count(*) INTO delta FROM new_rows;
+            ELSIF TG_OP = 'DELETE' THEN
+                SELECT -count(*) INTO delta FROM old_rows;
+            ELSE
+                UPDATE row_counts SET value = 0 WHERE name = TG_TABLE_NAME OR name LIKE TG_TABLE_NAME || ':%';
+                RETURN NULL;
+            END IF;
+            IF delta <> 0 THEN
+                UPDATE row_counts SET value = value + delta WHERE name = TG_TABLE_NAME;
+            END IF;
+            RETURN NULL;
+        END $$;
+        """
+    )
+    # Serviços ativos: também mudam com UPDATE do status
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION f_row_counts_services_active() RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            added BIGINT := 0;
+            removed BIGINT := 0;
+        BEGIN
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                SELECT count(*) INTO added FROM new_rows WHERE status = 'Ativo';
+            END IF;
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                SELECT count(*) INTO removed FROM old_rows WHERE status = 'Ativo';
+            END IF;
+            IF added <> removed THEN
+                UPDATE row_counts SET value = value + added - removed WHERE name = 'services:active';
+            END IF;
+            RETURN NULL;
+        END $$;
+        """
+    )
+    for table in COUNTED_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS tr_{table}_count_insert ON {table};")
+        op.execute(
+            f"""
+            CREATE TRIGGER tr_{table}_count_insert AFTER INSERT ON {table}
+            REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION f_row_counts();
+            """
+        )
+        op.execute(f"DROP TRIGGER IF EXISTS tr_{table}_count_delete ON {table};")
+        op.execute(
+            f"""
+            CREATE TRIGGER tr_{table}_count_delete AFTER DELETE ON {table}
+            REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION f_row_counts();
+            """
+        )
+        op.execute(f"DROP TRIGGER IF EXISTS tr_{table}_count_truncate ON {table};")
+        op.execute(
+            f"""
+            CREATE TRIGGER tr_{table}_count_truncate AFTER TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION f_row_counts();
+            """
+        )
+    for event, referencing in (
+        ("INSERT", "NEW TABLE AS new_rows"),
+        ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+        ("DELETE", "OLD TABLE AS old_rows"),
+    ):
+        name = f"tr_services_active_count_{event.lower()}"
+        op.execute(f"DROP TRIGGER IF EXISTS {name} ON services;")
+        op.execute(
+            f"""
+            CREATE TRIGGER {name} AFTER {event} ON services
+            REFERENCING {referencing} FOR EACH STATEMENT EXECUTE FUNCTION f_row_counts_services_active();
+            """
+        )
+
+    # Valores iniciais, com as tabelas bloqueadas para escrita durante a contagem
+    op.execute(f"LOCK TABLE {', '.join(COUNTED_TABLES)} IN SHARE MODE;")
+    for table in COUNTED_TABLES:
+        op.execute(
+            f"""
+            INSERT INTO row_counts (name, value) SELECT '{table}', count(*) FROM {table}
+            ON CONFLICT (name) DO UPDATE SET value = EXCLUDED.value;
+            """
+        )
+    op.execute(
+        """
+        INSERT INTO row_counts (name, value) SELECT 'services:active', count(*) FROM services WHERE status = 'Ativo'
+        ON CONFLICT (name) DO UPDATE SET value = EXCLUDED.value;
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop the counters and their triggers."""
+    for table in COUNTED_TABLES:
+        for event in ("insert", "delete", "truncate"):
+            op.execute(f"DROP TRIGGER IF EXISTS tr_{table}_count_{event} ON {table};")
+    for event in ("insert", "update", "delete"):
+        op.execute(f"DROP TRIGGER IF EXISTS tr_services_active_count_{event} ON services;")
+    op.execute("DROP FUNCTION IF EXISTS f_row_counts_services_active();")
+    op.execute("DROP FUNCTION IF EXISTS f_row_counts();")
+    op.execute("DROP TABLE IF EXISTS row_counts;")
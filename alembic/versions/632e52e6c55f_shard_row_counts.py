@@ -0,0 +1,103 @@
+"""shard row counts
+
+Revision ID: 632e52e6c55f
+Revises: 4f752312c41d
+Create Date: 2026-10-18 14:12:37.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '632e52e6c55f'
+down_revision: Union[str, Sequence[str], None] = '4f752312c41d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Linhas por contador: cada instrução atualiza uma ao acaso, os leitores somam-nas
+SHARDS = 16
+
+
+def _functions(shard: str, where: str) -> None:
+    # shard: expressão da linha a atualizar; where: condição extra do UPDATE
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION f_row_counts() RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            delta BIGINT;
+            target INTEGER := {shard};
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                SELECT count(*) INTO delta FROM new_rows;
+            ELSIF TG_OP = 'DELETE' THEN
+                SELECT -count(*) INTO delta FROM old_rows;
+            ELSE
+                UPDATE row_counts SET value = 0 WHERE name = TG_TABLE_NAME OR name LIKE TG_TABLE_NAME || ':%';
+                RETURN NULL;
+            END IF;
+            IF delta <> 0 THEN
+                UPDATE row_counts SET value = value + delta WHERE name = TG_TABLE_NAME{where};
+            END IF;
+            RETURN NULL;
+        END $$;
+        """
+    )
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION f_row_counts_services_active() RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            added BIGINT := 0;
+            removed BIGINT := 0;
+            target INTEGER := {shard};
+        BEGIN
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                SELECT count(*) INTO added FROM new_rows WHERE status = 'Ativo';
+            END IF;
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                SELECT count(*) INTO removed FROM old_rows WHERE status = 'Ativo';
+            END IF;
+            IF added <> removed THEN
+                UPDATE row_counts SET value = value + added - removed WHERE name = 'services:active'{where};
+            END IF;
+            RETURN NULL;
+        END $$;
+        """
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema: split every row counter into SHARDS rows so concurrent writes do not queue on one."""
+    op.execute("ALTER TABLE row_counts ADD COLUMN IF NOT EXISTS shard SMALLINT NOT NULL DEFAULT 0;")
+    op.execute("ALTER TABLE row_counts DROP CONSTRAINT IF EXISTS row_counts_pkey;")
+    op.execute("ALTER TABLE row_counts ADD CONSTRAINT row_counts_pkey PRIMARY KEY (name, shard);")
+    # O valor atual fica na linha 0; as restantes começam a zero
+    op.execute(
+        f"""
+        INSERT INTO row_counts (name, shard, value)
+        SELECT row_counts.name, shards.n, 0 FROM row_counts, generate_series(1, {SHARDS - 1}) AS shards (n)
+        WHERE row_counts.shard = 0
+        ON CONFLICT (name, shard) DO NOTHING;
+        """
+    )
+    # A linha é sorteada uma vez por instrução (random() no WHERE seria avaliado por linha)
+    _functions(f"floor(random() * {SHARDS})::int", " AND shard = target")
+
+
+def downgrade() -> None:
+    """Downgrade schema: fold the shards back into one row per counter."""
+    _functions("0", "")
+    op.execute(
+        """
+        UPDATE row_counts SET value = totals.value
+        FROM (SELECT name, sum(value) AS value FROM row_counts GROUP BY name) AS totals
+        WHERE row_counts.name = totals.name AND row_counts.shard = 0;
+        """
+    )
+    op.execute("DELETE FROM row_counts WHERE shard <> 0;")
+    op.execute("ALTER TABLE row_counts DROP CONSTRAINT IF EXISTS row_counts_pkey;")
+    op.execute("ALTER TABLE row_counts DROP COLUMN IF EXISTS shard;")
+    op.execute("ALTER TABLE row_counts ADD CONSTRAINT row_counts_pkey PRIMARY KEY (name);")
@@ -0,0 +1,109 @@
+"""add upload blobs
+
+Revision ID: 66a3f18f7b69
+Revises: bb8e81a2a6d5
+Create Date: 2026-10-17 21:34:51.208317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '66a3f18f7b69'
+down_revision: Union[str, Sequence[str], None] = 'bb8e81a2a6d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Colunas com URLs de uploads: cada valor em /uploads/blobs/ é uma referência ao ficheiro
+URL_COLUMNS = {
+    "users": ("profile_photo_url", "cover_photo_url"),
+    "companies": ("logo_url", "cover_url"),
+    "services": ("image_url",),
+    "company_portfolios": ("media_url",),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema: reference counts of content-addressed uploads kept by row triggers."""
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS upload_blobs (
+            url VARCHAR(512) PRIMARY KEY,
+            refs INTEGER NOT NULL DEFAULT 0,
+            released_at TIMESTAMP NULL
+        );
+        """
+    )
+    # Só os ficheiros sem referências são candidatos à limpeza
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_upload_blobs_released ON upload_blobs (released_at) WHERE refs = 0;"
+    )
+    # Os nomes das colunas vêm nos argumentos do trigger; só corre quando uma delas muda (WHEN)
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION f_upload_blob_refs() RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            col TEXT;
+            old_url TEXT;
+            new_url TEXT;
+        BEGIN
+            FOREACH col IN ARRAY TG_ARGV LOOP
+                old_url := CASE WHEN TG_OP <> 'INSERT' THEN to_jsonb(OLD) ->> col END;
+                new_url := CASE WHEN TG_OP <> 'DELETE' THEN to_jsonb(NEW) ->> col END;
+                CONTINUE WHEN old_url IS NOT DISTINCT FROM new_url;
+                IF new_url LIKE '/uploads/blobs/%' THEN
+                    INSERT INTO upload_blobs (url, refs) VALUES (new_url, 1)
+                    ON CONFLICT (url) DO UPDATE SET refs = upload_blobs.refs + 1, released_at = NULL;
+                END IF;
+                IF old_url LIKE '/uploads/blobs/%' THEN
+                    UPDATE upload_blobs
+                    SET refs = refs - 1,
+                        released_at = CASE WHEN refs <= 1 THEN (now() AT TIME ZONE 'utc') END
+                    WHERE url = old_url;
+                END IF;
+            END LOOP;
+            RETURN NULL;
+        END $$;
+        """
+    )
+    for table, columns in URL_COLUMNS.items():
+        arguments = ", ".join(f"'{column}'" for column in columns)
+        for event, condition in (
+            ("INSERT", " OR ".join(f"NEW.{column} IS NOT NULL" for column in columns)),
+            ("UPDATE", " OR ".join(f"OLD.{column} IS DISTINCT FROM NEW.{column}" for column in columns)),
+            ("DELETE", " OR ".join(f"OLD.{column} IS NOT NULL" for column in columns)),
+        ):
+            name = f"tr_{table}_blob_refs_{event.lower()}"
+            op.execute(f"DROP TRIGGER IF EXISTS {name} ON {table};")
+            op.execute(
+                f"""
+                CREATE TRIGGER {name} AFTER {event} ON {table}
+                FOR EACH ROW WHEN ({condition}) EXECUTE FUNCTION f_upload_blob_refs({arguments});
+                """
+            )
+
+    # Valores iniciais, com as tabelas bloqueadas para escrita durante a contagem
+    op.execute(f"LOCK TABLE {', '.join(URL_COLUMNS)} IN SHARE MODE;")
+    references = " UNION ALL ".join(
+        f"SELECT {column} AS url FROM {table}" for table, columns in URL_COLUMNS.items() for column in columns
+    )
+    op.execute(
+        f"""
+        INSERT INTO upload_blobs (url, refs)
+        SELECT url, count(*) FROM ({references}) AS refs WHERE url LIKE '/uploads/blobs/%' GROUP BY url
+        ON CONFLICT (url) DO UPDATE SET refs = EXCLUDED.refs, released_at = NULL;
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop the reference counts and their triggers."""
+    for table in URL_COLUMNS:
+        for event in ("insert", "update", "delete"):
+            op.execute(f"DROP TRIGGER IF EXISTS tr_{table}_blob_refs_{event} ON {table};")
+    op.execute("DROP FUNCTION IF EXISTS f_upload_blob_refs();")
+    op.execute("DROP TABLE IF EXISTS upload_blobs;")
@@ -0,0 +1,151 @@
+"""accent-insensitive search columns
+
+Revision ID: 97ae5bd71398
+Revises: 4b1457aacf3b
+Create Date: 2026-10-17 13:48:52.090317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '97ae5bd71398'
+down_revision: Union[str, Sequence[str], None] = '4b1457aacf3b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _search_vectors(config: str) -> dict:
+    return {
+        "services": (
+            f"setweight(to_tsvector('{config}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{config}', coalesce(category, '')), 'B') || "
+            f"setweight(to_tsvector('{config}', coalesce(description, '')), 'C')"
+        ),
+        "companies": (
+            f"setweight(to_tsvector('{config}', coalesce(name, '')), 'A') || "
+            f"setweight(to_tsvector('{config}', coalesce(province, '') || ' ' || coalesce(district, '')), 'B') || "
+            f"setweight(to_tsvector('{config}', coalesce(description, '')), 'C') || "
+            f"setweight(to_tsvector('{config}', coalesce(address, '') || ' ' || coalesce(nationality, '')), 'D')"
+        ),
+        "users": (
+            f"setweight(to_tsvector('{config}', coalesce(full_name, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(email, '')), 'B')"
+        ),
+        "company_portfolios": (
+            f"setweight(to_tsvector('{config}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{config}', coalesce(description, '')), 'C')"
+        ),
+    }
+
+
+# tabela -> colunas normalizadas (coluna_norm, coluna original, tamanho)
+NORMALIZED_COLUMNS = {
+    "services": [("title_norm", "title", 255), ("category_norm", "category", 100)],
+    "companies": [("name_norm", "name", 255), ("province_norm", "province", 100), ("district_norm", "district", 100)],
+    "company_portfolios": [("title_norm", "title", 255)],
+}
+
+OLD_TRIGRAM_INDEXES = {
+    "ix_services_title_trgm": ("services", "title"),
+    "ix_companies_name_trgm": ("companies", "name"),
+    "ix_company_portfolios_title_trgm": ("company_portfolios", "title"),
+}
+
+
+def _replace_search_vectors(config: str) -> None:
+    for table, expression in _search_vectors(config).items():
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_search_vector;")
+        op.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector;")
+        op.execute(
+            f"""
+            ALTER TABLE {table}
+            ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS ({expression}) STORED;
+            """
+        )
+        op.execute(f"CREATE INDEX ix_{table}_search_vector ON {table} USING gin (search_vector);")
+
+
+def upgrade() -> None:
+    """Upgrade schema: unaccented search vectors, normalized shadow columns and their indexes."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent;")
+    # unaccent() is only STABLE; pinning the dictionary makes it safe for generated columns
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION f_normalize_tags(text[]) RETURNS text[]
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        AS $$ SELECT array(SELECT lower(f_unaccent(tag)) FROM unnest($1) AS tag) $$;
+        """
+    )
+    op.execute(
+        """
+        DO $$
+        BEGIN
+          IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'portuguese_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION portuguese_unaccent (COPY = portuguese);
+            ALTER TEXT SEARCH CONFIGURATION portuguese_unaccent
+              ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+          END IF;
+        END $$;
+        """
+    )
+
+    # Vetores full-text recriados com a configuração sem acentos (recalculados para todas as linhas)
+    _replace_search_vectors("portuguese_unaccent")
+
+    # Colunas normalizadas + índices trigram (suportam similarity e LIKE '%...%')
+    for table, columns in NORMALIZED_COLUMNS.items():
+        for norm_column, column, length in columns:
+            op.execute(
+                f"""
+                ALTER TABLE {table}
+                ADD COLUMN IF NOT EXISTS {norm_column} VARCHAR({length})
+                GENERATED ALWAYS AS (lower(f_unaccent({column}))) STORED;
+                """
+            )
+            op.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_{norm_column}_trgm ON {table} USING gin ({norm_column} gin_trgm_ops);"
+            )
+    for index_name in OLD_TRIGRAM_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {index_name};")
+
+    op.execute(
+        """
+        ALTER TABLE services
+        ADD COLUMN IF NOT EXISTS tags_norm VARCHAR[]
+        GENERATED ALWAYS AS (f_normalize_tags(tags)) STORED;
+        """
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_services_tags_norm ON services USING gin (tags_norm);")
+    op.execute("DROP INDEX IF EXISTS ix_services_tags;")
+
+
+def downgrade() -> None:
+    """Downgrade schema: back to accent-sensitive search."""
+    op.execute("CREATE INDEX IF NOT EXISTS ix_services_tags ON services USING gin (tags);")
+    op.execute("DROP INDEX IF EXISTS ix_services_tags_norm;")
+    op.execute("ALTER TABLE services DROP COLUMN IF EXISTS tags_norm;")
+
+    for index_name, (table, column) in OLD_TRIGRAM_INDEXES.items():
+        op.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} USING gin ({column} gin_trgm_ops);")
+    for table, columns in NORMALIZED_COLUMNS.items():
+        for norm_column, _, _ in columns:
+            op.execute(f"DROP INDEX IF EXISTS ix_{table}_{norm_column}_trgm;")
+            op.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS {norm_column};")
+
+    _replace_search_vectors("portuguese")
+
+    op.execute("DROP TEXT SEARCH CONFIGURATION IF EXISTS portuguese_unaccent;")
+    op.execute("DROP FUNCTION IF EXISTS f_normalize_tags(text[]);")
+    op.execute("DROP FUNCTION IF EXISTS f_unaccent(text);")
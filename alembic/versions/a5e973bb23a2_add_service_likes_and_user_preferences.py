@@ -0,0 +1,65 @@
+"""add service likes and user preferences
+
+Revision ID: a5e973bb23a2
+Revises: fa2cc9e472de
+Create Date: 2026-10-17 18:20:44.116203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5e973bb23a2'
+down_revision: Union[str, Sequence[str], None] = 'fa2cc9e472de'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: per-user likes and preference vectors for the personalized feed."""
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS service_likes (
+            user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            service_id INTEGER NOT NULL REFERENCES services (id) ON DELETE CASCADE,
+            created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT timezone('utc', now()),
+            PRIMARY KEY (user_id, service_id)
+        );
+        """
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_service_likes_service_id ON service_likes (service_id);")
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_preferences (
+            user_id INTEGER PRIMARY KEY REFERENCES users (id) ON DELETE CASCADE,
+            categories JSONB NOT NULL DEFAULT '{}'::jsonb,
+            tags JSONB NOT NULL DEFAULT '{}'::jsonb,
+            provinces JSONB NOT NULL DEFAULT '{}'::jsonb,
+            updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT timezone('utc', now())
+        );
+        """
+    )
+    # Províncias das empresas já existentes (não há histórico de visualizações/gostos a importar)
+    op.execute(
+        """
+        INSERT INTO user_preferences (user_id, provinces)
+        SELECT owner_id, jsonb_object_agg(province_norm, companies_count)
+        FROM (
+            SELECT owner_id, province_norm, count(*) AS companies_count
+            FROM companies
+            WHERE owner_id IS NOT NULL AND coalesce(province_norm, '') <> ''
+            GROUP BY owner_id, province_norm
+        ) AS owned
+        GROUP BY owner_id
+        ON CONFLICT (user_id) DO UPDATE SET provinces = EXCLUDED.provinces;
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop likes and preference vectors."""
+    op.execute("DROP TABLE IF EXISTS user_preferences;")
+    op.execute("DROP TABLE IF EXISTS service_likes;")
@@ -0,0 +1,39 @@
+"""drop source feed indexes
+
+Revision ID: a6640d423278
+Revises: 029a9dd3f656
+Create Date: 2026-10-18 09:12:37.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6640d423278'
+down_revision: Union[str, Sequence[str], None] = '029a9dd3f656'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Índices (created_at DESC, id DESC) de 2cce9d7c2944: desde 029a9dd3f656 o feed lê feed_items, não as fontes
+FEED_INDEXES = {
+    "ix_services_feed": ("services", "WHERE status = 'Ativo'"),
+    "ix_companies_feed": ("companies", ""),
+    "ix_users_feed": ("users", "WHERE is_active"),
+    "ix_company_portfolios_feed": ("company_portfolios", ""),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema: drop the per-source feed indexes (no reader, maintained on every write)."""
+    for index_name in FEED_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {index_name};")
+
+
+def downgrade() -> None:
+    """Downgrade schema: recreate the per-source feed indexes."""
+    for index_name, (table, where) in FEED_INDEXES.items():
+        op.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} (created_at DESC, id DESC) {where};")
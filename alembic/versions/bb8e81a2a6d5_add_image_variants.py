@@ -0,0 +1,55 @@
+"""add image variants
+
+Revision ID: bb8e81a2a6d5
+Revises: 192ce675ac2a
+Create Date: 2026-10-17 20:58:13.204716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bb8e81a2a6d5'
+down_revision: Union[str, Sequence[str], None] = '192ce675ac2a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Tabela -> colunas com o mapa de variantes de cada imagem (ver app/images.py)
+VARIANT_COLUMNS = {
+    "services": ("image_variants",),
+    "companies": ("logo_variants", "cover_variants"),
+    "users": ("profile_photo_variants", "cover_photo_variants"),
+}
+
+# Tipo do feed -> tabela da entidade (os cartões levam os mesmos mapas)
+FEED_TABLES = {"service": "services", "company": "companies", "user": "users"}
+
+
+def upgrade() -> None:
+    """Upgrade schema: resized variant maps of uploaded images."""
+    for table, columns in VARIANT_COLUMNS.items():
+        for column in columns:
+            op.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} JSONB;")
+    # Mapas de variantes nos cartões do feed escritos antes de existirem
+    for kind, table in FEED_TABLES.items():
+        columns = VARIANT_COLUMNS[table]
+        missing = " OR ".join(f"NOT f.payload ? '{column}'" for column in columns)
+        values = ", ".join(f"'{column}', s.{column}" for column in columns)
+        op.execute(
+            f"""
+            UPDATE feed_items AS f
+            SET payload = f.payload || jsonb_build_object({values})
+            FROM {table} AS s
+            WHERE f.type = '{kind}' AND f.entity_id = s.id AND ({missing});
+            """
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop the variant maps."""
+    for table, columns in VARIANT_COLUMNS.items():
+        for column in columns:
+            op.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS {column};")
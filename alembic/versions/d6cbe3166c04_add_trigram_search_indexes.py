@@ -0,0 +1,40 @@
+"""add trigram search indexes
+
+Revision ID: d6cbe3166c04
+Revises: 3dbee33ee07e
+Create Date: 2026-10-17 10:03:17.551920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6cbe3166c04'
+down_revision: Union[str, Sequence[str], None] = '3dbee33ee07e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TRIGRAM_INDEXES = {
+    "ix_services_title_trgm": ("services", "title"),
+    "ix_companies_name_trgm": ("companies", "name"),
+    "ix_company_portfolios_title_trgm": ("company_portfolios", "title"),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema: enable pg_trgm and index the fuzzy-searchable columns."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+    for index_name, (table, column) in TRIGRAM_INDEXES.items():
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} USING gin ({column} gin_trgm_ops);"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop trigram indexes (the extension is left installed)."""
+    for index_name in TRIGRAM_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {index_name};")
@@ -0,0 +1,31 @@
+"""add services random key
+
+Revision ID: ec2e1ce810fb
+Revises: 26dbb91d16cc
+Create Date: 2026-10-17 19:12:37.550921
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ec2e1ce810fb'
+down_revision: Union[str, Sequence[str], None] = '26dbb91d16cc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: precomputed random key for the seeded shuffle of /services."""
+    # random() é volátil: cada linha existente recebe a sua chave
+    op.execute("ALTER TABLE services ADD COLUMN IF NOT EXISTS random_key DOUBLE PRECISION NOT NULL DEFAULT random();")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_services_random_key ON services (random_key, id);")
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop the random key."""
+    op.execute("DROP INDEX IF EXISTS ix_services_random_key;")
+    op.execute("ALTER TABLE services DROP COLUMN IF EXISTS random_key;")
@@ -0,0 +1,28 @@
+"""add feed_items ranked index
+
+Revision ID: fa2cc9e472de
+Revises: a6640d423278
+Create Date: 2026-10-17 17:41:09.804112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fa2cc9e472de'
+down_revision: Union[str, Sequence[str], None] = 'a6640d423278'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: index for the ranked feed (scores are filled by the feed-scores background task)."""
+    op.execute("CREATE INDEX IF NOT EXISTS ix_feed_items_ranked ON feed_items (score DESC, id DESC);")
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop the ranked feed index."""
+    op.execute("DROP INDEX IF EXISTS ix_feed_items_ranked;")
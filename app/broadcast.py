@@ -0,0 +1,170 @@
+"""
+In-process fan-out of new feed items to streaming clients (``/search/feed/stream``).
+
+Each connected client is a ``Subscriber`` with a bounded queue. Publishing
+never blocks the writer: events are handed to the event loop and copied
+into every matching queue. A client that cannot keep up (full queue) loses
+its buffered events and receives a single ``resync`` marker instead, so it
+reloads the top of the feed once rather than slowing down everybody else.
+The number of subscribers per worker is capped.
+
+Items created by this worker are published by ``hooks`` right after the
+write. Items created by other workers are picked up by ``relay_feed_events``,
+one indexed read of ``feed_items`` per interval and per worker, and only
+while this worker has subscribers.
+"""
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .models import FeedItem
+from .settings import settings
+
+# Tipos de item enviados pelo stream (criações de utilizadores não são difundidas)
+STREAM_TYPES = ("service", "company", "portfolio")
+
+# Marcador enviado a um subscritor que perdeu eventos (fila cheia)
+RESYNC = None
+
+Event = tuple[Optional[int], Optional[dict]]  # (id do feed_items, cartão)
+
+
+class Subscriber:
+    """One streaming connection: the item types it wants and its pending events."""
+
+    def __init__(self, types: frozenset[str], queue_size: int):
+        self.types = types
+        self.queue: asyncio.Queue[Event] = asyncio.Queue(maxsize=queue_size)
+        self.resyncs = 0
+
+
+class Broadcaster:
+    """Fan-out of events to a capped set of subscribers of one worker."""
+
+    def __init__(self, max_subscribers: int, queue_size: int, dedup_size: int = 1024):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self._subscribers: set[Subscriber] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        # Ids já difundidos (escrita local e relay podem ver o mesmo item)
+        self._recent: deque[int] = deque(maxlen=dedup_size)
+        self._recent_set: set[int] = set()
+        self.relay_after: Optional[int] = None
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    # ---- subscritores (no event loop) ------------------------------------
+
+    def subscribe(self, types: Iterable[str]) -> Optional[Subscriber]:
+        """Register a subscriber, or return ``None`` when the worker is at its cap."""
+        if len(self._subscribers) >= self.max_subscribers:
+            self.rejected += 1
+            return None
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber(frozenset(types), self.queue_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+        if not self._subscribers:
+            self.relay_after = None
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    # ---- publicação (qualquer thread) ------------------------------------
+
+    def publish(self, event_id: int, event: dict) -> None:
+        """Send an event to every subscriber of its type, at most once per ``event_id``."""
+        if not self._subscribers or self._loop is None:
+            return
+        with self._lock:
+            if event_id in self._recent_set:
+                return
+            if len(self._recent) == self._recent.maxlen:
+                self._recent_set.discard(self._recent[0])
+            self._recent.append(event_id)
+            self._recent_set.add(event_id)
+        self.published += 1
+        try:
+            self._loop.call_soon_threadsafe(self._dispatch, event_id, event)
+        except RuntimeError:
+            pass  # loop já fechado (shutdown)
+
+    def _dispatch(self, event_id: int, event: dict) -> None:
+        for subscriber in list(self._subscribers):
+            if event.get("type") not in subscriber.types:
+                continue
+            try:
+                subscriber.queue.put_nowait((event_id, event))
+                self.delivered += 1
+            except asyncio.QueueFull:
+                # Cliente lento: descarta o que tinha pendente e pede-lhe que recarregue o feed
+                self.dropped += subscriber.queue.qsize()
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                subscriber.queue.put_nowait((RESYNC, None))
+                subscriber.resyncs += 1
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "max_subscribers": self.max_subscribers,
+            "queue_size": self.queue_size,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
+
+
+feed_broadcaster = Broadcaster(settings.FEED_STREAM_MAX_CONNECTIONS, settings.FEED_STREAM_QUEUE_SIZE)
+
+
+def publish_feed_item(feed_id: int, kind: str, card: dict) -> None:
+    """Announce a newly created feed item (called by ``hooks``)."""
+    if kind in STREAM_TYPES:
+        feed_broadcaster.publish(feed_id, {**card, "type": kind})
+
+
+def new_feed_items(db: Session, after: int, limit: int) -> list[Event]:
+    """Streamable feed rows with ``id > after``, oldest first.
+
+    Only rows created in the last ``FEED_STREAM_LOOKBACK_SECONDS`` count, so
+    a feed rebuild (which renumbers every row) is not replayed as new items.
+    """
+    since = datetime.utcnow() - timedelta(seconds=settings.FEED_STREAM_LOOKBACK_SECONDS)
+    rows = db.execute(
+        select(FeedItem.id, FeedItem.type, FeedItem.payload)
+        .where(FeedItem.id > after, FeedItem.type.in_(STREAM_TYPES), FeedItem.created_at >= since)
+        .order_by(FeedItem.id)
+        .limit(limit)
+    ).all()
+    return [(row.id, {**row.payload, "type": row.type}) for row in rows]
+
+
+def relay_feed_events(db: Session) -> None:
+    """Publish the items created by other workers since the last run."""
+    if not feed_broadcaster.has_subscribers:
+        return
+    if feed_broadcaster.relay_after is None:
+        # Primeiro subscritor: começa no fim atual da tabela
+        feed_broadcaster.relay_after = db.execute(select(func.coalesce(func.max(FeedItem.id), 0))).scalar_one()
+        db.rollback()
+        return
+    events = new_feed_items(db, feed_broadcaster.relay_after, limit=500)
+    db.rollback()
+    for event_id, event in events:
+        feed_broadcaster.publish(event_id, event)
+    if events:
+        feed_broadcaster.relay_after = events[-1][0]
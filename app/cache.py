@@ -0,0 +1,120 @@
+"""
+In-process caches shared by the routers.
+
+Each uvicorn worker keeps its own copy; entries are bounded in number
+(least recently used ones are evicted first) and expire after a TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, Optional
+
+from .settings import settings
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire ``ttl`` seconds after being set.
+
+    Entries may carry tags (what the value was computed from), so a write can
+    drop just the entries that depend on it with ``invalidate``.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any, frozenset]]" = OrderedDict()
+        self._tagged: dict[Hashable, set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value, _ = entry
+            if expires_at < time.monotonic():
+                self._discard(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[Hashable] = ()) -> None:
+        tags = frozenset(tags)
+        with self._lock:
+            self._discard(key)
+            self._data[key] = (time.monotonic() + self.ttl, value, tags)
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._discard(next(iter(self._data)))
+                self.evictions += 1
+
+    def _discard(self, key: Hashable) -> None:
+        # Chamado com o lock: remove a entrada e as referências das suas tags
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+    def delete(self, key: Hashable) -> None:
+        """Drop one entry (write-driven invalidation of a single key)."""
+        with self._lock:
+            self._discard(key)
+
+    def invalidate(self, tag: Hashable) -> None:
+        """Drop the entries set with ``tag`` (write-driven invalidation of what depends on it)."""
+        with self._lock:
+            for key in self._tagged.pop(tag, ()):
+                self._discard(key)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop every entry (write-driven invalidation)."""
+        with self._lock:
+            self._data.clear()
+            self._tagged.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Pesquisa: respostas completas e facetas, por query normalizada + filtros,
+# marcadas com os tipos de resultado de que dependem ("services", "users", ...)
+search_results_cache = TTLCache(maxsize=settings.SEARCH_CACHE_SIZE, ttl=settings.SEARCH_CACHE_TTL_SECONDS)
+search_facets_cache = TTLCache(maxsize=settings.SEARCH_FACET_CACHE_SIZE, ttl=settings.SEARCH_FACET_CACHE_TTL_SECONDS)
+# Contagens (totais exatos, estimativas e contagens filtradas) de app/counts.py
+count_cache = TTLCache(maxsize=settings.COUNT_CACHE_SIZE, ttl=settings.COUNT_CACHE_TTL_SECONDS)
+# Visualizações/leads já contados por (cliente, serviço, contador), para não contar repetições
+engagement_seen_cache = TTLCache(maxsize=settings.ENGAGEMENT_DEDUP_SIZE, ttl=settings.ENGAGEMENT_DEDUP_SECONDS)
+# Vetores de preferência do feed personalizado, por utilizador (atualizados em cada sinal deste worker)
+preference_cache = TTLCache(maxsize=settings.PREFERENCE_CACHE_SIZE, ttl=settings.PREFERENCE_CACHE_TTL_SECONDS)
@@ -0,0 +1,64 @@
+"""
+Cheap row counts for dashboards and list endpoints.
+
+Three sources, from cheapest to most precise for the question asked:
+
+* **Exact totals** (``exact_count``): ``row_counts`` rows kept current by
+  statement-level triggers on every write path (routers, imports, COPY,
+  TRUNCATE), one counter update per statement. Each counter is split in
+  shards and a statement updates one picked at random, so concurrent
+  writers to the same table rarely wait on the same row. Reading one sums
+  a handful of rows found by primary key instead of a ``COUNT(*)``.
+* **Estimates** (``filtered_count``): for a filtered query the planner's
+  row estimate (``EXPLAIN``, i.e. ``pg_class.reltuples`` scaled by the
+  column statistics) is free; sets estimated below ``COUNT_EXACT_THRESHOLD``
+  are small enough to count exactly instead.
+* **Cache**: every result is kept per worker for ``COUNT_CACHE_TTL_SECONDS``.
+"""
+import json
+from typing import Hashable
+
+from sqlalchemy import Select, func, select
+from sqlalchemy.orm import Session
+
+from .cache import count_cache
+from .models import RowCount
+from .settings import settings
+
+
+def exact_count(db: Session, name: str) -> int:
+    """Value of a ``row_counts`` counter (``"services"``, ``"services:active"``, ``"companies"``, ...)."""
+    key = ("exact", name)
+    value = count_cache.get(key)
+    if value is None:
+        value = int(db.execute(select(func.sum(RowCount.value)).where(RowCount.name == name)).scalar() or 0)
+        count_cache.set(key, value)
+    return value
+
+
+def estimate_count(db: Session, query: Select) -> int:
+    """Planner estimate of the rows ``query`` returns (no rows are read)."""
+    compiled = query.compile(dialect=db.get_bind().dialect)
+    plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def filtered_count(db: Session, query: Select, key: Hashable) -> tuple[int, bool]:
+    """``(count, exact)`` of the rows of ``query``, cached under ``key``.
+
+    Large sets get the planner estimate (``exact`` is False); small ones are
+    counted.
+    """
+    cache_key = ("filtered", key)
+    cached = count_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    estimate = estimate_count(db, query)
+    if estimate <= settings.COUNT_EXACT_THRESHOLD:
+        result = (db.execute(select(func.count()).select_from(query.subquery())).scalar_one(), True)
+    else:
+        result = (estimate, False)
+    count_cache.set(cache_key, result)
+    return result
@@ -1,4 +1,7 @@
-from fastapi import Depends, HTTPException, status
+import secrets
+from typing import Optional
+
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
@@ -9,6 +12,7 @@ from .schemas import TokenData
 from .settings import settings
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
 
 
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
@@ -48,3 +52,20 @@ def get_current_active_user(current_user: User = Depends(get_current_user)) -> U
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+
+def require_ops_token(x_ops_token: Optional[str] = Header(None)) -> None:
+    # Diagnóstico interno: desativado (404) sem OPS_TOKEN configurado, 403 com um token errado
+    if not settings.OPS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_ops_token is None or not secrets.compare_digest(x_ops_token, settings.OPS_TOKEN):
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+
+def get_optional_active_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme), db: Session = Depends(get_db)
+) -> Optional[User]:
+    # Endpoints abertos a anónimos: sem token devolve None; um token inválido continua a dar 401
+    if token is None:
+        return None
+    return get_current_active_user(get_current_user(token, db))
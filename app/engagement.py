@@ -0,0 +1,136 @@
+"""
+Write-behind engagement counters (``Service.views``, ``leads``, ``likes``).
+
+Recording an event only adds to this worker's in-memory buffer; no row is
+touched on the request path, so a popular service never becomes a lock
+hotspot. ``flush_engagement`` runs on an interval and applies everything
+buffered since the previous flush as one
+``UPDATE services ... FROM (VALUES ...)`` (rows in id order, so workers
+flushing at the same time cannot deadlock), and rescores the feed rows of
+those services in the same transaction. A failed flush puts its counts
+back in the buffer, and the shutdown hook flushes one last time.
+
+Counters read from the database lag by at most one flush interval. Views
+and leads are anonymous, so ``record_once`` counts one per client and
+service every ``ENGAGEMENT_DEDUP_SECONDS``, and the buffer holds at most
+``ENGAGEMENT_MAX_PENDING`` services between flushes. Likes are authenticated
+and their rows are already written, so their deltas are never dropped.
+"""
+import threading
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .cache import engagement_seen_cache
+from .feed import rescore_feed_items
+from .settings import settings
+
+# Colunas de contadores na ordem dos deltas do buffer
+COUNTERS = ("views", "leads", "likes")
+
+# Linhas por UPDATE (4 parâmetros por linha, abaixo do limite de parâmetros do PostgreSQL)
+FLUSH_BATCH_SIZE = 5000
+
+
+class CounterBuffer:
+    """Thread-safe ``{service_id: [views, leads, likes]}`` deltas."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._deltas: dict[int, list[int]] = {}
+        self.recorded = 0
+        self.dropped = 0
+        self.flushed_rows = 0
+        self.flushes = 0
+        self.failures = 0
+
+    def add(self, service_id: int, views: int = 0, leads: int = 0, likes: int = 0, capped: bool = True) -> bool:
+        """Buffer the deltas; False (dropped) when ``capped`` and the buffer is full of other services."""
+        with self._lock:
+            delta = self._deltas.get(service_id)
+            if delta is None:
+                if capped and len(self._deltas) >= settings.ENGAGEMENT_MAX_PENDING:
+                    self.dropped += 1
+                    return False
+                delta = self._deltas[service_id] = [0, 0, 0]
+            delta[0] += views
+            delta[1] += leads
+            delta[2] += likes
+            self.recorded += 1
+            return True
+
+    def drain(self) -> dict[int, list[int]]:
+        """Take every pending delta, leaving the buffer empty."""
+        with self._lock:
+            deltas, self._deltas = self._deltas, {}
+        return deltas
+
+    def restore(self, deltas: dict[int, list[int]]) -> None:
+        """Put back deltas that could not be written."""
+        with self._lock:
+            for service_id, (views, leads, likes) in deltas.items():
+                delta = self._deltas.setdefault(service_id, [0, 0, 0])
+                delta[0] += views
+                delta[1] += leads
+                delta[2] += likes
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending_services": len(self._deltas),
+                "recorded": self.recorded,
+                "dropped": self.dropped,
+                "flushes": self.flushes,
+                "flushed_rows": self.flushed_rows,
+                "failures": self.failures,
+            }
+
+
+engagement_buffer = CounterBuffer()
+
+
+def record_once(client: str, service_id: int, views: int = 0, leads: int = 0) -> bool:
+    """Buffer a view or lead unless ``client`` already had it counted for this service recently."""
+    key = (client, service_id, views > 0, leads > 0)
+    if engagement_seen_cache.get(key) is not None:
+        return False
+    engagement_seen_cache.set(key, True)
+    return engagement_buffer.add(service_id, views=views, leads=leads)
+
+
+def _update_statement(rows: int):
+    values = ", ".join(f"(:id{n}, :views{n}, :leads{n}, :likes{n})" for n in range(rows))
+    return text(
+        f"""
+        UPDATE services AS s
+        SET views = coalesce(s.views, 0) + v.views,
+            leads = coalesce(s.leads, 0) + v.leads,
+            likes = greatest(coalesce(s.likes, 0) + v.likes, 0)
+        FROM (VALUES {values}) AS v (id, views, leads, likes)
+        WHERE s.id = v.id
+        """
+    )
+
+
+def flush_engagement(db: Session) -> None:
+    """Write the buffered deltas in one batched UPDATE (per ``FLUSH_BATCH_SIZE`` services)."""
+    deltas = engagement_buffer.drain()
+    if not deltas:
+        return
+    rows = sorted((service_id, *delta) for service_id, delta in deltas.items() if any(delta))
+    try:
+        for start in range(0, len(rows), FLUSH_BATCH_SIZE):
+            batch = rows[start:start + FLUSH_BATCH_SIZE]
+            params = {}
+            for n, (service_id, views, leads, likes) in enumerate(batch):
+                params.update({f"id{n}": service_id, f"views{n}": views, f"leads{n}": leads, f"likes{n}": likes})
+            db.execute(_update_statement(len(batch)), params)
+            rescore_feed_items(db, [row[0] for row in batch])
+        db.commit()
+    except Exception:
+        db.rollback()
+        engagement_buffer.restore(deltas)
+        engagement_buffer.failures += 1
+        raise
+    engagement_buffer.flushes += 1
+    engagement_buffer.flushed_rows += len(rows)
@@ -0,0 +1,323 @@
+"""
+Unified feed of services, companies, users and portfolios.
+
+Every visible item has one row in ``feed_items`` holding its type, id,
+timestamp, ranking score and a denormalized card (the same fields the
+search returns), so a feed page is a single range scan of one index:
+``(created_at DESC, id DESC)`` for the recent feed, ``(score DESC, id DESC)``
+for the ranked feed.
+
+The ranking score is the log of an exponentially decaying weight::
+
+    score = ln 2 * age_from_epoch / half_life + ln(1 + engagement) + ln(boost) * is_promoted
+
+Time only enters through ``created_at``, so the decay never needs to be
+recomputed: an item only changes score when its engagement counters or its
+promotion change. A promoted service ranks like one ``half_life *
+log2(boost)`` newer.
+
+The table is maintained incrementally by ``hooks`` on every write of the
+routers (``sync_feed_item`` / ``remove_feed_items``) and by the engagement
+flush, which rescores the services whose counters it wrote
+(``rescore_feed_items``). ``refresh_feed_scores`` is a rare safety net for
+writes made outside the application, and ``python -m app.rebuild_feed``
+rebuilds the table from the source tables.
+
+``personal_feed_page`` reorders windows of the ranked feed with a user's
+preference vector (see ``preferences``).
+"""
+import math
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import Text, and_, case, cast, delete, func, literal, literal_column, select, text, true, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY, array, insert
+from sqlalchemy.orm import Session
+
+from .models import Company, CompanyPortfolio, FeedItem, Service, User
+from .search_backend import CARD_FIELDS, RESULT_FIELDS, card_column, normalize_query
+from .settings import settings
+
+# Tipo do item -> (modelo, filtros do feed, campos do cartão)
+FEED_SOURCES = {
+    "service": (Service, (Service.status == "Ativo",), RESULT_FIELDS["services"]),
+    "company": (Company, (), RESULT_FIELDS["companies"]),
+    "user": (User, (User.is_active == true(),), RESULT_FIELDS["users"]),
+    "portfolio": (CompanyPortfolio, (), RESULT_FIELDS["portfolios"]),
+}
+FEED_TYPES = tuple(FEED_SOURCES)
+
+# Origem da escala de tempo do score (mantém os valores pequenos)
+RANK_EPOCH = datetime(2024, 1, 1)
+
+
+def feed_page(
+    db: Session,
+    limit: int,
+    after: Optional[tuple] = None,
+    ranked: bool = False,
+    fields: Optional[Iterable[str]] = None,
+) -> tuple[list[dict], Optional[tuple], bool]:
+    """Return ``(items, last_position, has_more)`` for one page of the feed.
+
+    ``after`` is the position of the last feed row already served:
+    ``(created_at, id)`` for the recent feed, ``(score, id)`` when ``ranked``.
+    ``fields`` restricts the cards to those fields (and ``id``); the other
+    keys are removed by the database.
+    """
+    key = FeedItem.score if ranked else FeedItem.created_at
+    payload = FeedItem.payload
+    if fields is not None:
+        dropped = sorted(CARD_FIELDS - set(fields) - {"id"})
+        payload = payload.op("-")(cast(array(dropped, type_=Text), ARRAY(Text)))
+    query = select(FeedItem.type, key.label("key"), FeedItem.id, payload.label("payload"))
+    if after is not None:
+        query = query.where(tuple_(key, FeedItem.id) < tuple_(*after))
+    # Um item a mais indica se existe próxima página
+    rows = db.execute(query.order_by(key.desc(), FeedItem.id.desc()).limit(limit + 1)).all()
+    page = rows[:limit]
+    items = [{**row.payload, "type": row.type, **({"score": row.key} if ranked else {})} for row in page]
+    last = (page[-1].key, page[-1].id) if page else None
+    return items, last, len(rows) > limit
+
+
+def legacy_position(db: Session, last_id: int) -> Optional[tuple]:
+    """Recent-feed position of the item a client of the old ``last_id`` paging saw last.
+
+    ``last_id`` is the id of an entity of any type; when several types have
+    it, the newest row is taken, so the next page may repeat an item but
+    never skips one. ``None`` when no feed row has it (deleted since).
+    """
+    row = db.execute(
+        select(FeedItem.created_at, FeedItem.id)
+        .where(FeedItem.type.in_(FEED_TYPES), FeedItem.entity_id == last_id)
+        .order_by(FeedItem.created_at.desc(), FeedItem.id.desc())
+        .limit(1)
+    ).first()
+    return tuple(row) if row else None
+
+
+def personal_feed_page(
+    db: Session,
+    vector: dict,
+    limit: int,
+    window_after: Optional[tuple] = None,
+    offset: int = 0,
+    fields: Optional[Iterable[str]] = None,
+) -> tuple[list[dict], Optional[tuple], bool]:
+    """Return ``(items, next_position, has_more)`` for one page of a user's feed.
+
+    The ranked feed is read in windows of ``limit * FEED_PERSONAL_WINDOW``
+    candidates (one index range scan after ``window_after``) and each window is
+    reordered by ``score + affinity`` with the user's preference ``vector``.
+    ``offset`` is how many items of the window were already served;
+    ``next_position`` is ``(window_after, offset)`` of the next page. A
+    vector that changes between two pages only reorders the current window.
+    ``fields`` restricts the returned cards, after ranking.
+    """
+    window, last, more_windows = feed_page(db, limit * settings.FEED_PERSONAL_WINDOW, window_after, ranked=True)
+    company_provinces = {}
+    if vector["provinces"]:
+        company_ids = {item["company_id"] for item in window if item["type"] == "service"}
+        if company_ids:
+            company_provinces = dict(db.execute(select(Company.id, Company.province).where(Company.id.in_(company_ids))).all())
+    for item in window:
+        item["affinity"] = _affinity(item, vector, company_provinces)
+    # Ordenação estável: empates mantêm a ordem do feed ranked
+    window.sort(key=lambda item: -(item["score"] + item["affinity"]))
+    page = window[offset:offset + limit]
+    if fields is not None:
+        kept = set(fields) | {"id", "type", "score", "affinity"}
+        page = [{field: value for field, value in item.items() if field in kept} for item in page]
+    if offset + limit < len(window):
+        return page, (window_after, offset + limit), True
+    if more_windows:
+        return page, (last, 0), True
+    return page, None, False
+
+
+def _affinity(item: dict, vector: dict, company_provinces: dict) -> float:
+    """Score bonus of a feed card for a preference vector (same units as the score)."""
+    province = None
+    bonus = 0.0
+    if item["type"] == "service":
+        views = vector["categories"].get(normalize_query(item.get("category") or ""), 0)
+        bonus += settings.FEED_PERSONAL_CATEGORY_WEIGHT * math.log1p(views)
+        likes = [vector["tags"].get(normalize_query(tag or ""), 0) for tag in item.get("tags") or ()]
+        bonus += settings.FEED_PERSONAL_TAG_WEIGHT * sum(math.log1p(count) for count in likes)
+        province = company_provinces.get(item.get("company_id"))
+    elif item["type"] == "company":
+        province = item.get("province")
+    if province:
+        owned = vector["provinces"].get(normalize_query(province), 0)
+        bonus += settings.FEED_PERSONAL_PROVINCE_WEIGHT * math.log1p(owned)
+    return bonus
+
+
+# ---- score ------------------------------------------------------------------
+
+def score_expr(kind: str):
+    """SQL expression of the ranking score of a source row (see the module docstring)."""
+    model, _, _ = FEED_SOURCES[kind]
+    created_at = func.coalesce(model.created_at, func.timezone("utc", func.now()))
+    age = func.extract("epoch", created_at - literal(RANK_EPOCH))
+    score = age * (math.log(2) / (settings.FEED_RANK_HALF_LIFE_HOURS * 3600))
+    if kind == "service":
+        engagement = (
+            func.coalesce(Service.views, 0) * settings.FEED_WEIGHT_VIEWS
+            + func.coalesce(Service.leads, 0) * settings.FEED_WEIGHT_LEADS
+            + func.coalesce(Service.likes, 0) * settings.FEED_WEIGHT_LIKES
+        )
+        score = (
+            score
+            + func.ln(1 + engagement)
+            + case((Service.is_promoted == true(), math.log(settings.FEED_PROMOTION_BOOST)), else_=0.0)
+        )
+    return score
+
+
+def _source_rows(kind: str):
+    """``SELECT type, entity_id, created_at, payload, score`` of the visible rows of a source."""
+    model, filters, fields = FEED_SOURCES[kind]
+    payload = func.jsonb_build_object(
+        *[arg for field in fields for arg in (literal_column(f"'{field}'"), card_column(model, field))]
+    )
+    created_at = func.coalesce(model.created_at, func.timezone("utc", func.now()))
+    return (
+        select(
+            literal(kind).label("type"), model.id.label("entity_id"), created_at.label("created_at"),
+            payload.label("payload"), score_expr(kind).label("score"),
+        )
+        .where(*filters)
+    )
+
+
+_FEED_COLUMNS = [FeedItem.type, FeedItem.entity_id, FeedItem.created_at, FeedItem.payload, FeedItem.score]
+
+
+# ---- manutenção incremental ------------------------------------------------
+
+def _feed_type(entity) -> Optional[str]:
+    for kind, (model, _, _) in FEED_SOURCES.items():
+        if isinstance(entity, model):
+            return kind
+    return None
+
+
+def _upsert_feed_rows(kind: str, source):
+    """``INSERT ... ON CONFLICT DO UPDATE`` of the feed rows selected by ``source``."""
+    statement = insert(FeedItem).from_select(_FEED_COLUMNS, source, include_defaults=False)
+    return statement.on_conflict_do_update(
+        index_elements=[FeedItem.type, FeedItem.entity_id],
+        set_={
+            "created_at": statement.excluded.created_at,
+            "payload": statement.excluded.payload,
+            "score": statement.excluded.score,
+            "updated_at": func.timezone("utc", func.now()),
+        },
+    )
+
+
+def sync_feed_item(db: Session, entity) -> Optional[tuple[int, dict]]:
+    """Upsert the feed row of a committed entity, or drop it when no longer visible.
+
+    Returns ``(feed id, card)`` of the visible row.
+    """
+    kind = _feed_type(entity)
+    if kind is None:
+        return None
+    model, _, _ = FEED_SOURCES[kind]
+    # Cartão e score calculados pela mesma SQL do rebuild; sem linha visível, nada é inserido
+    statement = _upsert_feed_rows(kind, _source_rows(kind).where(model.id == entity.id))
+    row = db.execute(statement.returning(FeedItem.id, FeedItem.payload)).first()
+    if row is None:
+        db.execute(delete(FeedItem).where(FeedItem.type == kind, FeedItem.entity_id == entity.id))
+    db.commit()
+    return (row.id, row.payload) if row else None
+
+
+def sync_feed_items(db: Session, kind: str, ids: list[int]) -> None:
+    """Insert the feed rows of many newly created rows of one source in one statement."""
+    if not ids:
+        return
+    model, _, _ = FEED_SOURCES[kind]
+    db.execute(_upsert_feed_rows(kind, _source_rows(kind).where(model.id.in_(ids))))
+    db.commit()
+
+
+def remove_feed_items(db: Session, entity) -> None:
+    """Delete the feed rows of an entity about to be deleted, in the caller's transaction.
+
+    Deleting a company also deletes its services and portfolios (cascade).
+    """
+    kind = _feed_type(entity)
+    if kind is None:
+        return
+    db.execute(delete(FeedItem).where(FeedItem.type == kind, FeedItem.entity_id == entity.id))
+    if kind == "company":
+        for child_kind, model in (("service", Service), ("portfolio", CompanyPortfolio)):
+            children = select(model.id).where(model.company_id == entity.id)
+            db.execute(delete(FeedItem).where(FeedItem.type == child_kind, FeedItem.entity_id.in_(children)))
+
+
+def rescore_feed_items(db: Session, service_ids: list[int]) -> None:
+    """Rewrite the score and card of the feed rows of these services, in the caller's transaction.
+
+    Used by ``engagement.flush_engagement`` for the services whose counters it
+    just wrote: one indexed update of those rows only.
+    """
+    if not service_ids:
+        return
+    source = _source_rows("service").where(Service.id.in_(service_ids)).subquery()
+    db.execute(
+        update(FeedItem)
+        .where(FeedItem.type == "service", FeedItem.entity_id == source.c.entity_id)
+        .values(score=source.c.score, payload=source.c.payload, updated_at=func.timezone("utc", func.now()))
+        .execution_options(synchronize_session=False)
+    )
+
+
+# Chave do advisory lock que garante um único recálculo simultâneo entre workers
+_FEED_SCORES_LOCK_KEY = 7_340_102
+
+
+def refresh_feed_scores(db: Session) -> None:
+    """Safety net: rewrite the feed rows whose score differs from their source (card included).
+
+    Every write of the application already updates its feed rows (hooks and
+    ``rescore_feed_items``); this pass only catches counters written outside
+    it (manual SQL, scripts). It joins every visible source row with
+    ``feed_items``, so it runs rarely (``FEED_SCORE_REFRESH_SECONDS``) and
+    compares the scores only, not the JSONB cards.
+    """
+    acquired = db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _FEED_SCORES_LOCK_KEY}).scalar()
+    if acquired:
+        for kind in FEED_TYPES:
+            source = _source_rows(kind).subquery()
+            db.execute(
+                update(FeedItem)
+                .where(and_(
+                    FeedItem.type == kind,
+                    FeedItem.entity_id == source.c.entity_id,
+                    FeedItem.score.is_distinct_from(source.c.score),
+                ))
+                .values(score=source.c.score, payload=source.c.payload, updated_at=func.timezone("utc", func.now()))
+                .execution_options(synchronize_session=False)
+            )
+    db.commit()
+
+
+# ---- reconstrução ----------------------------------------------------------
+
+def rebuild_feed_items(db: Session) -> dict[str, int]:
+    """Recreate every feed row from the source tables in one transaction.
+
+    Readers keep seeing the previous rows until the commit.
+    """
+    db.execute(delete(FeedItem))
+    for kind, (model, _, _) in FEED_SOURCES.items():
+        source = _source_rows(kind).order_by(model.created_at, model.id)
+        db.execute(insert(FeedItem).from_select(_FEED_COLUMNS, source, include_defaults=False))
+    counts = dict(db.execute(select(FeedItem.type, func.count()).group_by(FeedItem.type)).all())
+    db.commit()
+    return {kind: counts.get(kind, 0) for kind in FEED_TYPES}
@@ -0,0 +1,94 @@
+"""
+Side effects of writes to searchable entities.
+
+Routers call ``entity_saved`` after committing a create or update and
+``entity_deleted`` right before deleting, so state derived from the
+catalogue (search caches, the suggestion prefix index, the feed table, the
+resized image variants, ...) stays in sync with it, as do the owners'
+preference vectors.
+"""
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from .broadcast import publish_feed_item
+from .cache import search_facets_cache, search_results_cache
+from .feed import _feed_type, remove_feed_items, sync_feed_item, sync_feed_items
+from .images import sync_variants
+from .models import Company, Service
+from .preferences import sync_owner_provinces
+from .search_backend import SEARCH_ENTITIES
+from .suggest import index_entity, unindex_entity
+
+
+def _search_type(entity) -> Optional[str]:
+    for kind, (model, _) in SEARCH_ENTITIES.items():
+        if isinstance(entity, model):
+            return kind
+    return None
+
+
+def _invalidate_search(kind: Optional[str]) -> None:
+    # Só as respostas que dependem do tipo escrito (tags postas em app/routers/search.py):
+    # escrever um utilizador não apaga as facetas nem as páginas de serviços, por exemplo
+    if kind is not None:
+        search_results_cache.invalidate(kind)
+        search_facets_cache.invalidate(kind)
+
+
+def entity_saved(db: Session, entity, created: bool = False) -> None:
+    """A Service, Company, CompanyPortfolio or User was created (``created``) or updated.
+
+    New items are announced to the feed stream subscribers.
+    """
+    _invalidate_search(_search_type(entity))
+    index_entity(entity)
+    try:
+        # Variantes das imagens novas são geradas em segundo plano (app/images.py)
+        sync_variants(db, entity)
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Image variant sync failed for {type(entity).__name__} {entity.id}: {e}")
+    try:
+        feed_row = sync_feed_item(db, entity)
+        if created and feed_row:
+            publish_feed_item(feed_row[0], _feed_type(entity), feed_row[1])
+    except Exception as e:
+        # A escrita principal já foi gravada; o rebuild do feed corrige a divergência
+        db.rollback()
+        print(f"⚠️ Feed sync failed for {type(entity).__name__} {entity.id}: {e}")
+    if isinstance(entity, Company):
+        try:
+            sync_owner_provinces(db, entity.owner_id)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ Preference sync failed for owner {entity.owner_id}: {e}")
+
+
+def services_imported(db: Session, services: list[Service]) -> None:
+    """A bulk import (``app.import_services``) committed these new Services.
+
+    Same effects as ``entity_saved`` with one feed statement for the whole
+    batch; stream subscribers receive the new items through the relay.
+    """
+    _invalidate_search("services")
+    for service in services:
+        index_entity(service)
+    try:
+        sync_feed_items(db, "service", [service.id for service in services])
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Feed sync failed for {len(services)} imported services: {e}")
+
+
+def entity_deleted(db: Session, entity) -> None:
+    """A Service, Company, CompanyPortfolio or User is about to be deleted.
+
+    Feed rows are deleted in the caller's transaction, committed with the entity.
+    """
+    _invalidate_search(_search_type(entity))
+    unindex_entity(entity)
+    remove_feed_items(db, entity)
+    if isinstance(entity, Company):
+        sync_owner_provinces(db, entity.owner_id, exclude_company_id=entity.id)
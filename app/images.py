@@ -0,0 +1,364 @@
+"""
+Resized variants of uploaded images: service images, company logos and
+covers, user profile and cover photos.
+
+The upload handlers still write the original file and answer at once.
+``hooks.entity_saved`` then hands every image whose variants are missing (or
+belong to a previous upload) to a process pool of ``IMAGE_WORKERS``
+processes, so decoding and encoding multi-megabyte photos never occupies a
+request worker or the GIL. The results are stored by a couple of threads of
+their own, not by the pool's result thread, which keeps collecting results
+while a database write waits. Each image gets ``IMAGE_VARIANT_WIDTHS`` variants
+(never upscaled) in WebP, plus AVIF when the installed Pillow can write it,
+with the EXIF orientation applied and every EXIF field (GPS, camera, ...)
+dropped. Once written, the variant map is stored in the row's ``*_variants``
+column and the row's feed card is rewritten (``feed.sync_feed_item``; the
+search caches are left alone), so feed cards and search results carry it::
+
+    {"source": "/uploads/service_images/7/image.jpg", "version": "<mtime-size do original>",
+     "thumb": {"width": 160, "height": 120, "webp": "/uploads/service_images/7/image.3f2a9c1e07b4.thumb.webp"},
+     "card": {...}, "full": {...},
+     "srcset": {"webp": ".../image.3f2a9c1e07b4.thumb.webp 160w, ...card.webp 480w, ...full.webp 1600w"}}
+
+Variant file names carry a hash of the original, so a new upload gets new
+URLs (long-lived browser caching stays correct); the variants of the
+previous upload are deleted when the new ones are written. A new upload
+that keeps the URL (same extension) is detected by the ``version``.
+
+``python -m app.images`` renders the variants of images uploaded before.
+"""
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from PIL import Image, ImageOps
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+try:
+    import pillow_avif  # noqa: F401  (regista o codificador AVIF no Pillow < 11.2)
+except ImportError:
+    pass
+
+from .database import get_session_local
+from .feed import sync_feed_item
+from .models import Company, Service, User
+from .settings import settings
+from .storage import BLOBS_DIR, UPLOADS_DIR
+
+# Imagem -> (modelo, coluna do URL do original, coluna do mapa de variantes)
+IMAGE_TARGETS = {
+    "service_image": (Service, "image_url", "image_variants"),
+    "company_logo": (Company, "logo_url", "logo_variants"),
+    "company_cover": (Company, "cover_url", "cover_variants"),
+    "user_profile": (User, "profile_photo_url", "profile_photo_variants"),
+    "user_cover": (User, "cover_photo_url", "cover_photo_variants"),
+}
+
+
+def variant_widths() -> list[tuple[str, int]]:
+    """``IMAGE_VARIANT_WIDTHS`` as ``[(name, max width)]``, narrowest first."""
+    widths = []
+    for item in settings.IMAGE_VARIANT_WIDTHS.split(","):
+        if item.strip():
+            name, width = item.split(":")
+            widths.append((name.strip(), int(width)))
+    return sorted(widths, key=lambda item: item[1])
+
+
+def variant_formats() -> dict[str, int]:
+    """Formats written (``format -> quality``): WebP, and AVIF when Pillow supports it."""
+    Image.init()
+    formats = {"webp": settings.IMAGE_WEBP_QUALITY}
+    if "AVIF" in Image.SAVE:
+        formats["avif"] = settings.IMAGE_AVIF_QUALITY
+    return formats
+
+
+# ---- renderização (nos processos do pool) ------------------------------------
+
+def render_variants(source: str, widths: list[tuple[str, int]], formats: dict[str, int]) -> dict:
+    """Write the variants of ``source`` next to it; returns ``{name: {width, height, format: file name}}``."""
+    with open(source, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha1(data).hexdigest()[:12]
+    directory, filename = os.path.split(source)
+    stem = os.path.splitext(filename)[0]
+
+    with Image.open(io.BytesIO(data)) as original:
+        icc_profile = original.info.get("icc_profile")
+        image = ImageOps.exif_transpose(original)
+    transparent = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+    image = image.convert("RGBA" if transparent else "RGB")
+
+    rendered: dict[str, dict] = {}
+    written = set()
+    previous_width = None
+    for name, max_width in widths:
+        width = min(max_width, image.width)
+        if width == previous_width:
+            continue  # original mais estreito que esta variante: seria igual à anterior
+        previous_width = width
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        entry = {"width": width, "height": height}
+        for fmt, quality in formats.items():
+            output = f"{stem}.{digest}.{name}.{fmt}"
+            path = os.path.join(directory, output)
+            if not os.path.exists(path):  # o nome depende do conteúdo: uma variante existente é igual
+                # Sem exif=: nenhum metadado EXIF é copiado para as variantes
+                temp_path = f"{path}.{os.getpid()}.part"  # outro processo pode estar a gravar a mesma variante
+                resized.save(temp_path, format=fmt.upper(), quality=quality, icc_profile=icc_profile)
+                os.replace(temp_path, path)
+            entry[fmt] = output
+            written.add(output)
+        rendered[name] = entry
+
+    # Variantes de uploads anteriores desta imagem (stem.hash.variante.formato)
+    for existing in os.listdir(directory):
+        parts = existing.split(".")
+        if len(parts) == 4 and parts[0] == stem and existing not in written:
+            os.remove(os.path.join(directory, existing))
+    return rendered
+
+
+# ---- agendamento (no worker da API) ------------------------------------------
+
+_pool: Optional[ProcessPoolExecutor] = None
+# Gravação dos mapas de variantes (base de dados, feed) fora da thread de resultados do pool
+_store_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+# (imagem, id, url, versão) em renderização, para não repetir o trabalho entre duas escritas próximas
+_pending: set[tuple[str, int, str, str]] = set()
+
+
+def _lower_priority() -> None:
+    # Com CPUs ocupadas, os workers da API passam à frente das renderizações
+    if hasattr(os, "nice"):
+        os.nice(10)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            # spawn: os processos não herdam as threads nem as ligações do worker
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_lower_priority,
+            )
+        return _pool
+
+
+def _get_store_executor() -> ThreadPoolExecutor:
+    global _store_executor
+    with _lock:
+        if _store_executor is None:
+            _store_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="image-variants")
+        return _store_executor
+
+
+def _stop_store_executor(wait: bool) -> None:
+    global _store_executor
+    with _lock:
+        executor, _store_executor = _store_executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def _reset_pool() -> None:
+    """Drop a broken pool (a process died: OOM, kill); the next render starts a new one."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+def _source_path(url: Optional[str]) -> Optional[str]:
+    """File of an ``/uploads/...`` URL (``None`` for external URLs and missing files)."""
+    if not url or not url.startswith("/uploads/"):
+        return None
+    path = os.path.normpath(os.path.join(UPLOADS_DIR, url[len("/uploads/"):]))
+    if not path.startswith(UPLOADS_DIR + os.sep) or not os.path.isfile(path):
+        return None
+    return path
+
+
+def _source_version(path: Optional[str]) -> Optional[str]:
+    """Version of an original (mtime and size): a new upload to the same URL changes it.
+
+    Files of the content-addressed store never change: their version is the hash in the name.
+    """
+    if path is None:
+        return None
+    if os.path.dirname(path).startswith(BLOBS_DIR + os.sep):
+        return os.path.basename(path).split(".")[0]
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def is_current(variants: Optional[dict], url: Optional[str]) -> bool:
+    """Whether ``variants`` is the map of the file now at ``url`` (no map is current for no local file)."""
+    version = _source_version(_source_path(url))
+    if variants is None:
+        return version is None
+    return variants.get("source") == url and variants.get("version") == version
+
+
+def variant_map(url: str, version: str, rendered: dict) -> dict:
+    """Public map of the rendered variants of the image at ``url`` (URLs and ``srcset`` strings)."""
+    base = url.rsplit("/", 1)[0]
+    variants: dict = {"source": url, "version": version}
+    srcset: dict[str, list[str]] = {}
+    for name, entry in rendered.items():
+        variants[name] = {"width": entry["width"], "height": entry["height"]}
+        for fmt, output in entry.items():
+            if fmt in ("width", "height"):
+                continue
+            variants[name][fmt] = f"{base}/{output}"
+            srcset.setdefault(fmt, []).append(f"{base}/{output} {entry['width']}w")
+    if srcset:
+        variants["srcset"] = {fmt: ", ".join(items) for fmt, items in srcset.items()}
+    return variants
+
+
+def _store_variants(target: str, entity_id: int, url: str, version: str, future: Future) -> None:
+    with _lock:
+        _pending.discard((target, entity_id, url, version))
+    if future.cancelled():
+        return  # shutdown: volta a ser agendada na próxima escrita (ou pela CLI)
+    try:
+        rendered = future.result()
+    except BrokenProcessPool as e:
+        _reset_pool()
+        print(f"⚠️ Image variants failed for {url}: {e}")
+        return
+    except Exception as e:
+        # Original ilegível: mapa sem variantes, para não repetir a tentativa a cada escrita
+        print(f"⚠️ Image variants failed for {url}: {e}")
+        rendered = {}
+
+    model, url_attr, variants_attr = IMAGE_TARGETS[target]
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+    try:
+        entity = db.get(model, entity_id)
+        if entity is None or getattr(entity, url_attr) != url or _source_version(_source_path(url)) != version:
+            return  # apagado, ou já com um upload mais recente (que tem a sua própria renderização)
+        setattr(entity, variants_attr, variant_map(url, version, rendered))
+        db.commit()
+        # Só o cartão do feed leva o mapa; a entidade em si não mudou (nada a anunciar nem a reindexar)
+        sync_feed_item(db, entity)
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Storing image variants failed for {url}: {e}")
+    finally:
+        db.close()
+
+
+def _rendered(target: str, entity_id: int, url: str, version: str, future: Future) -> None:
+    # Corre na thread de resultados do pool: só entrega a gravação a outra thread
+    try:
+        _get_store_executor().submit(_store_variants, target, entity_id, url, version, future)
+    except RuntimeError:
+        with _lock:
+            _pending.discard((target, entity_id, url, version))  # a encerrar
+
+
+def schedule_variants(target: str, entity_id: int, url: Optional[str]) -> Optional[Future]:
+    """Render the variants of the image at ``url`` in the process pool (no-op for external URLs)."""
+    source = _source_path(url)
+    version = _source_version(source)
+    if version is None:
+        return None
+    key = (target, entity_id, url, version)
+    with _lock:
+        if key in _pending:
+            return None
+        _pending.add(key)
+    try:
+        future = _get_pool().submit(render_variants, source, variant_widths(), variant_formats())
+    except RuntimeError:
+        with _lock:
+            _pending.discard(key)
+        return None  # pool já encerrado (shutdown)
+    future.add_done_callback(lambda done: _rendered(target, entity_id, url, version, done))
+    return future
+
+
+def sync_variants(db: Session, entity) -> None:
+    """Schedule the images of a committed entity whose variant map is missing or stale.
+
+    A map left from a previous upload (or a removed image) is cleared first,
+    so responses never point at variants of another image.
+    """
+    stale = False
+    for target, (model, url_attr, variants_attr) in IMAGE_TARGETS.items():
+        if not isinstance(entity, model):
+            continue
+        url = getattr(entity, url_attr)
+        variants = getattr(entity, variants_attr)
+        if is_current(variants, url):
+            continue
+        if variants is not None:
+            setattr(entity, variants_attr, None)
+            stale = True
+        schedule_variants(target, entity.id, url)
+    if stale:
+        db.commit()
+
+
+def wait_for_renders() -> None:
+    """Wait for every scheduled render and stored map, then stop the pool (CLIs)."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+    _stop_store_executor(wait=True)
+
+
+def shutdown_pool(wait: bool = True) -> None:
+    """Stop the pool; renders not yet started are dropped (rescheduled on the next write)."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+    _stop_store_executor(wait=wait)
+
+
+def main():
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+    futures = []
+    try:
+        for target, (model, url_attr, variants_attr) in IMAGE_TARGETS.items():
+            url_column, variants_column = getattr(model, url_attr), getattr(model, variants_attr)
+            rows = db.execute(
+                select(model.id, url_column, variants_column).where(url_column.like("/uploads/%"))
+            ).all()
+            stale = [(entity_id, url) for entity_id, url, variants in rows if not is_current(variants, url)]
+            for entity_id, url in stale:
+                future = schedule_variants(target, entity_id, url)
+                if future is not None:
+                    futures.append(future)
+            print(f"   {target}: {len(stale)} de {len(rows)} imagens sem variantes atuais")
+    finally:
+        db.close()
+    wait_for_renders()
+    print(f"✅ Variantes geradas para {len(futures)} imagens ({', '.join(variant_formats())})")
+
+
+if __name__ == "__main__":
+    main()
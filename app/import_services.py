@@ -0,0 +1,271 @@
+"""
+Importação em massa de serviços a partir de um ficheiro CSV ou JSONL.
+
+O ficheiro é lido em streaming, registo a registo. Cada registo é validado
+contra ``ServiceCreate`` (e os limites das colunas) e os válidos são
+gravados em lotes de ``IMPORT_BATCH_SIZE`` com COPY (ids reservados numa
+única query à sequência), um commit por lote. Um lote rejeitado pela base
+de dados é repetido linha a linha, para que só as linhas culpadas falhem.
+O resultado é um relatório com os erros por linha.
+
+Colunas (CSV) ou chaves (JSONL): company_id, title, description, price,
+category, tags (lista ou texto separado por vírgulas), status, is_promoted.
+Linhas sem company_id usam a empresa por omissão (``--company-id``).
+
+Uso (a partir da raiz do projeto):
+    python -m app.import_services servicos.csv --company-id 12
+    python -m app.import_services servicos.jsonl
+"""
+import argparse
+import csv
+import json
+import math
+import time
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from . import hooks
+from .database import get_session_local
+from .models import Company, Service
+from .schemas import ServiceCreate
+from .settings import settings
+
+FORMATS = ("csv", "jsonl")
+STATUSES = ("Ativo", "Pausado")
+
+# Colunas de ServiceCreate gravadas pela importação
+COLUMNS = ("company_id", "title", "description", "price", "category", "tags", "status", "is_promoted")
+
+
+class ImportReport:
+    """Counts and per-line errors of one import (at most ``IMPORT_MAX_ERRORS`` listed)."""
+
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors: list[dict] = []
+        self.stopped: Optional[str] = None
+
+    def fail(self, line: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < settings.IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+    def as_dict(self) -> dict:
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda error: error["line"]),
+            "errors_truncated": self.failed > len(self.errors),
+            "stopped": self.stopped,
+        }
+
+
+def detect_format(filename: Optional[str], explicit: Optional[str] = None) -> str:
+    """``csv`` or ``jsonl``, from ``explicit`` or the file extension."""
+    fmt = (explicit or (filename or "").rsplit(".", 1)[-1]).lower()
+    fmt = "jsonl" if fmt == "ndjson" else fmt
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported import format '{fmt}' (use csv or jsonl)")
+    return fmt
+
+
+def read_records(stream: Iterable[str], fmt: str) -> Iterator[tuple[int, Optional[dict], Optional[str]]]:
+    """``(line, record, error)`` for every record of a text stream, read lazily."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        try:
+            for record in reader:
+                yield reader.line_num, record, None
+        except csv.Error as e:
+            yield reader.line_num, None, f"Invalid CSV: {e}"
+        return
+    for line, raw in enumerate(stream, 1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except json.JSONDecodeError as e:
+            yield line, None, f"Invalid JSON: {e.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield line, None, "Invalid JSON: expected an object"
+            continue
+        yield line, record, None
+
+
+def _clean(record: dict, default_company_id: Optional[int]) -> dict:
+    values = {}
+    for key, value in record.items():
+        if key is None:
+            continue  # campos a mais numa linha CSV
+        if isinstance(value, str):
+            value = value.strip()
+        if value not in ("", None):
+            values[key.strip()] = value
+    if isinstance(values.get("tags"), str):
+        values["tags"] = [tag.strip() for tag in values["tags"].split(",") if tag.strip()]
+    if "company_id" not in values and default_company_id is not None:
+        values["company_id"] = default_company_id
+    return values
+
+
+def validate_row(record: dict, default_company_id: Optional[int] = None) -> dict:
+    """Column values of a valid record; raises ``ValueError`` with the reasons otherwise."""
+    try:
+        service = ServiceCreate(**_clean(record, default_company_id))
+    except ValidationError as e:
+        raise ValueError("; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+        )) from None
+    row = service.model_dump(include=set(COLUMNS))
+    row["status"] = row["status"] or "Ativo"
+    row["is_promoted"] = bool(row["is_promoted"])
+    if not row["title"]:
+        raise ValueError("title: must not be empty")
+    if row["status"] not in STATUSES:
+        raise ValueError(f"status: must be one of {', '.join(STATUSES)}")
+    if row["price"] is not None and (not math.isfinite(row["price"]) or row["price"] < 0):
+        raise ValueError("price: must be a non-negative number")
+    for column in ("title", "category"):
+        limit = Service.__table__.c[column].type.length
+        if row[column] is not None and len(row[column]) > limit:
+            raise ValueError(f"{column}: at most {limit} characters")
+    return row
+
+
+def _copy_rows(db: Session, rows: list[dict]) -> list[int]:
+    """COPY ``rows`` into services in the session's transaction; returns their ids."""
+    ids = db.execute(
+        text("SELECT nextval(pg_get_serial_sequence('services', 'id')) FROM generate_series(1, :n)"),
+        {"n": len(rows)},
+    ).scalars().all()
+    now = datetime.utcnow()
+    cursor = db.connection().connection.cursor()
+    columns = ", ".join(COLUMNS)
+    with cursor.copy(f"COPY services (id, {columns}, views, leads, likes, created_at, updated_at) FROM STDIN") as copy:
+        for service_id, row in zip(ids, rows):
+            copy.write_row((service_id, *(row[column] for column in COLUMNS), 0, 0, 0, now, now))
+    return ids
+
+
+def _insert_rows(db: Session, batch: list[tuple[int, dict]], report: ImportReport) -> list[tuple[int, dict]]:
+    """Insert a batch (COPY, or one savepoint per row when COPY fails); returns ``(id, row)`` written."""
+    try:
+        ids = _copy_rows(db, [row for _, row in batch])
+        db.commit()
+        return list(zip(ids, (row for _, row in batch)))
+    except Exception:
+        # Erros do COPY vêm do driver (não são SQLAlchemyError); a repetição linha a linha identifica-os
+        db.rollback()
+    written = []
+    for line, row in batch:
+        try:
+            with db.begin_nested():
+                written.append((db.execute(insert(Service).values(**row).returning(Service.id)).scalar_one(), row))
+        except SQLAlchemyError as e:
+            report.fail(line, str(getattr(e, "orig", e)).splitlines()[0])
+    db.commit()
+    return written
+
+
+def _import_batch(db: Session, batch: list[tuple[int, dict]], report: ImportReport,
+                  owned_company_ids: Optional[set[int]]) -> None:
+    company_ids = {row["company_id"] for _, row in batch}
+    if owned_company_ids is None:
+        allowed = set(db.execute(select(Company.id).where(Company.id.in_(company_ids))).scalars())
+        reason = "Company not found"
+    else:
+        allowed = company_ids & owned_company_ids
+        reason = "Not allowed"
+    rows = []
+    for line, row in batch:
+        if row["company_id"] in allowed:
+            rows.append((line, row))
+        else:
+            report.fail(line, f"company_id {row['company_id']}: {reason}")
+    if not rows:
+        return
+    written = _insert_rows(db, rows, report)
+    report.imported += len(written)
+    hooks.services_imported(db, [Service(id=service_id, **row) for service_id, row in written])
+
+
+def import_services(
+    db: Session,
+    stream: Iterable[str],
+    fmt: str,
+    default_company_id: Optional[int] = None,
+    owned_company_ids: Optional[set[int]] = None,
+    max_rows: Optional[int] = None,
+) -> dict:
+    """Import the services of a CSV/JSONL text stream and return the report.
+
+    ``owned_company_ids`` restricts the rows to those companies (HTTP import
+    of a user); without it any existing company is accepted (CLI).
+    """
+    start = time.perf_counter()
+    report = ImportReport()
+    batch: list[tuple[int, dict]] = []
+    seen = 0
+    try:
+        for line, record, error in read_records(stream, fmt):
+            if max_rows is not None and seen >= max_rows:
+                report.stopped = f"Row limit of {max_rows} reached at line {line}; the rest of the file was not read"
+                break
+            seen += 1
+            if error:
+                report.fail(line, error)
+                continue
+            try:
+                batch.append((line, validate_row(record, default_company_id)))
+            except ValueError as e:
+                report.fail(line, str(e))
+                continue
+            if len(batch) >= settings.IMPORT_BATCH_SIZE:
+                _import_batch(db, batch, report, owned_company_ids)
+                batch = []
+    except UnicodeDecodeError:
+        report.stopped = "File is not valid UTF-8; the rest of the file was not read"
+    if batch:
+        _import_batch(db, batch, report, owned_company_ids)
+    result = report.as_dict()
+    result["elapsed_ms"] = round((time.perf_counter() - start) * 1000)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa serviços de um ficheiro CSV ou JSONL")
+    parser.add_argument("path")
+    parser.add_argument("--company-id", type=int, help="empresa das linhas sem company_id")
+    parser.add_argument("--format", choices=FORMATS, help="por omissão, a extensão do ficheiro")
+    args = parser.parse_args()
+    try:
+        fmt = detect_format(args.path, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+    try:
+        with open(args.path, encoding="utf-8-sig", newline="") as stream:
+            report = import_services(db, stream, fmt, default_company_id=args.company_id)
+    finally:
+        db.close()
+    print(
+        f"✅ {report['imported']} serviços importados em {report['elapsed_ms'] / 1000:.1f}s; "
+        f"{report['failed']} linhas com erro"
+    )
+    for error in report["errors"]:
+        print(f"   linha {error['line']}: {error['error']}")
+    if report["stopped"]:
+        print(f"⚠️ {report['stopped']}")
+
+
+if __name__ == "__main__":
+    main()
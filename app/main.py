@@ -12,6 +12,14 @@ from .routers import files as files_router
 from .routers import search as search_router
 from fastapi.staticfiles import StaticFiles
 from .settings import settings
+from . import tasks
+from .search_backend import refresh_tag_stats
+from .suggest import build_suggest_index
+from .feed import refresh_feed_scores
+from .broadcast import relay_feed_events
+from .engagement import flush_engagement
+from .images import shutdown_pool
+from .storage import BLOBS_DIR, ImmutableStaticFiles, collect_garbage
 
 app = FastAPI(title="BizLinkApi", version="0.1.0")
 
@@ -22,6 +30,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cabeçalhos de paginação lidos pelo frontend
+    expose_headers=["X-Shuffle-Seed", "X-Next-Cursor", "X-Total-Count"],
 )
 
 # GZip compression
@@ -42,6 +52,9 @@ try:
     import os
     uploads_dir = os.path.join(os.path.dirname(__file__), "uploads")
     os.makedirs(uploads_dir, exist_ok=True)
+    # Ficheiros por conteúdo (o URL muda com o conteúdo): cache de longa duração no cliente
+    os.makedirs(BLOBS_DIR, exist_ok=True)
+    app.mount("/uploads/blobs", ImmutableStaticFiles(directory=BLOBS_DIR), name="upload_blobs")
     app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
 except Exception as e:
     print(f"Warning: Could not mount uploads directory: {e}")
@@ -68,6 +81,29 @@ async def startup_event():
         print(f"⚠️ Database connection failed: {e}")
         # Don't fail the app startup, just log the warning
 
+    # Background jobs
+    tasks.start_periodic("tag-stats", settings.TAG_STATS_REFRESH_SECONDS, refresh_tag_stats)
+    tasks.start_periodic("feed-scores", settings.FEED_SCORE_REFRESH_SECONDS, refresh_feed_scores)
+    tasks.start_periodic("feed-stream-relay", settings.FEED_STREAM_RELAY_SECONDS, relay_feed_events)
+    tasks.start_periodic("engagement-flush", settings.ENGAGEMENT_FLUSH_SECONDS, flush_engagement, delay=True)
+    tasks.start_periodic("upload-gc", settings.UPLOAD_GC_SECONDS, collect_garbage, delay=True)
+    # Índice de sugestões: construído antes de aceitar pedidos, depois reconstruído periodicamente
+    try:
+        await tasks.run_once(build_suggest_index)
+    except Exception as e:
+        print(f"⚠️ Suggest index build failed: {e}")
+    tasks.start_periodic("suggest-index", settings.SUGGEST_REBUILD_SECONDS, build_suggest_index, delay=True)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await tasks.stop_all()
+    # Contadores ainda em buffer não se perdem num shutdown ordenado
+    try:
+        await tasks.run_once(flush_engagement)
+    except Exception as e:
+        print(f"⚠️ Engagement flush on shutdown failed: {e}")
+    shutdown_pool()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
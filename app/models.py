@@ -1,11 +1,15 @@
 
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float, Text, DateTime, ARRAY
+from sqlalchemy import BigInteger, Column, Integer, SmallInteger, String, Boolean, ForeignKey, Float, Text, DateTime, Computed, Index, text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSVECTOR
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from .database import Base
 from datetime import datetime
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     email: Mapped[str] = mapped_column(String(255), unique=True, index=True, nullable=False)
@@ -15,12 +19,32 @@ class User(Base):
     # Novos campos opcionais
     profile_photo_url: Mapped[str | None] = mapped_column(String(512), nullable=True)
     cover_photo_url: Mapped[str | None] = mapped_column(String(512), nullable=True)
+    # Variantes redimensionadas das fotos (mapa de app/images.py)
+    profile_photo_variants: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    cover_photo_variants: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
     gender: Mapped[str | None] = mapped_column(String(20), nullable=True)  # 'Masculino', 'Feminino', 'Outro'
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_default=text("timezone('utc', now())"))
+    # Full-text search (coluna gerada pelo PostgreSQL)
+    search_vector: Mapped[str | None] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('portuguese_unaccent', coalesce(full_name, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(email, '')), 'B')",
+            persisted=True,
+        ),
+        nullable=True,
+    )
 
     companies: Mapped[list["Company"]] = relationship("Company", back_populates="owner")
 
 class Company(Base):
     __tablename__ = "companies"
+    __table_args__ = (
+        Index("ix_companies_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_companies_name_norm_trgm", "name_norm", postgresql_using="gin", postgresql_ops={"name_norm": "gin_trgm_ops"}),
+        Index("ix_companies_province_norm_trgm", "province_norm", postgresql_using="gin", postgresql_ops={"province_norm": "gin_trgm_ops"}),
+        Index("ix_companies_district_norm_trgm", "district_norm", postgresql_using="gin", postgresql_ops={"district_norm": "gin_trgm_ops"}),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(255), unique=True, index=True, nullable=False)
@@ -29,6 +53,9 @@ class Company(Base):
     # Extended fields
     logo_url: Mapped[str | None] = mapped_column(String(512), nullable=True)
     cover_url: Mapped[str | None] = mapped_column(String(512), nullable=True)
+    # Variantes redimensionadas do logo e da capa (mapa de app/images.py)
+    logo_variants: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    cover_variants: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
     nuit: Mapped[str | None] = mapped_column(String(50), nullable=True)
     nationality: Mapped[str | None] = mapped_column(String(100), nullable=True)
     province: Mapped[str | None] = mapped_column(String(100), nullable=True)
@@ -37,6 +64,23 @@ class Company(Base):
     website: Mapped[str | None] = mapped_column(String(255), nullable=True)
     email: Mapped[str | None] = mapped_column(String(255), nullable=True)
     whatsapp: Mapped[str | None] = mapped_column(String(50), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_default=text("timezone('utc', now())"))
+    # Colunas normalizadas (minúsculas, sem acentos) usadas pela pesquisa
+    name_norm: Mapped[str | None] = mapped_column(String(255), Computed("lower(f_unaccent(name))", persisted=True), nullable=True)
+    province_norm: Mapped[str | None] = mapped_column(String(100), Computed("lower(f_unaccent(province))", persisted=True), nullable=True)
+    district_norm: Mapped[str | None] = mapped_column(String(100), Computed("lower(f_unaccent(district))", persisted=True), nullable=True)
+    # Full-text search (coluna gerada pelo PostgreSQL)
+    search_vector: Mapped[str | None] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('portuguese_unaccent', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('portuguese_unaccent', coalesce(province, '') || ' ' || coalesce(district, '')), 'B') || "
+            "setweight(to_tsvector('portuguese_unaccent', coalesce(description, '')), 'C') || "
+            "setweight(to_tsvector('portuguese_unaccent', coalesce(address, '') || ' ' || coalesce(nationality, '')), 'D')",
+            persisted=True,
+        ),
+        nullable=True,
+    )
 
     owner: Mapped[User] = relationship("User", back_populates="companies")
     services: Mapped[list["Service"]] = relationship("Service", back_populates="company", cascade="all, delete-orphan")
@@ -73,6 +117,10 @@ class CreditTransaction(Base):
 
 class CompanyPortfolio(Base):
     __tablename__ = "company_portfolios"
+    __table_args__ = (
+        Index("ix_company_portfolios_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_company_portfolios_title_norm_trgm", "title_norm", postgresql_using="gin", postgresql_ops={"title_norm": "gin_trgm_ops"}),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     company_id: Mapped[int] = mapped_column(Integer, ForeignKey("companies.id"), index=True)
@@ -81,11 +129,31 @@ class CompanyPortfolio(Base):
     media_url: Mapped[str | None] = mapped_column(String(512), nullable=True)
     link: Mapped[str | None] = mapped_column(String(512), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Coluna normalizada (minúsculas, sem acentos) usada pela pesquisa
+    title_norm: Mapped[str | None] = mapped_column(String(255), Computed("lower(f_unaccent(title))", persisted=True), nullable=True)
+    # Full-text search (coluna gerada pelo PostgreSQL)
+    search_vector: Mapped[str | None] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('portuguese_unaccent', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('portuguese_unaccent', coalesce(description, '')), 'C')",
+            persisted=True,
+        ),
+        nullable=True,
+    )
 
     company: Mapped[Company] = relationship("Company", back_populates="portfolios")
 
 class Service(Base):
     __tablename__ = "services"
+    __table_args__ = (
+        Index("ix_services_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_services_title_norm_trgm", "title_norm", postgresql_using="gin", postgresql_ops={"title_norm": "gin_trgm_ops"}),
+        Index("ix_services_category_norm_trgm", "category_norm", postgresql_using="gin", postgresql_ops={"category_norm": "gin_trgm_ops"}),
+        Index("ix_services_tags_norm", "tags_norm", postgresql_using="gin"),
+        Index("ix_services_random_key", "random_key", "id"),
+        Index("ix_services_company_status_created", "company_id", "status", text("created_at DESC"), text("id DESC")),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     company_id: Mapped[int] = mapped_column(Integer, ForeignKey("companies.id"), index=True)
@@ -93,6 +161,8 @@ class Service(Base):
     description: Mapped[str | None] = mapped_column(Text, nullable=True)
     price: Mapped[float | None] = mapped_column(Float, nullable=True)
     image_url: Mapped[str | None] = mapped_column(String(512), nullable=True)
+    # Variantes redimensionadas da imagem (mapa de app/images.py)
+    image_variants: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
     category: Mapped[str | None] = mapped_column(String(100), nullable=True)
     tags: Mapped[list[str] | None] = mapped_column(ARRAY(String), nullable=True)
     status: Mapped[str] = mapped_column(String(20), default="Ativo")  # 'Ativo' | 'Pausado'
@@ -102,5 +172,77 @@ class Service(Base):
     is_promoted: Mapped[bool] = mapped_column(Boolean, default=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Posição fixa e aleatória do serviço na listagem baralhada de /services
+    random_key: Mapped[float] = mapped_column(Float, nullable=False, server_default=text("random()"))
+    # Colunas normalizadas (minúsculas, sem acentos) usadas pela pesquisa
+    title_norm: Mapped[str | None] = mapped_column(String(255), Computed("lower(f_unaccent(title))", persisted=True), nullable=True)
+    category_norm: Mapped[str | None] = mapped_column(String(100), Computed("lower(f_unaccent(category))", persisted=True), nullable=True)
+    tags_norm: Mapped[list[str] | None] = mapped_column(ARRAY(String), Computed("f_normalize_tags(tags)", persisted=True), nullable=True)
+    # Full-text search (coluna gerada pelo PostgreSQL)
+    search_vector: Mapped[str | None] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('portuguese_unaccent', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('portuguese_unaccent', coalesce(category, '')), 'B') || "
+            "setweight(to_tsvector('portuguese_unaccent', coalesce(description, '')), 'C')",
+            persisted=True,
+        ),
+        nullable=True,
+    )
 
     company: Mapped[Company] = relationship("Company", back_populates="services")
+
+# Feed unificado: uma linha por item visível, mantida a partir das escritas (ver app/feed.py)
+class FeedItem(Base):
+    __tablename__ = "feed_items"
+    __table_args__ = (
+        Index("ux_feed_items_type_entity", "type", "entity_id", unique=True),
+        Index("ix_feed_items_feed", text("created_at DESC"), text("id DESC")),
+        Index("ix_feed_items_ranked", text("score DESC"), text("id DESC")),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    type: Mapped[str] = mapped_column(String(20), nullable=False)  # 'service' | 'company' | 'user' | 'portfolio'
+    entity_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    score: Mapped[float] = mapped_column(Float, default=0.0, server_default=text("0"))
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)  # cartão desnormalizado servido pelo feed
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Gostos de serviços por utilizador (um por par; alimenta as preferências do feed personalizado)
+class ServiceLike(Base):
+    __tablename__ = "service_likes"
+
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    service_id: Mapped[int] = mapped_column(Integer, ForeignKey("services.id", ondelete="CASCADE"), primary_key=True, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+# Vetores de preferência por utilizador ({chave normalizada: peso}), atualizados por incrementos (ver app/preferences.py)
+class UserPreference(Base):
+    __tablename__ = "user_preferences"
+
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    categories: Mapped[dict] = mapped_column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))  # categorias vistas
+    tags: Mapped[dict] = mapped_column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))  # tags de serviços gostados
+    provinces: Mapped[dict] = mapped_column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))  # províncias das empresas próprias
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Totais exatos mantidos por triggers de instrução ("services", "services:active", "companies", ...; ver app/counts.py)
+class RowCount(Base):
+    __tablename__ = "row_counts"
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    # Cada contador tem várias linhas (shards), atualizadas ao acaso; o total é a soma
+    shard: Mapped[int] = mapped_column(SmallInteger, primary_key=True, server_default=text("0"))
+    value: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default=text("0"))
+
+# Ficheiros de /uploads/blobs com o número de colunas de URL que os referem (triggers; ver app/storage.py)
+class UploadBlob(Base):
+    __tablename__ = "upload_blobs"
+    __table_args__ = (
+        Index("ix_upload_blobs_released", "released_at", postgresql_where=text("refs = 0")),
+    )
+
+    url: Mapped[str] = mapped_column(String(512), primary_key=True)
+    refs: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    released_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)  # refs chegou a 0
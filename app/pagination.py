@@ -0,0 +1,27 @@
+"""
+Opaque cursor tokens for keyset pagination.
+
+A cursor is the JSON position of the last item of a page (e.g. its rank
+and id), base64url-encoded so clients treat it as an opaque string.
+"""
+import base64
+import json
+
+from fastapi import HTTPException
+
+
+def encode_cursor(position: dict) -> str:
+    raw = json.dumps(position, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token: str) -> dict:
+    """Decode a cursor, raising HTTP 400 when it is malformed."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(position, dict):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return position
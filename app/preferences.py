@@ -0,0 +1,128 @@
+"""
+Per-user preference vectors for the personalized feed (``/search/feed/me``).
+
+A vector is three maps of normalized key -> weight, one row of
+``user_preferences``:
+
+* ``categories``: categories of the services the user viewed;
+* ``tags``: tags of the services the user liked;
+* ``provinces``: provinces of the companies the user owns.
+
+Signals never rescan the history: a view or a like adds its delta to the
+stored maps in one ``INSERT ... ON CONFLICT DO UPDATE`` (atomic under
+concurrent signals) and the merged map it returns replaces that map in the
+worker's cache. Reading a vector is a cache hit or a primary key lookup.
+Other workers see a signal once their cached entry expires.
+"""
+import json
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from .cache import preference_cache
+from .models import Company, Service, ServiceLike, UserPreference
+from .search_backend import normalize_query
+
+PREFERENCE_FIELDS = ("categories", "tags", "provinces")
+
+# Soma o delta ao mapa guardado; chaves com peso <= 0 são removidas
+_MERGE_SQL = """
+INSERT INTO user_preferences AS p (user_id, {field}, updated_at)
+VALUES (:user_id, CAST(:delta AS jsonb), timezone('utc', now()))
+ON CONFLICT (user_id) DO UPDATE SET
+    {field} = (
+        SELECT coalesce(jsonb_object_agg(merged.key, merged.weight), '{{}}'::jsonb)
+        FROM (
+            SELECT key, coalesce((p.{field} ->> key)::float8, 0) + coalesce((EXCLUDED.{field} ->> key)::float8, 0) AS weight
+            FROM (SELECT jsonb_object_keys(p.{field} || EXCLUDED.{field}) AS key) AS keys
+        ) AS merged
+        WHERE merged.weight > 0
+    ),
+    updated_at = EXCLUDED.updated_at
+RETURNING {field}
+"""
+
+
+def _empty_vector() -> dict:
+    return {field: {} for field in PREFERENCE_FIELDS}
+
+
+def load_preferences(db: Session, user_id: int) -> dict:
+    """``{"categories": {...}, "tags": {...}, "provinces": {...}}`` of a user (cached)."""
+    vector = preference_cache.get(user_id)
+    if vector is None:
+        row = db.get(UserPreference, user_id)
+        vector = {field: dict(getattr(row, field) or {}) for field in PREFERENCE_FIELDS} if row else _empty_vector()
+        preference_cache.set(user_id, vector)
+    return vector
+
+
+def _add(db: Session, user_id: int, field: str, keys: Iterable[Optional[str]], weight: float) -> None:
+    """Add ``weight`` to each key of one map and commit; the cached vector takes the merged map."""
+    delta: dict[str, float] = {}
+    for key in keys:
+        key = normalize_query(key or "")
+        if key:
+            delta[key] = delta.get(key, 0) + weight
+    merged = None
+    if delta:
+        merged = db.execute(
+            text(_MERGE_SQL.format(field=field)), {"user_id": user_id, "delta": json.dumps(delta)}
+        ).scalar_one()
+    db.commit()
+    cached = preference_cache.get(user_id)
+    if merged is not None and cached is not None:
+        preference_cache.set(user_id, {**cached, field: merged})
+
+
+def record_view(db: Session, user_id: int, service: Service) -> None:
+    """The user opened a service: its category gains one view."""
+    _add(db, user_id, "categories", [service.category], 1.0)
+
+
+def set_like(db: Session, user_id: int, service: Service, liked: bool) -> bool:
+    """Like or unlike a service; its tags gain or lose one like when the like actually changed.
+
+    Returns whether it changed (liking twice counts once).
+    """
+    if liked:
+        statement = insert(ServiceLike).values(user_id=user_id, service_id=service.id).on_conflict_do_nothing()
+    else:
+        statement = delete(ServiceLike).where(ServiceLike.user_id == user_id, ServiceLike.service_id == service.id)
+    changed = db.execute(statement.returning(ServiceLike.service_id)).first() is not None
+    if changed:
+        _add(db, user_id, "tags", service.tags or (), 1.0 if liked else -1.0)
+    else:
+        db.rollback()
+    return changed
+
+
+def sync_owner_provinces(db: Session, owner_id: Optional[int], exclude_company_id: Optional[int] = None) -> None:
+    """Recount the provinces of the companies of ``owner_id``, in the caller's transaction.
+
+    Owners have few companies, so this is a small indexed read done on
+    company writes only. Pass ``exclude_company_id`` for a company being deleted.
+    """
+    if owner_id is None:
+        return
+    query = select(Company.province).where(Company.owner_id == owner_id)
+    if exclude_company_id is not None:
+        query = query.where(Company.id != exclude_company_id)
+    provinces: dict[str, float] = {}
+    for (province,) in db.execute(query):
+        key = normalize_query(province or "")
+        if key:
+            provinces[key] = provinces.get(key, 0) + 1
+    db.execute(
+        text(
+            """
+            INSERT INTO user_preferences AS p (user_id, provinces, updated_at)
+            VALUES (:user_id, CAST(:provinces AS jsonb), timezone('utc', now()))
+            ON CONFLICT (user_id) DO UPDATE SET provinces = EXCLUDED.provinces, updated_at = EXCLUDED.updated_at
+            """
+        ),
+        {"user_id": owner_id, "provinces": json.dumps(provinces)},
+    )
+    preference_cache.delete(owner_id)
@@ -0,0 +1,26 @@
+"""
+Reconstrói a tabela feed_items a partir de serviços, empresas, usuários e portfólios.
+
+Uso (a partir da raiz do projeto):
+    python -m app.rebuild_feed
+"""
+import time
+
+from .database import get_session_local
+from .feed import rebuild_feed_items
+
+
+def main():
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        counts = rebuild_feed_items(db)
+        elapsed = time.perf_counter() - start
+        print(f"✅ Feed reconstruído em {elapsed:.1f}s: " + ", ".join(f"{kind}={count}" for kind, count in counts.items()))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 
 from .. import auth as auth_utils
+from .. import hooks
 from ..database import get_db
 from ..models import User
 from ..schemas import Token, UserCreate, UserOut
@@ -22,6 +23,7 @@ def register(user_in: UserCreate, db: Session = Depends(get_db)):
     db.add(user)
     db.commit()
     db.refresh(user)
+    hooks.entity_saved(db, user)
     return user
 
 @router.post("/login", response_model=Token)
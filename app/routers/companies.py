@@ -1,62 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, UploadFile, File, Form
 from sqlalchemy.orm import Session
-import os
 from typing import Optional, Annotated
 
+from .. import hooks, storage
+from ..counts import exact_count
 from ..database import get_db
 from ..deps import get_current_active_user
 from ..models import Company, User
 from ..schemas import CompanyCreate, CompanyOut, CompanyUpdate
+from ..streaming import companies_query, export_response
 
 router = APIRouter()
 
-def _uploads_base_dir() -> str:
-    """Absolute path to app/uploads directory (the one mounted at /uploads)."""
-    return os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "uploads"))
-
-def save_company_logo(company_id: int, file: UploadFile) -> Optional[str]:
-    """Save company logo and return the URL path under /uploads."""
-    if not file:
-        return None
-
-    base_dir = _uploads_base_dir()
-    upload_dir = os.path.join(base_dir, "company_logos", str(company_id))
-    os.makedirs(upload_dir, exist_ok=True)
-
-    # Generate a safe filename
-    file_extension = os.path.splitext(file.filename)[1]
-    filename = f"logo{file_extension}"
-    file_path = os.path.join(upload_dir, filename)
-
-    # Save the file
-    with open(file_path, "wb") as buffer:
-        buffer.write(file.file.read())
-
-    # Public URL relative to /uploads
-    return "/uploads/" + "/".join(["company_logos", str(company_id), filename])
-
-def save_company_cover(company_id: int, file: UploadFile) -> Optional[str]:
-    """Save company cover and return the URL path under /uploads."""
-    if not file:
-        return None
-
-    base_dir = _uploads_base_dir()
-    upload_dir = os.path.join(base_dir, "company_covers", str(company_id))
-    os.makedirs(upload_dir, exist_ok=True)
-
-    # Generate a safe filename
-    file_extension = os.path.splitext(file.filename)[1]
-    filename = f"cover{file_extension}"
-    file_path = os.path.join(upload_dir, filename)
-
-    # Save the file
-    with open(file_path, "wb") as buffer:
-        buffer.write(file.file.read())
-
-    # Public URL relative to /uploads
-    return "/uploads/" + "/".join(["company_covers", str(company_id), filename])
-
-
 @router.post("/", response_model=CompanyOut, status_code=status.HTTP_201_CREATED)
 async def create_company(
     name: str = Form(...),
@@ -104,26 +59,35 @@ async def create_company(
     # Handle file uploads after company is created
     try:
         if logo:
-            company.logo_url = save_company_logo(company.id, logo)
+            company.logo_url = await storage.save_upload(logo)
         if cover:
-            company.cover_url = save_company_cover(company.id, cover)
+            company.cover_url = await storage.save_upload(cover)
         db.commit()
         db.refresh(company)
     except Exception as e:
         # If file upload fails, delete the company
         db.delete(company)
         db.commit()
+        if isinstance(e, HTTPException):
+            raise  # ficheiro rejeitado (tipo, tamanho): o cliente recebe o motivo
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error uploading files: {str(e)}"
         )
     
+    hooks.entity_saved(db, company, created=True)
     return company
 
 @router.get("/", response_model=list[CompanyOut])
-def list_companies(db: Session = Depends(get_db)):
+def list_companies(response: Response, db: Session = Depends(get_db)):
+    response.headers["X-Total-Count"] = str(exact_count(db, "companies"))
     return db.query(Company).all()
 
+@router.get("/export", dependencies=[Depends(get_current_active_user)])
+def export_companies(file_format: str = Query("ndjson", alias="format", description="ndjson | csv")):
+    """Exporta todas as empresas em streaming (NDJSON ou CSV), com memória constante (autenticado)"""
+    return export_response(companies_query(), file_format, "companies")
+
 @router.put("/{company_id}", response_model=CompanyOut)
 async def update_company(
     company_id: int,
@@ -181,9 +145,11 @@ async def update_company(
     # Handle file uploads
     try:
         if logo:
-            company.logo_url = save_company_logo(company.id, logo)
+            company.logo_url = await storage.save_upload(logo)
         if cover:
-            company.cover_url = save_company_cover(company.id, cover)
+            company.cover_url = await storage.save_upload(cover)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -192,6 +158,7 @@ async def update_company(
     
     db.commit()
     db.refresh(company)
+    hooks.entity_saved(db, company)
     return company
 
 @router.put("/{company_id}/logo", response_model=CompanyOut)
@@ -208,10 +175,13 @@ async def update_company_logo(
         raise HTTPException(status_code=403, detail="Not authorized")
 
     try:
-        company.logo_url = save_company_logo(company.id, logo)
+        company.logo_url = await storage.save_upload(logo)
         db.commit()
         db.refresh(company)
+        hooks.entity_saved(db, company)
         return company
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading logo: {str(e)}")
 
@@ -229,10 +199,13 @@ async def update_company_cover(
         raise HTTPException(status_code=403, detail="Not authorized")
 
     try:
-        company.cover_url = save_company_cover(company.id, cover)
+        company.cover_url = await storage.save_upload(cover)
         db.commit()
         db.refresh(company)
+        hooks.entity_saved(db, company)
         return company
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading cover: {str(e)}")
 
@@ -253,6 +226,7 @@ def delete_company(company_id: int, db: Session = Depends(get_db), current_user:
         raise HTTPException(status_code=404, detail="Company not found")
     if company.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not allowed")
+    hooks.entity_deleted(db, company)
     db.delete(company)
     db.commit()
     return {"ok": True}
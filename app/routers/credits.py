@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 from ..database import get_db
 from ..deps import get_current_active_user
 from ..models import CompanyCredit, CreditTransaction, Company, User
 from ..schemas import CompanyCreditOut, CreditTransactionOut, CreditTransactionCreate
+from ..streaming import export_response, transactions_query
 
 router = APIRouter()
 
@@ -210,3 +212,23 @@ async def get_company_balance(
         "total_spent": credit.total_spent,
         "last_updated": credit.updated_at
     }
+
+@router.get("/transactions/export")
+def export_transactions(
+    file_format: str = Query("ndjson", alias="format", description="ndjson | csv"),
+    company_id: Optional[int] = Query(None, description="Exportar apenas as transações desta empresa"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Exporta em streaming (NDJSON ou CSV) as transações de crédito das empresas do usuário"""
+    query = transactions_query().where(
+        CompanyCredit.company_id.in_(select(Company.id).where(Company.owner_id == current_user.id))
+    )
+    if company_id is not None:
+        company = db.get(Company, company_id)
+        if not company:
+            raise HTTPException(status_code=404, detail="Company not found")
+        if company.owner_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Not allowed")
+        query = query.where(CompanyCredit.company_id == company_id)
+    return export_response(query, file_format, "transactions")
@@ -1,8 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from sqlalchemy.orm import Session
-from typing import Optional
-import os
 
+from .. import hooks, storage
 from ..database import get_db
 from ..deps import get_current_active_user
 from ..models import User
@@ -10,28 +9,6 @@ from ..schemas import UserOut, UserUpdate
 
 router = APIRouter()
 
-# Helpers for image saving
-def _uploads_base_dir():
-    return os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "uploads"))
-
-def save_user_photo(user_id: int, file: UploadFile, photo_type: str) -> Optional[str]:
-    """Salva foto do usuário (profile ou cover)"""
-    if not file:
-        return None
-    
-    base_dir = _uploads_base_dir()
-    upload_dir = os.path.join(base_dir, "user_photos", str(user_id))
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    ext = os.path.splitext(file.filename)[1]
-    filename = f"{photo_type}{ext}"
-    file_path = os.path.join(upload_dir, filename)
-    
-    with open(file_path, "wb") as buffer:
-        buffer.write(file.file.read())
-    
-    return "/uploads/" + "/".join(["user_photos", str(user_id), filename])
-
 @router.get("/me", response_model=UserOut)
 async def get_my_profile(current_user: User = Depends(get_current_active_user)):
     """Retorna o perfil do usuário logado"""
@@ -60,6 +37,7 @@ async def update_my_profile(
     
     db.commit()
     db.refresh(current_user)
+    hooks.entity_saved(db, current_user)
     return current_user
 
 @router.put("/me/profile-photo", response_model=UserOut)
@@ -75,14 +53,17 @@ async def upload_profile_photo(
     
     try:
         # Salvar foto
-        photo_url = save_user_photo(current_user.id, photo, "profile")
+        photo_url = await storage.save_upload(photo)
         
         # Atualizar usuário
         current_user.profile_photo_url = photo_url
         db.commit()
         db.refresh(current_user)
+        hooks.entity_saved(db, current_user)
         
         return current_user
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading photo: {str(e)}")
 
@@ -99,14 +80,17 @@ async def upload_cover_photo(
     
     try:
         # Salvar foto
-        photo_url = save_user_photo(current_user.id, photo, "cover")
+        photo_url = await storage.save_upload(photo)
         
         # Atualizar usuário
         current_user.cover_photo_url = photo_url
         db.commit()
         db.refresh(current_user)
+        hooks.entity_saved(db, current_user)
         
         return current_user
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading photo: {str(e)}")
 
@@ -121,6 +105,7 @@ async def remove_profile_photo(
         current_user.profile_photo_url = None
         db.commit()
         db.refresh(current_user)
+        hooks.entity_saved(db, current_user)
     
     return current_user
 
@@ -135,5 +120,6 @@ async def remove_cover_photo(
         current_user.cover_photo_url = None
         db.commit()
         db.refresh(current_user)
+        hooks.entity_saved(db, current_user)
     
     return current_user
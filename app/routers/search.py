@@ -1,131 +1,116 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
-from typing import Optional
+from sqlalchemy import or_
+from starlette.concurrency import run_in_threadpool
+from typing import AsyncIterator, Optional
+from datetime import datetime
+import asyncio
+import json
 
+from ..broadcast import STREAM_TYPES, Subscriber, feed_broadcaster, new_feed_items
 from ..database import get_db
-from ..models import Service, Company, User, CompanyPortfolio
+from ..engagement import engagement_buffer
+from ..deps import get_current_active_user, require_ops_token
+from ..models import Service, Company, User
+from ..pagination import decode_cursor, encode_cursor
+from ..feed import feed_page, legacy_position, personal_feed_page
+from ..preferences import load_preferences
+from ..cache import count_cache, search_facets_cache, search_results_cache
+from ..search_backend import (
+    CARD_FIELDS, build_tsquery, compute_facets, contains_filter, normalize_query, search_all, suggest_correction, tag_filter,
+    top_tags
+)
+from ..settings import settings
+from ..suggest import BUCKET_SIZE, TERM_KINDS, suggest_index
 
 router = APIRouter()
 
+def _parse_fields(fields: Optional[str]) -> Optional[tuple[str, ...]]:
+    """Campos pedidos em fields= (respostas esparsas), validados e ordenados para a chave de cache"""
+    if not fields:
+        return None
+    wanted = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = wanted - CARD_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(sorted(wanted))
+
+def _price_edges() -> list[float]:
+    return [float(edge) for edge in settings.SEARCH_PRICE_BUCKETS.split(",") if edge.strip()]
+
+def _parse_feed_cursor(cursor: Optional[str], mode: str) -> Optional[tuple]:
+    """
+    Cursor do feed com a posição da última linha servida:
+    {"c": created_at ISO, "i": id} no modo recent, {"s": score, "i": id} no modo ranked
+    """
+    if not cursor:
+        return None
+    position = decode_cursor(cursor)
+    if not isinstance(position.get("i"), int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if mode == "ranked":
+        if not isinstance(position.get("s"), (int, float)):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return position["s"], position["i"]
+    if not isinstance(position.get("c"), str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        return datetime.fromisoformat(position["c"]), position["i"]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _feed_cursor(position: tuple, mode: str) -> str:
+    if mode == "ranked":
+        return encode_cursor({"s": position[0], "i": position[1]})
+    return encode_cursor({"c": position[0].isoformat(), "i": position[1]})
+
 @router.get("/feed")
-async def get_feed(
-    last_id: Optional[int] = None,
+def get_feed(
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Cursor de next_page_info para a próxima página"),
     limit: int = 10,
+    mode: str = Query("recent", pattern="^(recent|ranked)$", description="recent (mais recentes) ou ranked (relevância)"),
+    fields: Optional[str] = Query(None, description="Campos dos cartões separados por vírgula (o id vem sempre)"),
+    last_id: Optional[int] = Query(None, deprecated=True, description="Paginação antiga (next_page_info.last_id); use cursor"),
     db: Session = Depends(get_db)
 ):
     """
-    Feed com 10 itens por vez e paginação automática
+    Feed com 10 itens por vez e paginação por cursor
     Retorna serviços, empresas, usuários e portfólios misturados
+    recent: dos mais recentes para os mais antigos
+    ranked: por score pré-calculado (recência com decaimento, engagement e promoção)
+    Lido da tabela feed_items (um único range scan indexado), mantida a cada escrita
     """
+    if last_id is not None and cursor is None:
+        # Clientes da paginação antiga: continuam no feed recent a partir do item indicado
+        mode = "recent"
+        position = legacy_position(db, last_id)
+        response.headers["Deprecation"] = "true"
+    else:
+        position = _parse_feed_cursor(cursor, mode)
+    card_fields = _parse_fields(fields)
     
     try:
         # Limitar o limite máximo
         if limit > 50:
             limit = 50
+        if limit < 1:
+            limit = 1
         
-        # Buscar serviços ativos
-        services_query = db.query(Service).filter(Service.status == "Ativo")
-        if last_id is not None:
-            services_query = services_query.filter(Service.id < last_id)
-        services = services_query.order_by(Service.id.desc()).limit(limit).all()
-        
-        # Buscar empresas
-        companies_query = db.query(Company)
-        if last_id is not None:
-            companies_query = companies_query.filter(Company.id < last_id)
-        companies = companies_query.order_by(Company.id.desc()).limit(limit).all()
-        
-        # Buscar usuários ativos
-        users_query = db.query(User).filter(User.is_active == True)
-        if last_id is not None:
-            users_query = users_query.filter(User.id < last_id)
-        users = users_query.order_by(User.id.desc()).limit(limit).all()
-        
-        # Buscar portfólios
-        portfolios_query = db.query(CompanyPortfolio)
-        if last_id is not None:
-            portfolios_query = portfolios_query.filter(CompanyPortfolio.id < last_id)
-        portfolios = portfolios_query.order_by(CompanyPortfolio.id.desc()).limit(limit).all()
-        
-        # Combinar todos os itens
-        all_items = []
-        
-        # Adicionar serviços
-        for service in services:
-            all_items.append({
-                "id": service.id,
-                "type": "service",
-                "title": service.title,
-                "description": service.description,
-                "price": service.price,
-                "category": service.category,
-                "tags": service.tags,
-                "status": service.status,
-                "company_id": service.company_id,
-                "image_url": service.image_url,
-                "views": service.views,
-                "leads": service.leads,
-                "likes": service.likes,
-                "is_promoted": service.is_promoted,
-                "created_at": service.created_at
-            })
-        
-        # Adicionar empresas
-        for company in companies:
-            all_items.append({
-                "id": company.id,
-                "type": "company",
-                "name": company.name,
-                "description": company.description,
-                "logo_url": company.logo_url,
-                "cover_url": company.cover_url,
-                "province": company.province,
-                "district": company.district,
-                "address": company.address,
-                "nationality": company.nationality,
-                "website": company.website,
-                "email": company.email,
-                "whatsapp": company.whatsapp
-            })
-        
-        # Adicionar usuários
-        for user in users:
-            all_items.append({
-                "id": user.id,
-                "type": "user",
-                "full_name": user.full_name,
-                "email": user.email,
-                "profile_photo_url": user.profile_photo_url,
-                "cover_photo_url": user.cover_photo_url,
-                "gender": user.gender
-            })
-        
-        # Adicionar portfólios
-        for portfolio in portfolios:
-            all_items.append({
-                "id": portfolio.id,
-                "type": "portfolio",
-                "title": portfolio.title,
-                "description": portfolio.description,
-                "media_url": portfolio.media_url,
-                "link": portfolio.link,
-                "company_id": portfolio.company_id,
-                "created_at": portfolio.created_at
-            })
-        
-        # Ordenar por ID (mais recentes primeiro) e limitar
-        all_items.sort(key=lambda x: x['id'], reverse=True)
-        feed_items = all_items[:limit]
+        feed_items, last_position, has_more = feed_page(db, limit, position, ranked=mode == "ranked", fields=card_fields)
         
         # Preparar resposta
         return {
             "items": feed_items,
             "total_returned": len(feed_items),
-            "has_more": len(all_items) > limit,
+            "has_more": has_more,
+            "mode": mode,
             "next_page_info": {
-                "last_id": feed_items[-1]['id'] if feed_items else None
-            } if feed_items else None,
+                "cursor": _feed_cursor(last_position, mode),
+                # Para os clientes que ainda paginam com last_id
+                **({"last_id": feed_items[-1]["id"]} if mode == "recent" else {}),
+            } if has_more else None,
             "summary": {
                 "services_count": len([item for item in feed_items if item['type'] == 'service']),
                 "companies_count": len([item for item in feed_items if item['type'] == 'company']),
@@ -143,206 +128,314 @@ async def get_feed(
             "next_page_info": None
         }
 
+def _parse_personal_cursor(cursor: Optional[str]) -> tuple[Optional[tuple], int]:
+    """
+    Cursor do feed personalizado: início da janela do feed ranked ({"s": score, "i": id},
+    ausente na primeira janela) e itens da janela já servidos ({"n": offset})
+    """
+    if not cursor:
+        return None, 0
+    position = decode_cursor(cursor)
+    offset = position.get("n")
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if "s" not in position and "i" not in position:
+        return None, offset
+    if not isinstance(position.get("s"), (int, float)) or not isinstance(position.get("i"), int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return (position["s"], position["i"]), offset
+
+def _personal_cursor(window_after: Optional[tuple], offset: int) -> str:
+    if window_after is None:
+        return encode_cursor({"n": offset})
+    return encode_cursor({"s": window_after[0], "i": window_after[1], "n": offset})
+
+@router.get("/feed/me")
+def get_personal_feed(
+    cursor: Optional[str] = Query(None, description="Cursor de next_page_info para a próxima página"),
+    limit: int = 10,
+    fields: Optional[str] = Query(None, description="Campos dos cartões separados por vírgula (o id vem sempre)"),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Feed personalizado do utilizador autenticado
+    Candidatos do feed ranked reordenados pelas suas preferências: categorias vistas,
+    tags de serviços gostados e províncias das suas empresas
+    O vetor de preferências vem do cache (ou de uma leitura por chave), sem percorrer o histórico
+    """
+    window_after, offset = _parse_personal_cursor(cursor)
+    card_fields = _parse_fields(fields)
+    limit = min(max(limit, 1), 50)
+
+    vector = load_preferences(db, current_user.id)
+    feed_items, next_position, has_more = personal_feed_page(db, vector, limit, window_after, offset, card_fields)
+    return {
+        "items": feed_items,
+        "total_returned": len(feed_items),
+        "has_more": has_more,
+        "next_page_info": {"cursor": _personal_cursor(*next_position)} if has_more else None,
+        "preferences": {field: len(weights) for field, weights in vector.items()},
+    }
+
+def _sse(event_id: Optional[int], event: Optional[dict]) -> str:
+    if event_id is None:
+        return "event: resync\ndata: {}\n\n"
+    return f"id: {event_id}\nevent: item\ndata: {json.dumps(event, default=str)}\n\n"
+
+async def _feed_events(subscriber: Subscriber, replay: list) -> AsyncIterator[str]:
+    try:
+        last_id = 0
+        for event_id, event in replay:
+            last_id = event_id
+            yield _sse(event_id, event)
+        while True:
+            try:
+                event_id, event = await asyncio.wait_for(
+                    subscriber.queue.get(), timeout=settings.FEED_STREAM_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if event_id is not None and event_id <= last_id:
+                continue  # já enviado no replay
+            yield _sse(event_id, event)
+    finally:
+        feed_broadcaster.unsubscribe(subscriber)
+
+@router.get("/feed/stream")
+async def stream_feed(
+    request: Request,
+    types: Optional[str] = Query(None, description="Tipos separados por vírgula (service, company, portfolio)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Novos serviços, empresas e portfólios em tempo real (Server-Sent Events)
+    Substitui o polling de /search/feed: uma ligação por cliente, eventos "item" com o cartão do feed
+    Um evento "resync" pede ao cliente que recarregue o topo do feed (perdeu eventos por ser lento)
+    Com o cabeçalho Last-Event-ID, os itens criados desde esse evento são reenviados primeiro
+    """
+    wanted = [t.strip() for t in types.split(",") if t.strip()] if types else list(STREAM_TYPES)
+    if any(t not in STREAM_TYPES for t in wanted):
+        raise HTTPException(status_code=400, detail=f"Invalid types; allowed: {', '.join(STREAM_TYPES)}")
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id and not last_event_id.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+
+    # Subscreve antes do replay para não perder itens criados entretanto
+    subscriber = feed_broadcaster.subscribe(wanted)
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Too many stream connections", headers={"Retry-After": "30"})
+    try:
+        replay = []
+        if last_event_id:
+            replay = await run_in_threadpool(
+                new_feed_items, db, int(last_event_id), settings.FEED_STREAM_REPLAY_LIMIT
+            )
+            replay = [(event_id, event) for event_id, event in replay if event["type"] in wanted]
+    except Exception:
+        feed_broadcaster.unsubscribe(subscriber)
+        raise
+    finally:
+        db.close()  # a ligação à base de dados não fica presa durante o stream
+
+    return StreamingResponse(
+        _feed_events(subscriber, replay),
+        media_type="text/event-stream",
+        # identity: o GZipMiddleware não comprime (nem retém) os eventos
+        headers={"Cache-Control": "no-cache", "Content-Encoding": "identity", "X-Accel-Buffering": "no"},
+    )
+
+def _empty_results() -> dict:
+    return {"services": [], "companies": [], "users": [], "portfolios": []}
+
+def _build_results(found: dict) -> dict:
+    """Junta o score (rank/similaridade) a cada resultado"""
+    return {key: [{**item, "rank": score} for item, score in rows] for key, rows in found.items()}
+
+def _summary(results: dict) -> dict:
+    return {
+        "services_count": len(results["services"]),
+        "companies_count": len(results["companies"]),
+        "users_count": len(results["users"]),
+        "portfolios_count": len(results["portfolios"])
+    }
+
+# Tipos de que as facetas dependem (compute_facets só conta serviços e empresas)
+_FACET_TYPES = ("services", "companies")
+
+def _cache_tags(position: Optional[dict]) -> set:
+    """Tipos de resultado de uma resposta em cache: o do cursor, ou todos na primeira página"""
+    return {position["t"]} if position else set(_empty_results())
+
+def _parse_search_cursor(cursor: Optional[str]) -> Optional[dict]:
+    """Cursor de paginação por tipo: {"t": tipo, "s": score, "i": id} do último item visto"""
+    if not cursor:
+        return None
+    position = decode_cursor(cursor)
+    if (
+        position.get("t") not in _empty_results()
+        or not isinstance(position.get("s"), (int, float))
+        or not isinstance(position.get("i"), int)
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return position
+
+def _search_entities(db: Session, term: str, tsquery, mode: str, threshold: Optional[float], limit: int,
+                     service_filters=(), company_filters=(), position: Optional[dict] = None,
+                     card_fields: Optional[tuple] = None):
+    """
+    Executa a busca no modo pedido (fts | fuzzy)
+    Com cursor, pesquisa apenas o tipo do cursor a partir da posição (score, id) indicada
+    """
+    found, has_more = search_all(
+        db, term, tsquery,
+        mode=mode,
+        threshold=settings.SEARCH_FUZZY_THRESHOLD if threshold is None else threshold,
+        limit=limit,
+        filters={"services": service_filters, "companies": company_filters},
+        single_query=settings.SEARCH_SINGLE_QUERY,
+        types=[position["t"]] if position else None,
+        after={position["t"]: (position["s"], position["i"])} if position else None,
+        fields=card_fields,
+    )
+    next_cursors = {
+        key: encode_cursor({"t": key, "s": rows[-1][1], "i": rows[-1][0]["id"]}) if has_more[key] else None
+        for key, rows in found.items()
+    }
+    return _build_results(found), next_cursors
+
+def _did_you_mean(db: Session, term: str, mode: str, total_results: int) -> Optional[str]:
+    """Sugestão de correção apenas quando a busca exata não encontrou nada"""
+    if mode != "fts" or total_results:
+        return None
+    return suggest_correction(db, term, settings.SEARCH_FUZZY_THRESHOLD)
+
 @router.get("/", response_model=dict)
-async def global_search(
+def global_search(
     q: str = Query(..., description="Termo de pesquisa"),
     db: Session = Depends(get_db),
-    limit: int = Query(20, ge=1, le=100, description="Limite de resultados por categoria")
+    limit: int = Query(20, ge=1, le=100, description="Limite de resultados por categoria"),
+    mode: str = Query("fts", pattern="^(fts|fuzzy)$", description="fts (relevância) ou fuzzy (tolerante a erros)"),
+    threshold: Optional[float] = Query(None, ge=0, le=1, description="Similaridade mínima no modo fuzzy"),
+    cursor: Optional[str] = Query(None, description="Cursor de next_cursors para a próxima página de um tipo"),
+    fields: Optional[str] = Query(None, description="Campos dos cartões separados por vírgula (o id vem sempre)")
 ):
     """
     Pesquisa global em serviços, empresas, usuários e portfólios
-    Busca por: nome, categoria, tags, localização
+    Busca full-text (tsvector + GIN) por: nome, categoria, descrição, localização
+    Resultados ordenados por relevância (ts_rank) ou, no modo fuzzy, por similaridade (pg_trgm)
+    Paginação por cursor (keyset) independente para cada tipo
     """
+    position = _parse_search_cursor(cursor)
+    card_fields = _parse_fields(fields)
+    
+    # Cache por query normalizada (minúsculas, sem acentos, espaços colapsados)
+    cache_key = ("global", normalize_query(q), mode, threshold, limit, cursor, card_fields)
+    cached = search_results_cache.get(cache_key)
+    if cached is not None:
+        return {**cached, "query": q}
     
     try:
         # Normalizar termo de pesquisa
         search_term = q.strip().lower()
-        if len(search_term) < 2:
+        tsquery = build_tsquery(search_term) if len(search_term) >= 2 else None
+        if tsquery is None:
             return {
                 "query": q,
                 "total_results": 0,
                 "message": "Termo de pesquisa deve ter pelo menos 2 caracteres",
-                "results": {
-                    "services": [],
-                    "companies": [],
-                    "users": [],
-                    "portfolios": []
-                }
+                "results": _empty_results()
             }
         
-        # Preparar padrões de busca
-        search_pattern = f"%{search_term}%"
-        
-        # 1. BUSCAR SERVIÇOS
-        services_query = db.query(Service).filter(
-            or_(
-                Service.title.ilike(search_pattern),
-                Service.description.ilike(search_pattern),
-                Service.category.ilike(search_pattern)
-            )
-        ).limit(limit)
-        
-        services = services_query.all()
-        
-        # 2. BUSCAR EMPRESAS
-        companies_query = db.query(Company).filter(
-            or_(
-                Company.name.ilike(search_pattern),
-                Company.description.ilike(search_pattern),
-                Company.province.ilike(search_pattern),
-                Company.district.ilike(search_pattern),
-                Company.address.ilike(search_pattern),
-                Company.nationality.ilike(search_pattern)
-            )
-        ).limit(limit)
-        
-        companies = companies_query.all()
-        
-        # 3. BUSCAR USUÁRIOS
-        users_query = db.query(User).filter(
-            or_(
-                User.full_name.ilike(search_pattern),
-                User.email.ilike(search_pattern)
-            )
-        ).limit(limit)
-        
-        users = users_query.all()
-        
-        # 4. BUSCAR PORTFÓLIOS
-        portfolios_query = db.query(CompanyPortfolio).filter(
-            or_(
-                CompanyPortfolio.title.ilike(search_pattern),
-                CompanyPortfolio.description.ilike(search_pattern)
-            )
-        ).limit(limit)
+        results, next_cursors = _search_entities(db, search_term, tsquery, mode, threshold, limit,
+                                                 position=position, card_fields=card_fields)
+        summary = _summary(results)
+        total_results = sum(summary.values())
         
-        portfolios = portfolios_query.all()
-        
-        # Calcular total de resultados
-        total_results = len(services) + len(companies) + len(users) + len(portfolios)
-        
-        # Preparar resposta - apenas campos que existem nos modelos
-        results = {
-            "services": [
-                {
-                    "id": s.id,
-                    "title": s.title,
-                    "description": s.description,
-                    "price": s.price,
-                    "category": s.category,
-                    "tags": s.tags,
-                    "status": s.status,
-                    "company_id": s.company_id,
-                    "image_url": s.image_url,
-                    "views": s.views,
-                    "leads": s.leads,
-                    "likes": s.likes,
-                    "is_promoted": s.is_promoted,
-                    "created_at": s.created_at
-                } for s in services
-            ],
-            "companies": [
-                {
-                    "id": c.id,
-                    "name": c.name,
-                    "description": c.description,
-                    "logo_url": c.logo_url,
-                    "cover_url": c.cover_url,
-                    "province": c.province,
-                    "district": c.district,
-                    "address": c.address,
-                    "nationality": c.nationality,
-                    "website": c.website,
-                    "email": c.email,
-                    "whatsapp": c.whatsapp
-                } for c in companies
-            ],
-            "users": [
-                {
-                    "id": u.id,
-                    "full_name": u.full_name,
-                    "email": u.email,
-                    "profile_photo_url": u.profile_photo_url,
-                    "cover_photo_url": u.cover_photo_url,
-                    "gender": u.gender
-                } for u in users
-            ],
-            "portfolios": [
-                {
-                    "id": p.id,
-                    "title": p.title,
-                    "description": p.description,
-                    "media_url": p.media_url,
-                    "link": p.link,
-                    "company_id": p.company_id,
-                    "created_at": p.created_at
-                } for p in portfolios
-            ]
-        }
-        
-        return {
+        response = {
             "query": q,
+            "mode": mode,
             "total_results": total_results,
             "results": results,
-            "summary": {
-                "services_count": len(services),
-                "companies_count": len(companies),
-                "users_count": len(users),
-                "portfolios_count": len(portfolios)
-            }
+            "summary": summary,
+            "next_cursors": next_cursors,
+            "did_you_mean": _did_you_mean(db, search_term, mode, total_results)
         }
+        search_results_cache.set(cache_key, response, tags=_cache_tags(position))
+        return response
     except Exception as e:
         return {
             "query": q,
             "total_results": 0,
             "error": f"Erro na pesquisa: {str(e)}",
-            "results": {
-                "services": [],
-                "companies": [],
-                "users": [],
-                "portfolios": []
-            }
+            "results": _empty_results()
         }
 
 @router.get("/advanced", response_model=dict)
-async def advanced_search(
+def advanced_search(
     q: str = Query(..., description="Termo de pesquisa"),
     category: Optional[str] = Query(None, description="Filtrar por categoria"),
     location: Optional[str] = Query(None, description="Filtrar por localização (província/distrito)"),
     tags: Optional[str] = Query(None, description="Filtrar por tags (separadas por vírgula)"),
+    tags_mode: str = Query("any", pattern="^(any|all)$", description="any: qualquer uma das tags; all: todas"),
     min_price: Optional[float] = Query(None, description="Preço mínimo"),
     max_price: Optional[float] = Query(None, description="Preço máximo"),
     db: Session = Depends(get_db),
-    limit: int = Query(20, ge=1, le=100, description="Limite de resultados por categoria")
+    limit: int = Query(20, ge=1, le=100, description="Limite de resultados por categoria"),
+    mode: str = Query("fts", pattern="^(fts|fuzzy)$", description="fts (relevância) ou fuzzy (tolerante a erros)"),
+    threshold: Optional[float] = Query(None, ge=0, le=1, description="Similaridade mínima no modo fuzzy"),
+    include_facets: bool = Query(True, description="Incluir contagens por categoria, localização e preço"),
+    cursor: Optional[str] = Query(None, description="Cursor de next_cursors para a próxima página de um tipo"),
+    fields: Optional[str] = Query(None, description="Campos dos cartões separados por vírgula (o id vem sempre)")
 ):
     """
     Pesquisa avançada com filtros específicos
+    Resultados ordenados por relevância (ts_rank) ou, no modo fuzzy, por similaridade (pg_trgm)
+    Inclui facetas (contagens para os filtros da barra lateral), com cache por query normalizada
+    Paginação por cursor (keyset) independente para cada tipo
     """
+    position = _parse_search_cursor(cursor)
+    card_fields = _parse_fields(fields)
+    tags_list = [tag.strip() for tag in tags.split(',') if tag.strip()] if tags else []
+    tags_key = tuple(sorted({normalize_query(tag) for tag in tags_list}))
+    filters_echo = {
+        "category": category,
+        "location": location,
+        "tags": tags,
+        "tags_mode": tags_mode,
+        "price_range": f"{min_price}-{max_price}" if min_price or max_price else None
+    }
+    
+    cache_key = (
+        "advanced", normalize_query(q), mode, threshold, limit, cursor, include_facets,
+        normalize_query(category or ""), normalize_query(location or ""), tags_key, tags_mode,
+        min_price, max_price, card_fields
+    )
+    cached = search_results_cache.get(cache_key)
+    if cached is not None:
+        return {**cached, "query": q}
     
     try:
         search_term = q.strip().lower()
-        if len(search_term) < 2:
+        tsquery = build_tsquery(search_term) if len(search_term) >= 2 else None
+        if tsquery is None:
             return {
                 "query": q,
                 "filters": {"category": category, "location": location, "tags": tags, "price_range": f"{min_price}-{max_price}"},
                 "total_results": 0,
                 "message": "Termo de pesquisa deve ter pelo menos 2 caracteres",
-                "results": {"services": [], "companies": [], "users": [], "portfolios": []}
+                "results": _empty_results()
             }
         
-        search_pattern = f"%{search_term}%"
-        
         # Construir filtros para serviços
-        service_filters = [
-            or_(
-                Service.title.ilike(search_pattern),
-                Service.description.ilike(search_pattern),
-                Service.category.ilike(search_pattern)
-            )
-        ]
+        service_filters = []
         
         if category:
-            service_filters.append(Service.category.ilike(f"%{category}%"))
+            service_filters.append(contains_filter(Service.category_norm, category))
+        
+        if tags_list:
+            service_filters.append(tag_filter(tags_list, tags_mode))
         
         if min_price is not None:
             service_filters.append(Service.price >= min_price)
@@ -350,133 +443,105 @@ async def advanced_search(
         if max_price is not None:
             service_filters.append(Service.price <= max_price)
         
-        # Buscar serviços com filtros
-        services = db.query(Service).filter(and_(*service_filters)).limit(limit).all()
-        
-        # Construir filtros para empresas
-        company_filters = [
-            or_(
-                Company.name.ilike(search_pattern),
-                Company.description.ilike(search_pattern),
-                Company.province.ilike(search_pattern),
-                Company.district.ilike(search_pattern),
-                Company.address.ilike(search_pattern)
-            )
-        ]
+        # Construir filtros para empresas (colunas normalizadas: sem acentos, minúsculas)
+        company_filters = []
         
         if location:
             company_filters.append(
                 or_(
-                    Company.province.ilike(f"%{location}%"),
-                    Company.district.ilike(f"%{location}%")
+                    contains_filter(Company.province_norm, location),
+                    contains_filter(Company.district_norm, location)
                 )
             )
         
-        # Buscar empresas com filtros
-        companies = db.query(Company).filter(and_(*company_filters)).limit(limit).all()
-        
-        # Buscar usuários e portfólios (sem filtros específicos para este exemplo)
-        users = db.query(User).filter(
-            or_(
-                User.full_name.ilike(search_pattern),
-                User.email.ilike(search_pattern)
-            )
-        ).limit(limit).all()
-        
-        portfolios = db.query(CompanyPortfolio).filter(
-            or_(
-                CompanyPortfolio.title.ilike(search_pattern),
-                CompanyPortfolio.description.ilike(search_pattern)
+        # Usuários e portfólios não têm filtros específicos
+        results, next_cursors = _search_entities(db, search_term, tsquery, mode, threshold, limit,
+                                                 service_filters, company_filters, position, card_fields)
+        summary = _summary(results)
+        total_results = sum(summary.values())
+        
+        facets = None
+        if include_facets:
+            facets_key = (
+                normalize_query(search_term), mode, threshold,
+                normalize_query(category or ""), normalize_query(location or ""), tags_key, tags_mode,
+                min_price, max_price
             )
-        ).limit(limit).all()
-        
-        total_results = len(services) + len(companies) + len(users) + len(portfolios)
-        
-        results = {
-            "services": [
-                {
-                    "id": s.id,
-                    "title": s.title,
-                    "description": s.description,
-                    "price": s.price,
-                    "category": s.category,
-                    "tags": s.tags,
-                    "status": s.status,
-                    "company_id": s.company_id,
-                    "image_url": s.image_url,
-                    "views": s.views,
-                    "leads": s.leads,
-                    "likes": s.likes,
-                    "is_promoted": s.is_promoted,
-                    "created_at": s.created_at
-                } for s in services
-            ],
-            "companies": [
-                {
-                    "id": c.id,
-                    "name": c.name,
-                    "description": c.description,
-                    "logo_url": c.logo_url,
-                    "cover_url": c.cover_url,
-                    "province": c.province,
-                    "district": c.district,
-                    "address": c.address,
-                    "nationality": c.nationality,
-                    "website": c.website,
-                    "email": c.email,
-                    "whatsapp": c.whatsapp
-                } for c in companies
-            ],
-            "users": [
-                {
-                    "id": u.id,
-                    "full_name": u.full_name,
-                    "email": u.email,
-                    "profile_photo_url": u.profile_photo_url,
-                    "cover_photo_url": u.cover_photo_url,
-                    "gender": u.gender
-                } for u in users
-            ],
-            "portfolios": [
-                {
-                    "id": p.id,
-                    "title": p.title,
-                    "description": p.description,
-                    "media_url": p.media_url,
-                    "link": p.link,
-                    "company_id": p.company_id,
-                    "created_at": p.created_at
-                } for p in portfolios
-            ]
-        }
+            facets = search_facets_cache.get(facets_key)
+            if facets is None:
+                facets = compute_facets(
+                    db, search_term, tsquery,
+                    mode=mode,
+                    threshold=settings.SEARCH_FUZZY_THRESHOLD if threshold is None else threshold,
+                    filters={"services": service_filters, "companies": company_filters},
+                    price_edges=_price_edges(),
+                )
+                search_facets_cache.set(facets_key, facets, tags=_FACET_TYPES)
         
-        return {
+        response = {
             "query": q,
-            "filters": {
-                "category": category,
-                "location": location,
-                "tags": tags,
-                "price_range": f"{min_price}-{max_price}" if min_price or max_price else None
-            },
+            "mode": mode,
+            "filters": filters_echo,
             "total_results": total_results,
             "results": results,
-            "summary": {
-                "services_count": len(services),
-                "companies_count": len(companies),
-                "users_count": len(users),
-                "portfolios_count": len(portfolios)
-            }
+            "summary": summary,
+            "next_cursors": next_cursors,
+            "facets": facets,
+            "did_you_mean": _did_you_mean(db, search_term, mode, total_results)
         }
+        tags = _cache_tags(position) | (set(_FACET_TYPES) if include_facets else set())
+        search_results_cache.set(cache_key, response, tags=tags)
+        return response
     except Exception as e:
         return {
             "query": q,
-            "filters": {
-                "category": category,
-                "location": location,
-                "tags": tags,
-                "price_range": f"{min_price}-{max_price}" if min_price or max_price else None
-            },
+            "filters": filters_echo,
             "total_results": 0,
             "error": f"Erro na pesquisa avançada: {str(e)}",
             "results": {"services": [], "users": [], "companies": [], "portfolios": []}
         }
+
+@router.get("/tags", response_model=dict)
+def popular_tags(
+    limit: int = Query(20, ge=1, le=100, description="Número de tags"),
+    prefix: Optional[str] = Query(None, description="Apenas tags que começam por este texto"),
+    db: Session = Depends(get_db)
+):
+    """
+    Tags mais usadas em serviços ativos
+    Servidas a partir de um agregado atualizado periodicamente (service_tag_stats)
+    """
+    try:
+        items = top_tags(db, limit=limit, prefix=prefix)
+        return {"tags": items, "total_returned": len(items)}
+    except Exception as e:
+        return {"tags": [], "total_returned": 0, "error": f"Erro ao buscar tags: {str(e)}"}
+
+@router.get("/suggest", response_model=dict)
+async def suggest(
+    prefix: str = Query(..., min_length=1, max_length=100, description="Texto já escrito na caixa de pesquisa"),
+    limit: int = Query(8, ge=1, le=BUCKET_SIZE, description="Número de sugestões"),
+    types: Optional[str] = Query(None, description="Tipos de sugestão (service,company,category,tag) separados por vírgula")
+):
+    """
+    Sugestões para pesquisa enquanto se escreve (autocomplete)
+    Servidas de um índice de prefixos em memória: não consulta a base de dados
+    Ordenadas por popularidade entre todos os termos do prefixo (prefixos longos: até 500 entradas)
+    """
+    kinds = [kind.strip() for kind in types.split(",") if kind.strip()] if types else None
+    if kinds and not set(kinds) <= set(TERM_KINDS):
+        raise HTTPException(status_code=400, detail=f"Invalid types, expected any of: {', '.join(TERM_KINDS)}")
+    items = suggest_index.suggest(prefix, limit=limit, kinds=kinds)
+    return {"prefix": prefix, "suggestions": items, "total_returned": len(items)}
+
+@router.get("/cache/stats", response_model=dict, dependencies=[Depends(require_ops_token)])
+async def search_cache_stats():
+    """Estatísticas dos caches de pesquisa deste worker (tamanho, hit ratio, evicções); requer X-Ops-Token"""
+    return {
+        "results": search_results_cache.stats(),
+        "facets": search_facets_cache.stats(),
+        "suggest_index": suggest_index.stats(),
+        "feed_stream": feed_broadcaster.stats(),
+        "engagement_buffer": engagement_buffer.stats(),
+        "counts": count_cache.stats()
+    }
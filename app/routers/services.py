@@ -1,32 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy import text
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File, Form
+from sqlalchemy import func, select, text, tuple_
 from sqlalchemy.orm import Session
 from typing import Optional
-import os
+from datetime import datetime
+import io
+import random
 
+from .. import hooks, preferences, storage
+from ..counts import exact_count, filtered_count
 from ..database import get_db
-from ..deps import get_current_active_user
+from ..deps import get_current_active_user, get_optional_active_user
+from ..engagement import engagement_buffer, record_once
+from ..import_services import detect_format, import_services
 from ..models import Service, Company, User
+from ..pagination import decode_cursor, encode_cursor
 from ..schemas import ServiceCreate, ServiceOut, ServiceUpdate
+from ..search_backend import contains_filter, normalize_query
+from ..settings import settings
+from ..streaming import export_response, services_query
 
 router = APIRouter()
 
-# Helpers for image saving (reuse uploads dir mounted at /uploads)
-from ..routers.companies import _uploads_base_dir as _uploads_base
-
-def save_service_image(service_id: int, file: UploadFile) -> Optional[str]:
-    if not file:
-        return None
-    base_dir = _uploads_base()
-    upload_dir = os.path.join(base_dir, "service_images", str(service_id))
-    os.makedirs(upload_dir, exist_ok=True)
-    ext = os.path.splitext(file.filename)[1]
-    filename = f"image{ext}"
-    file_path = os.path.join(upload_dir, filename)
-    with open(file_path, "wb") as buffer:
-        buffer.write(file.file.read())
-    return "/uploads/" + "/".join(["service_images", str(service_id), filename])
-
 @router.post("/", response_model=ServiceOut)
 async def create_service(
     company_id: int = Form(...),
@@ -68,50 +62,255 @@ async def create_service(
 
     if image:
         try:
-            service.image_url = save_service_image(service.id, image)
+            service.image_url = await storage.save_upload(image)
             db.commit()
             db.refresh(service)
+        except HTTPException:
+            # Imagem rejeitada: o serviço já existe (sem imagem) e é indexado como os outros
+            hooks.entity_saved(db, service, created=True)
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error uploading image: {str(e)}")
 
+    hooks.entity_saved(db, service, created=True)
     return service
 
+@router.post("/import", response_model=dict)
+def import_services_file(
+    file: UploadFile = File(...),
+    company_id: Optional[int] = Form(None),
+    file_format: Optional[str] = Form(None, alias="format"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+):
+    """
+    Importação em massa de serviços a partir de CSV ou JSONL (lido em streaming)
+    Colunas/chaves de ServiceCreate; linhas sem company_id usam o company_id do formulário
+    Só empresas do utilizador; as linhas válidas são gravadas e as restantes listadas com o erro
+    """
+    try:
+        fmt = detect_format(file.filename, file_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    owned = set(db.execute(select(Company.id).where(Company.owner_id == current_user.id)).scalars())
+    if company_id is not None and company_id not in owned:
+        raise HTTPException(status_code=403, detail="Not allowed")
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    return import_services(db, stream, fmt, company_id, owned, max_rows=settings.IMPORT_MAX_ROWS)
+
+def _parse_company_cursor(cursor: str) -> tuple[datetime, int]:
+    """Cursor dos serviços de uma empresa: {"c": created_at ISO, "i": id} do último serviço"""
+    position = decode_cursor(cursor)
+    if not isinstance(position.get("c"), str) or not isinstance(position.get("i"), int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        return datetime.fromisoformat(position["c"]), position["i"]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _company_services(db: Session, company_id: int, statuses: list[str], after: Optional[tuple],
+                      limit: int) -> list[Service]:
+    """
+    Serviços da empresa, mais recentes primeiro, a seguir a after (created_at, id)
+    Uma leitura do índice (company_id, status, created_at DESC, id DESC) por status, juntas em memória
+    """
+    order = (Service.created_at.desc(), Service.id.desc())
+    services: list[Service] = []
+    for status in statuses:
+        query = db.query(Service).filter(Service.company_id == company_id, Service.status == status)
+        if after is not None:
+            query = query.filter(tuple_(Service.created_at, Service.id) < tuple_(*after))
+        services.extend(query.order_by(*order).limit(limit).all())
+    services.sort(key=lambda service: (service.created_at, service.id), reverse=True)
+    return services[:limit]
+
+def _company_statuses(db: Session, company_id: int) -> list[str]:
+    """
+    Status presentes nos serviços da empresa, sem ler as linhas de cada status
+    Salto pelo índice (company_id, status, ...): uma leitura por status distinto, não por serviço
+    """
+    return list(db.execute(
+        text(
+            """
+            WITH RECURSIVE statuses (status) AS (
+                (SELECT status FROM services WHERE company_id = :company_id ORDER BY status LIMIT 1)
+                UNION ALL
+                SELECT (
+                    SELECT status FROM services
+                    WHERE company_id = :company_id AND status > statuses.status
+                    ORDER BY status LIMIT 1
+                )
+                FROM statuses WHERE statuses.status IS NOT NULL
+            )
+            SELECT status FROM statuses WHERE status IS NOT NULL
+            """
+        ),
+        {"company_id": company_id},
+    ).scalars())
+
 @router.get("/company/{company_id}", response_model=list[ServiceOut])
-async def list_services_by_company(company_id: int, db: Session = Depends(get_db)):
-    """Busca todos os serviços de uma empresa específica"""
-    return db.query(Service).filter(Service.company_id == company_id).all()
+def list_services_by_company(
+    company_id: int,
+    response: Response,
+    status: Optional[str] = Query(None, description="Apenas serviços neste status (Ativo | Pausado)"),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Cursor X-Next-Cursor da página anterior"),
+    db: Session = Depends(get_db)
+):
+    """
+    Busca os serviços de uma empresa específica, mais recentes primeiro, em páginas de limit
+    Continuação por cursor (X-Next-Cursor); X-Total-Count com o total da empresa (estimado em empresas grandes)
+    """
+    after = _parse_company_cursor(cursor) if cursor else None
+    if status:
+        statuses = [status]
+    else:
+        statuses = _company_statuses(db, company_id)
+
+    # Um serviço a mais indica se existe próxima página
+    services = _company_services(db, company_id, statuses, after, limit + 1)
+
+    counted = select(Service.id).where(Service.company_id == company_id)
+    if status:
+        counted = counted.where(Service.status == status)
+    total, _ = filtered_count(db, counted, ("company-services", company_id, status))
+    response.headers["X-Total-Count"] = str(total)
+    if len(services) > limit:
+        last = services[limit - 1]
+        response.headers["X-Next-Cursor"] = encode_cursor({"c": last.created_at.isoformat(), "i": last.id})
+    return services[:limit]
+
+def _parse_shuffle_cursor(cursor: str) -> tuple[int, Optional[tuple]]:
+    """Cursor da listagem baralhada: {"seed", "k": random_key, "i": id, "w": já deu a volta} do último serviço"""
+    position = decode_cursor(cursor)
+    seed, key, service_id, wrapped = (position.get(name) for name in ("seed", "k", "i", "w"))
+    if (
+        not isinstance(seed, int)
+        or not isinstance(key, (int, float))
+        or not isinstance(service_id, int)
+        or not isinstance(wrapped, bool)
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return seed, (float(key), service_id, wrapped)
+
+def _shuffled_services(db: Session, seed: int, after: Optional[tuple], offset: int,
+                       limit: int) -> list[tuple[Service, bool]]:
+    """
+    Serviços pela ordem de random_key a começar no ponto do círculo [0, 1) escolhido pela semente
+    Duas leituras do índice (random_key, id): de start até 1 e, dando a volta, de 0 até start
+    Com after (random_key, id, wrapped), continua a seguir a esse serviço; offset só para page=
+    """
+    start = random.Random(seed).random()
+    position = (Service.random_key, Service.id)
+    arcs = [(False, Service.random_key >= start), (True, Service.random_key < start)]
+    services: list[Service] = []
+    for wrapped, arc in arcs:
+        if after is not None and after[2] and not wrapped:
+            continue  # o cursor já está no segundo arco
+        query = db.query(Service).filter(arc)
+        if after is not None and after[2] == wrapped:
+            query = query.filter(tuple_(*position) > tuple_(after[0], after[1]))
+        rows = query.order_by(*position).offset(offset).limit(limit - len(services)).all()
+        if offset and not rows:
+            # O offset salta o arco inteiro: desconta o tamanho do arco no seguinte
+            # Contagem limitada ao offset (o arco é menor), nunca uma contagem da tabela toda
+            bounded = query.with_entities(Service.id).limit(offset).subquery()
+            offset = max(offset - db.execute(select(func.count()).select_from(bounded)).scalar_one(), 0)
+            continue
+        offset = 0
+        services.extend((service, wrapped) for service in rows)
+        if len(services) == limit:
+            break
+    return services
 
 @router.get("/", response_model=list[ServiceOut])
 async def list_all_services(
+    response: Response,
     page: int = 1,
     limit: int = 10,
+    seed: Optional[int] = Query(None, ge=0, le=2**31 - 1, description="Semente da ordem aleatória (X-Shuffle-Seed)"),
+    cursor: Optional[str] = Query(None, description="Cursor X-Next-Cursor da página anterior"),
     db: Session = Depends(get_db)
 ):
-    """Lista todos os serviços com paginação e ordenação aleatória"""
+    """
+    Lista todos os serviços com paginação e ordenação aleatória
+    A ordem é fixa para cada semente (devolvida em X-Shuffle-Seed): páginas seguintes não repetem serviços
+    Continuação por cursor (X-Next-Cursor), cada página é uma leitura do índice do tamanho da página
+    page= continua a funcionar com a mesma semente (OFFSET, custo proporcional à página)
+    """
+    after = None
+    if cursor:
+        seed, after = _parse_shuffle_cursor(cursor)
+    elif seed is None:
+        seed = random.randrange(2**31)
     # Validar parâmetros de paginação
     if page < 1:
         page = 1
     if limit < 1 or limit > 100:
         limit = 10
     
-    # Calcular offset
-    offset = (page - 1) * limit
-    
-    # Buscar serviços com paginação e ordenação aleatória
-    services = db.query(Service)\
-        .order_by(text("RANDOM()"))\
-        .offset(offset)\
-        .limit(limit)\
-        .all()
+    # Calcular offset (apenas sem cursor)
+    offset = 0 if after else (page - 1) * limit
     
+    # Um serviço a mais indica se existe próxima página
+    rows = _shuffled_services(db, seed, after, offset, limit + 1)
+    services = [service for service, _ in rows[:limit]]
+
+    response.headers["X-Shuffle-Seed"] = str(seed)
+    response.headers["X-Total-Count"] = str(exact_count(db, "services"))
+    if len(rows) > limit:
+        last, wrapped = rows[limit - 1]
+        response.headers["X-Next-Cursor"] = encode_cursor(
+            {"seed": seed, "k": last.random_key, "i": last.id, "w": wrapped}
+        )
     return services
 
+@router.get("/export", dependencies=[Depends(get_current_active_user)])
+def export_services(
+    file_format: str = Query("ndjson", alias="format", description="ndjson | csv"),
+    status: Optional[str] = Query(None, description="Exportar apenas serviços neste status"),
+    company_id: Optional[int] = Query(None, description="Exportar apenas serviços desta empresa"),
+):
+    """Exporta todos os serviços em streaming (NDJSON ou CSV), com memória constante (autenticado)"""
+    query = services_query()
+    if status:
+        query = query.where(Service.status == status)
+    if company_id is not None:
+        query = query.where(Service.company_id == company_id)
+    return export_response(query, file_format, "services")
+
 @router.get("/info", response_model=dict)
-async def get_services_info(db: Session = Depends(get_db)):
-    """Retorna informações sobre os serviços (total, etc.)"""
-    total_services = db.query(Service).count()
+async def get_services_info(
+    category: Optional[str] = Query(None, description="Contar apenas serviços desta categoria"),
+    status: Optional[str] = Query(None, description="Contar apenas serviços neste status (Ativo | Pausado)"),
+    company_id: Optional[int] = Query(None, description="Contar apenas serviços desta empresa"),
+    db: Session = Depends(get_db)
+):
+    """
+    Retorna informações sobre os serviços (total, etc.)
+    Sem filtros: totais exatos mantidos por triggers (sem COUNT(*))
+    Com filtros: contagem exata de conjuntos pequenos, estimativa do planner nos grandes (exact=false)
+    """
+    if category is None and status is None and company_id is None:
+        return {
+            "total_services": exact_count(db, "services"),
+            "active_services": exact_count(db, "services:active"),
+            "exact": True,
+            "message": "Use /services?page=1&limit=10 para listar serviços com paginação"
+        }
+
+    query = select(Service.id)
+    if category:
+        query = query.where(contains_filter(Service.category_norm, category))
+    if status:
+        query = query.where(Service.status == status)
+    if company_id is not None:
+        query = query.where(Service.company_id == company_id)
+    total, exact = filtered_count(db, query, ("services", normalize_query(category or ""), status, company_id))
     return {
-        "total_services": total_services,
+        "total_services": total,
+        "exact": exact,
+        "filters": {"category": category, "status": status, "company_id": company_id},
         "message": "Use /services?page=1&limit=10 para listar serviços com paginação"
     }
 
@@ -133,6 +332,86 @@ async def get_service(service_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Service not found")
     return service
 
+def _engagement_client(request: Request, user: Optional[User]) -> str:
+    """Quem gerou um evento de engagement: o utilizador autenticado ou o IP do cliente"""
+    if user is not None:
+        return f"user:{user.id}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+def _require_service_id(db: Session, service_id: int) -> None:
+    # Leitura pela chave primária (sem bloqueios): ids inexistentes não entram no buffer
+    if db.execute(select(Service.id).where(Service.id == service_id)).scalar() is None:
+        raise HTTPException(status_code=404, detail="Service not found")
+
+@router.post("/{service_id}/view")
+def view_service(
+    service_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_optional_active_user)
+):
+    """
+    Regista uma visualização do serviço (contador em buffer, gravado em lote)
+    Uma por cliente e serviço em cada ENGAGEMENT_DEDUP_SECONDS (counted=false nas repetições)
+    Autenticado, alimenta também as preferências do feed personalizado (só as visualizações contadas)
+    """
+    service = None
+    if current_user is not None:
+        service = db.get(Service, service_id)
+        if not service:
+            raise HTTPException(status_code=404, detail="Service not found")
+    else:
+        _require_service_id(db, service_id)
+    counted = record_once(_engagement_client(request, current_user), service_id, views=1)
+    if counted and service is not None:
+        preferences.record_view(db, current_user.id, service)
+    return {"ok": True, "counted": counted}
+
+@router.post("/{service_id}/lead")
+def lead_service(
+    service_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_optional_active_user)
+):
+    """
+    Regista um contacto (lead) gerado pelo serviço (contador em buffer, gravado em lote)
+    Um por cliente e serviço em cada ENGAGEMENT_DEDUP_SECONDS (counted=false nas repetições)
+    """
+    _require_service_id(db, service_id)
+    counted = record_once(_engagement_client(request, current_user), service_id, leads=1)
+    return {"ok": True, "counted": counted}
+
+@router.post("/{service_id}/like")
+def like_service(
+    service_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Marca o serviço como gostado pelo utilizador (idempotente)"""
+    service = db.get(Service, service_id)
+    if not service:
+        raise HTTPException(status_code=404, detail="Service not found")
+    changed = preferences.set_like(db, current_user.id, service, True)
+    if changed:
+        engagement_buffer.add(service_id, likes=1, capped=False)  # o gosto já está gravado
+    return {"liked": True, "changed": changed}
+
+@router.delete("/{service_id}/like")
+def unlike_service(
+    service_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Retira o gosto do utilizador no serviço (idempotente)"""
+    service = db.get(Service, service_id)
+    if not service:
+        raise HTTPException(status_code=404, detail="Service not found")
+    changed = preferences.set_like(db, current_user.id, service, False)
+    if changed:
+        engagement_buffer.add(service_id, likes=-1, capped=False)
+    return {"liked": False, "changed": changed}
+
 @router.put("/{service_id}", response_model=ServiceOut)
 async def update_service(
     service_id: int,
@@ -175,12 +454,15 @@ async def update_service(
 
     if image:
         try:
-            service.image_url = save_service_image(service.id, image)
+            service.image_url = await storage.save_upload(image)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error uploading image: {str(e)}")
 
     db.commit()
     db.refresh(service)
+    hooks.entity_saved(db, service)
     return service
 
 @router.put("/{service_id}/image", response_model=ServiceOut)
@@ -198,10 +480,13 @@ async def upload_service_image(
         raise HTTPException(status_code=403, detail="Not allowed")
 
     try:
-        service.image_url = save_service_image(service.id, image)
+        service.image_url = await storage.save_upload(image)
         db.commit()
         db.refresh(service)
+        hooks.entity_saved(db, service)
         return service
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading image: {str(e)}")
 
@@ -213,6 +498,7 @@ async def delete_service(service_id: int, db: Session = Depends(get_db), current
     company = db.get(Company, service.company_id)
     if not company or company.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not allowed")
+    hooks.entity_deleted(db, service)
     db.delete(service)
     db.commit()
     return {"ok": True}
@@ -281,6 +567,7 @@ async def toggle_service_promotion(
     
     db.commit()
     db.refresh(service)
+    hooks.entity_saved(db, service)
     
     action = "promovido" if service.is_promoted else "despromovido"
     return service
@@ -307,6 +594,7 @@ async def set_service_promotion(
     
     db.commit()
     db.refresh(service)
+    hooks.entity_saved(db, service)
     
     action = "promovido" if service.is_promoted else "despromovido"
     return service
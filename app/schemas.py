@@ -34,6 +34,9 @@ class UserUpdate(BaseModel):
 class UserOut(UserBase):
     id: int
     is_active: bool
+    # Variantes redimensionadas (thumb/card/full, srcset), preenchidas depois do upload
+    profile_photo_variants: Optional[dict] = None
+    cover_photo_variants: Optional[dict] = None
 
     class Config:
         from_attributes = True
@@ -76,6 +79,8 @@ class CompanyUpdate(BaseModel):
 class CompanyOut(CompanyBase):
     id: int
     owner_id: int
+    logo_variants: Optional[dict] = None
+    cover_variants: Optional[dict] = None
 
     class Config:
         from_attributes = True
@@ -139,6 +144,7 @@ class ServiceOut(ServiceBase):
     id: int
     company_id: int
     image_url: Optional[str] = None
+    image_variants: Optional[dict] = None
     views: int
     leads: int
     likes: int
@@ -0,0 +1,409 @@
+"""
+Full-text search backend for BizLink.
+
+Each searchable table carries a generated ``search_vector`` column
+(``tsvector`` weighted with the ``portuguese_unaccent`` configuration, i.e.
+Portuguese stemming after ``unaccent``) backed by a GIN index. Queries are
+turned into prefix ``tsquery`` expressions so partially typed words still
+match, and results are ordered by ``ts_rank``.
+
+Typo tolerance comes from ``pg_trgm``: the main title/name columns have
+generated ``*_norm`` shadows (lowercase, no accents) with trigram GIN
+indexes, used by the fuzzy mode, the substring filters and the "did you
+mean" suggestion offered when an exact search finds nothing. Every query
+term is normalized the same way, so "Maputo"/"maputo" and "Música"/"musica"
+match the same rows.
+"""
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from typing import Iterable, Optional
+
+from sqlalchemy import Float, Integer, String, case, cast, func, literal, literal_column, select, text, tuple_, union_all
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION, array
+from sqlalchemy.orm import Session
+
+from .models import Company, CompanyPortfolio, Service, User
+from .settings import settings
+
+FTS_CONFIG = "portuguese_unaccent"
+
+# Entidades pesquisáveis: tipo do resultado -> (modelo, coluna normalizada usada no modo fuzzy)
+SEARCH_ENTITIES = {
+    "services": (Service, Service.title_norm),
+    "companies": (Company, Company.name_norm),
+    "users": (User, None),
+    "portfolios": (CompanyPortfolio, CompanyPortfolio.title_norm),
+}
+
+# Campos devolvidos por tipo - apenas campos que existem nos modelos
+RESULT_FIELDS = {
+    "services": (
+        "id", "title", "description", "price", "category", "tags", "status", "company_id",
+        "image_url", "image_variants", "views", "leads", "likes", "is_promoted", "created_at",
+    ),
+    "companies": (
+        "id", "name", "description", "logo_url", "logo_variants", "cover_url", "cover_variants", "province", "district",
+        "address", "nationality", "website", "email", "whatsapp", "created_at",
+    ),
+    "users": (
+        "id", "full_name", "email", "profile_photo_url", "profile_photo_variants",
+        "cover_photo_url", "cover_photo_variants", "gender", "created_at",
+    ),
+    "portfolios": ("id", "title", "description", "media_url", "link", "company_id", "created_at"),
+}
+
+# Todos os campos de cartão aceites em fields= (o id vem sempre)
+CARD_FIELDS = frozenset(field for fields in RESULT_FIELDS.values() for field in fields)
+
+# Palavras (letras/dígitos, sem underscore) usadas para montar o tsquery
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def normalize_query(term: str) -> str:
+    """Lowercase, strip accents and collapse whitespace.
+
+    Mirrors the ``lower(f_unaccent(...))`` of the ``*_norm`` columns; also
+    used to build cache keys.
+    """
+    decomposed = unicodedata.normalize("NFKD", term.lower())
+    unaccented = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(unaccented.split())
+
+
+def escape_like(value: str) -> str:
+    """Escape LIKE wildcards so user input is matched literally."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def contains_filter(column, value: str):
+    """Trigram-indexed substring predicate on a ``*_norm`` column."""
+    return column.like(f"%{escape_like(normalize_query(value))}%")
+
+
+def build_tsquery(term: str):
+    """Build a prefix tsquery (``canal:* & maputo:*``) from free text.
+
+    Returns None when the term has no searchable words.
+    """
+    words = _WORD_RE.findall(term)
+    if not words:
+        return None
+    return func.to_tsquery(FTS_CONFIG, " & ".join(f"{word}:*" for word in words))
+
+
+def rank_expr(model, tsquery):
+    """ts_rank of a model's search_vector against the query."""
+    return func.ts_rank(model.search_vector, tsquery)
+
+
+def match_expr(model, tsquery):
+    """Index-assisted ``search_vector @@ tsquery`` predicate."""
+    return model.search_vector.op("@@")(tsquery)
+
+
+def _set_word_similarity_threshold(db: Session, threshold: float) -> None:
+    # Transaction-local, so it never leaks to other requests sharing the connection
+    db.execute(
+        text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+        {"threshold": str(threshold)},
+    )
+
+
+def fuzzy_match_expr(column, term: str):
+    """Index-assisted ``term <% column`` (word similarity above the threshold).
+
+    ``column`` is a normalized shadow column, so the term is normalized too.
+    """
+    return literal(normalize_query(term)).op("<%")(column)
+
+
+def _match_and_score(key: str, term: str, tsquery, mode: str):
+    model, fuzzy_column = SEARCH_ENTITIES[key]
+    if mode == "fuzzy" and fuzzy_column is not None:
+        similarity = func.word_similarity(normalize_query(term), fuzzy_column)
+        match, score = fuzzy_match_expr(fuzzy_column, term), similarity
+    else:
+        match, score = match_expr(model, tsquery), rank_expr(model, tsquery)
+    # real -> double precision: the score must survive a round trip through a cursor exactly
+    return match, cast(score, DOUBLE_PRECISION)
+
+
+def card_fields(key: str, fields: Optional[Iterable[str]] = None) -> tuple[str, ...]:
+    """Card fields of a result type, restricted to ``fields`` when given (``id`` is always kept)."""
+    if fields is None:
+        return RESULT_FIELDS[key]
+    wanted = set(fields) | {"id"}
+    return tuple(field for field in RESULT_FIELDS[key] if field in wanted)
+
+
+def card_column(model, field: str):
+    """Column of a card field; descriptions are cut to a snippet by the database."""
+    column = getattr(model, field)
+    if field != "description":
+        return column
+    size = settings.CARD_DESCRIPTION_CHARS
+    return case((func.char_length(column) > size, func.left(column, size) + "…"), else_=column)
+
+
+def card_object(model, fields: tuple[str, ...]):
+    """``json_build_object`` of the card fields, built by the database."""
+    return func.json_build_object(
+        *[arg for field in fields for arg in (literal_column(f"'{field}'"), card_column(model, field))]
+    )
+
+
+def _seek(model, score, after: tuple[float, int]):
+    """Keyset condition: rows strictly after ``(score, id)`` in ``score DESC, id DESC`` order."""
+    last_score, last_id = after
+    return tuple_(score, model.id) < tuple_(literal(last_score, Float), literal(last_id, Integer))
+
+
+def search_all(
+    db: Session,
+    term: str,
+    tsquery,
+    mode: str = "fts",
+    threshold: float = 0.3,
+    limit: int = 20,
+    filters: Optional[dict[str, Iterable]] = None,
+    single_query: bool = True,
+    types: Optional[Iterable[str]] = None,
+    after: Optional[dict[str, tuple[float, int]]] = None,
+    fields: Optional[Iterable[str]] = None,
+) -> tuple[dict[str, list[tuple[dict, float]]], dict[str, bool]]:
+    """Search the entity types and return ``({type: [(result, score)]}, {type: has_more})``.
+
+    ``mode`` is ``fts`` (ts_rank) or ``fuzzy`` (trigram word similarity;
+    users have no trigram index and always use full-text). ``filters`` maps
+    a result type to extra WHERE clauses. ``types`` restricts the search to
+    some result types and ``after`` maps a type to the ``(score, id)`` of the
+    last row already seen, for keyset pagination. With ``single_query`` the
+    searches run as one UNION ALL statement (one round trip); otherwise each
+    type is queried separately. Either way only the card columns are read
+    (``fields`` restricts them further), never whole ORM entities.
+    """
+    filters = filters or {}
+    after = after or {}
+    keys = [key for key in SEARCH_ENTITIES if types is None or key in types]
+    if mode == "fuzzy":
+        _set_word_similarity_threshold(db, threshold)
+    # Uma linha extra por tipo indica se existe próxima página
+    if single_query:
+        results = _search_union(db, keys, term, tsquery, mode, limit + 1, filters, after, fields)
+    else:
+        results = _search_sequential(db, keys, term, tsquery, mode, limit + 1, filters, after, fields)
+
+    has_more = {}
+    for key in SEARCH_ENTITIES:
+        rows = results.setdefault(key, [])
+        has_more[key] = len(rows) > limit
+        del rows[limit:]
+    return results, has_more
+
+
+def _branch_where(key: str, model, term: str, tsquery, mode: str, filters: dict, after: dict):
+    match, score = _match_and_score(key, term, tsquery, mode)
+    where = [match, *filters.get(key, ())]
+    if key in after:
+        where.append(_seek(model, score, after[key]))
+    return where, score
+
+
+def _search_sequential(db: Session, keys: list[str], term: str, tsquery, mode: str, limit: int,
+                       filters: dict, after: dict, fields: Optional[Iterable[str]]) -> dict:
+    results = {}
+    for key in keys:
+        model, _ = SEARCH_ENTITIES[key]
+        where, score = _branch_where(key, model, term, tsquery, mode, filters, after)
+        selected = card_fields(key, fields)
+        rows = db.execute(
+            select(score, *[card_column(model, field) for field in selected])
+            .where(*where)
+            .order_by(score.desc(), model.id.desc())
+            .limit(limit)
+        )
+        # Tuplas -> dicts diretamente, sem instanciar entidades
+        results[key] = [(dict(zip(selected, row[1:])), float(row[0])) for row in rows]
+    return results
+
+
+def _search_union(db: Session, keys: list[str], term: str, tsquery, mode: str, limit: int,
+                  filters: dict, after: dict, fields: Optional[Iterable[str]]) -> dict:
+    branches = []
+    for key in keys:
+        model, _ = SEARCH_ENTITIES[key]
+        where, score = _branch_where(key, model, term, tsquery, mode, filters, after)
+        # Payload montado no servidor: cada tipo tem colunas diferentes
+        payload = card_object(model, card_fields(key, fields))
+        branches.append(
+            select(literal_column(f"'{key}'").label("type"), score.label("score"), payload.label("payload"))
+            .where(*where)
+            .order_by(score.desc(), model.id.desc())
+            .limit(limit)
+        )
+
+    results = {key: [] for key in keys}
+    for key, score, payload in db.execute(union_all(*branches)):
+        results[key].append((payload, float(score)))
+    # UNION ALL does not guarantee the branch order survives
+    for rows in results.values():
+        rows.sort(key=lambda row: (row[1], row[0]["id"]), reverse=True)
+    return results
+
+
+def tag_filter(tags: list[str], mode: str = "any"):
+    """GIN-indexed tag predicate: ``&&`` (any of the tags) or ``@>`` (all of them).
+
+    Compares against ``tags_norm``, so tags match regardless of case and accents.
+    """
+    normalized = sorted({normalize_query(tag) for tag in tags})
+    if mode == "all":
+        return Service.tags_norm.contains(normalized)
+    return Service.tags_norm.overlap(normalized)
+
+
+# Chave do advisory lock que garante um único refresh simultâneo entre workers
+_TAG_STATS_LOCK_KEY = 7_340_101
+
+
+def refresh_tag_stats(db: Session) -> None:
+    """Refresh the ``service_tag_stats`` materialized view (tag usage counts).
+
+    Every worker schedules this job; the advisory lock makes the ones that
+    lose the race skip the run instead of queueing behind the refresh.
+    """
+    acquired = db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _TAG_STATS_LOCK_KEY}).scalar()
+    if acquired:
+        db.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY service_tag_stats"))
+    db.commit()
+
+
+def top_tags(db: Session, limit: int = 20, prefix: Optional[str] = None) -> list[dict]:
+    """Most used tags of active services, read from the aggregated view."""
+    query = "SELECT tag, usage_count FROM service_tag_stats"
+    params: dict = {"limit": limit}
+    if prefix:
+        query += " WHERE tag ILIKE :prefix"
+        params["prefix"] = escape_like(prefix) + "%"
+    query += " ORDER BY usage_count DESC, tag LIMIT :limit"
+    return [{"tag": tag, "count": count} for tag, count in db.execute(text(query), params)]
+
+
+def compute_facets(
+    db: Session,
+    term: str,
+    tsquery,
+    mode: str = "fts",
+    threshold: float = 0.3,
+    filters: Optional[dict[str, Iterable]] = None,
+    price_edges: Iterable[float] = (),
+) -> dict[str, list[dict]]:
+    """Aggregate counts for the filter sidebar in a single statement.
+
+    Counts cover every match (not just the returned page): services per
+    category and per price bucket, companies per province and district.
+    ``price_edges`` are ascending bucket boundaries for ``width_bucket``.
+    """
+    filters = filters or {}
+    edges = sorted(price_edges)
+    if mode == "fuzzy":
+        _set_word_similarity_threshold(db, threshold)
+
+    match, _ = _match_and_score("services", term, tsquery, mode)
+    services = (
+        select(Service.category, Service.price)
+        .where(match, *filters.get("services", ()))
+        .cte("matched_services")
+    )
+    match, _ = _match_and_score("companies", term, tsquery, mode)
+    companies = (
+        select(Company.province, Company.district)
+        .where(match, *filters.get("companies", ()))
+        .cte("matched_companies")
+    )
+
+    def _facet(name: str, value, source, *where):
+        return (
+            select(literal_column(f"'{name}'").label("facet"), cast(value, String).label("value"), func.count().label("count"))
+            .select_from(source)
+            .where(value.is_not(None), *where)
+            .group_by(value)
+        )
+
+    branches = [
+        _facet("categories", services.c.category, services),
+        _facet("provinces", companies.c.province, companies),
+        _facet("districts", companies.c.district, companies),
+    ]
+    if edges:
+        bucket = func.width_bucket(services.c.price, array(edges))
+        branches.append(_facet("price_ranges", bucket, services, services.c.price.is_not(None)))
+
+    facets = {"categories": [], "provinces": [], "districts": [], "price_ranges": []}
+    for facet, value, count in db.execute(union_all(*branches)):
+        if facet == "price_ranges":
+            index = int(value)
+            facets[facet].append({
+                "min": edges[index - 1] if index > 0 else None,
+                "max": edges[index] if index < len(edges) else None,
+                "count": count,
+            })
+        else:
+            facets[facet].append({"value": value, "count": count})
+
+    facets["price_ranges"].sort(key=lambda bucket: (bucket["min"] is not None, bucket["min"] or 0))
+    for name in ("categories", "provinces", "districts"):
+        facets[name].sort(key=lambda item: (-item["count"], item["value"]))
+    return facets
+
+
+def suggest_correction(db: Session, term: str, threshold: float, candidates: int = 5) -> Optional[str]:
+    """Suggest a corrected query ("did you mean") when a search found nothing.
+
+    Fetches the closest titles/names through the trigram indexes (a single
+    statement) and replaces each query word with the most similar word in
+    those candidates. Returns None when there is nothing better to offer.
+    """
+    words = _WORD_RE.findall(term)
+    if not words:
+        return None
+
+    _set_word_similarity_threshold(db, threshold)
+    normalized = normalize_query(term)
+    branches = []
+    # Procura nas colunas normalizadas, devolve o texto original (com acentos)
+    for column, norm_column in (
+        (Service.title, Service.title_norm),
+        (Company.name, Company.name_norm),
+        (CompanyPortfolio.title, CompanyPortfolio.title_norm),
+    ):
+        similarity = func.word_similarity(normalized, norm_column)
+        branches.append(
+            select(column.label("candidate"), similarity.label("similarity"))
+            .where(fuzzy_match_expr(norm_column, term))
+            .order_by(similarity.desc())
+            .limit(candidates)
+        )
+    combined = union_all(*branches).subquery()
+    rows = db.execute(
+        select(combined.c.candidate).order_by(combined.c.similarity.desc()).limit(candidates)
+    ).all()
+
+    # Forma normalizada -> palavra original, para sugerir "música" e não "musica"
+    vocabulary = {
+        normalize_query(word): word.lower() for (candidate,) in rows for word in _WORD_RE.findall(candidate)
+    }
+    if not vocabulary:
+        return None
+
+    corrected = []
+    for word in words:
+        key = normalize_query(word)
+        best = max(vocabulary, key=lambda v: SequenceMatcher(None, key, v).ratio())
+        corrected.append(vocabulary[best] if SequenceMatcher(None, key, best).ratio() >= 0.6 else word)
+
+    # Só acentos diferentes não conta como correção
+    if normalize_query(" ".join(corrected)) == normalize_query(" ".join(words)):
+        return None
+    return " ".join(corrected)
@@ -0,0 +1,326 @@
+"""
+Content-addressed storage of uploaded files under ``app/uploads/blobs``.
+
+Every upload is stored once, named after the SHA-256 of its bytes
+(``/uploads/blobs/3f/3f2a...e1.jpg``): the same image uploaded as two logos,
+or twice by the same user, is one file. A URL always serves the same bytes,
+so ``/uploads/blobs`` is served with far-future ``immutable`` cache headers
+and a new upload simply gets a new URL.
+
+The upload is copied in ``UPLOAD_CHUNK_BYTES`` chunks: every read
+(``UploadFile.read`` moves it to the threadpool once Starlette has spooled
+the part to disk) and every write is awaited off the event loop, so a large
+upload neither blocks the other requests of the worker nor sits in memory as
+a whole. The hash is computed as the bytes arrive, the size limit is
+enforced as they arrive, and the type comes from the first bytes of the
+content (the declared content type and file name are not trusted). Data goes
+to a hidden temporary file that is renamed to its final name only when
+complete (``os.replace``): readers never see a half-written file and a
+rejected upload leaves nothing behind.
+
+References are counted in ``upload_blobs`` by row triggers on the URL
+columns (``URL_COLUMNS``), so every write path keeps them current. A file
+whose count dropped to zero is deleted by ``collect_garbage`` (with its
+resized variants) after ``UPLOAD_GC_GRACE_SECONDS``; re-uploading it in the
+meantime keeps it. Files that were never referenced (``/files/upload``) have
+no row and are kept.
+
+``python -m app.storage migrate`` moves files uploaded before into the
+store; ``python -m app.storage gc`` runs the garbage collection once.
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.staticfiles import StaticFiles
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .database import get_session_local
+from .models import Company, CompanyPortfolio, Service, UploadBlob, User
+from .settings import settings
+
+UPLOADS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "uploads"))
+BLOBS_DIR = os.path.join(UPLOADS_DIR, "blobs")
+
+# Tipos de imagem aceites -> extensão do ficheiro gravado
+IMAGE_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+}
+
+# Colunas com URLs de uploads (as mesmas dos triggers de upload_blobs)
+URL_COLUMNS = (
+    (User, "profile_photo_url"),
+    (User, "cover_photo_url"),
+    (Company, "logo_url"),
+    (Company, "cover_url"),
+    (Service, "image_url"),
+    (CompanyPortfolio, "media_url"),
+)
+
+
+def sniff_type(head: bytes) -> Optional[str]:
+    """Content type of a file from its first bytes (``None`` when not a known image)."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return None
+
+
+def blob_url(digest: str, ext: str) -> str:
+    return f"/uploads/blobs/{digest[:2]}/{digest}{ext}"
+
+
+def is_blob_url(url: Optional[str]) -> bool:
+    return bool(url) and url.startswith("/uploads/blobs/")
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """``StaticFiles`` for content-addressed files: browsers and CDNs keep them for a year."""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+# ---- gravação -----------------------------------------------------------------
+
+def _temp_file():
+    os.makedirs(BLOBS_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=BLOBS_DIR, prefix=".upload.", suffix=".part")
+    return os.fdopen(fd, "wb"), path
+
+
+def _finish(out) -> None:
+    out.flush()
+    os.fsync(out.fileno())
+    out.close()
+
+
+def _discard(out, path: str) -> None:
+    out.close()
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _commit_blob(temp_path: str, digest: str, ext: str) -> str:
+    """Move a complete temporary file to its content address; returns the URL."""
+    url = blob_url(digest, ext)
+    path = os.path.join(UPLOADS_DIR, *url[len("/uploads/"):].split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        # Já guardado: fica só uma cópia; a data nova protege-o de uma limpeza em curso
+        os.utime(path)
+    except FileNotFoundError:
+        os.replace(temp_path, path)
+        return url
+    if os.path.exists(path):
+        os.remove(temp_path)
+    else:
+        os.replace(temp_path, path)  # retirado por uma limpeza logo antes do utime: repõe-se
+    return url
+
+
+async def save_upload(file: UploadFile, max_bytes: Optional[int] = None, types: Optional[dict[str, str]] = None) -> str:
+    """Stream ``file`` into the store and return its ``/uploads/blobs`` URL.
+
+    Raises 415 when the content is not one of ``types`` (content type ->
+    extension, images by default), 413 past ``max_bytes`` and 400 for an
+    empty file.
+    """
+    max_bytes = max_bytes or settings.UPLOAD_MAX_BYTES
+    types = types or IMAGE_TYPES
+    out, temp_path = await run_in_threadpool(_temp_file)
+    try:
+        content_type = None
+        size = 0
+        digest = hashlib.sha256()
+        while chunk := await file.read(settings.UPLOAD_CHUNK_BYTES):
+            if content_type is None:
+                content_type = sniff_type(chunk)
+                if content_type not in types:
+                    raise HTTPException(
+                        status_code=415,
+                        detail=f"File type not allowed. Allowed types: {', '.join(types)}",
+                    )
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail=f"File too large. Max size: {max_bytes / 1024 / 1024:g}MB")
+            digest.update(chunk)
+            await run_in_threadpool(out.write, chunk)
+        if content_type is None:
+            raise HTTPException(status_code=400, detail="Empty file")
+        await run_in_threadpool(_finish, out)
+        return await run_in_threadpool(_commit_blob, temp_path, digest.hexdigest(), types[content_type])
+    except BaseException:
+        # Síncrono: também corre quando o pedido é cancelado (cliente desligou)
+        _discard(out, temp_path)
+        raise
+
+
+def store_file(source: str) -> str:
+    """Copy a local file into the store (``migrate``); returns its URL."""
+    out, temp_path = _temp_file()
+    try:
+        digest = hashlib.sha256()
+        head = None
+        with open(source, "rb") as f:
+            while chunk := f.read(settings.UPLOAD_CHUNK_BYTES):
+                if head is None:
+                    head = chunk
+                digest.update(chunk)
+                out.write(chunk)
+        _finish(out)
+        # Extensão pelo conteúdo; outros ficheiros (ex.: media_url) mantêm a sua
+        ext = IMAGE_TYPES.get(sniff_type(head or b"")) or os.path.splitext(source)[1].lower()
+        return _commit_blob(temp_path, digest.hexdigest(), ext)
+    except BaseException:
+        _discard(out, temp_path)
+        raise
+
+
+# ---- limpeza ------------------------------------------------------------------
+
+def _remove_blob(path: str, cutoff: datetime) -> bool:
+    """Delete an original last uploaded before ``cutoff`` and its variants; False when kept."""
+    directory, filename = os.path.split(path)
+    # Posto de lado antes de ver a data: um _commit_blob anterior deixou-a recente (repõe-se),
+    # um posterior já não o encontra e grava a sua cópia
+    aside = os.path.join(directory, f".gc.{os.getpid()}.{filename}")
+    try:
+        os.rename(path, aside)
+    except FileNotFoundError:
+        pass
+    else:
+        if datetime.utcfromtimestamp(os.stat(aside).st_mtime) >= cutoff:
+            os.replace(aside, path)
+            return False
+        os.remove(aside)
+    # Variantes (<hash>.<hash das variantes>.<variante>.<formato>)
+    digest = filename.split(".")[0]
+    for existing in os.listdir(directory) if os.path.isdir(directory) else ():
+        if existing.startswith(digest + "."):
+            os.remove(os.path.join(directory, existing))
+    return True
+
+
+def collect_garbage(db: Session) -> int:
+    """Delete the files released for longer than ``UPLOAD_GC_GRACE_SECONDS``; returns how many.
+
+    The rows are deleted first, with the same conditions, while locked: a
+    reference added meanwhile waits for this transaction and then counts
+    from a new row, and only the rows still unreferenced here have their
+    files removed.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.UPLOAD_GC_GRACE_SECONDS)
+    candidates = db.execute(
+        select(UploadBlob.url)
+        .where(UploadBlob.refs == 0, UploadBlob.released_at < cutoff)
+        .limit(1000)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    if not candidates:
+        db.commit()
+        return 0
+    released = db.execute(
+        delete(UploadBlob)
+        .where(UploadBlob.url.in_(candidates), UploadBlob.refs == 0, UploadBlob.released_at < cutoff)
+        .returning(UploadBlob.url, UploadBlob.released_at)
+    ).all()
+    removed = 0
+    for url, released_at in released:
+        path = os.path.join(UPLOADS_DIR, *url[len("/uploads/"):].split("/"))
+        try:
+            if _remove_blob(path, cutoff):
+                removed += 1
+                continue
+            # Enviado de novo entretanto: fica, e volta a ser candidato se a referência não chegar
+        except OSError as e:
+            print(f"⚠️ Could not remove upload {url}: {e}")
+        db.add(UploadBlob(url=url, refs=0, released_at=released_at))
+    db.commit()
+    return removed
+
+
+# ---- migração dos uploads anteriores ---------------------------------------------
+
+def _legacy_path(url: Optional[str]) -> Optional[str]:
+    if not url or not url.startswith("/uploads/") or is_blob_url(url):
+        return None
+    path = os.path.normpath(os.path.join(UPLOADS_DIR, url[len("/uploads/"):]))
+    if not path.startswith(UPLOADS_DIR + os.sep) or not os.path.isfile(path):
+        return None
+    return path
+
+
+def migrate(db: Session) -> tuple[int, int, int]:
+    """Move the files referenced by the URL columns into the store; returns ``(rows, files, blobs)``."""
+    from . import hooks, images  # hooks importa images, que importa este módulo
+
+    moved: dict[str, str] = {}
+    rows = 0
+    for model, url_attr in URL_COLUMNS:
+        column = getattr(model, url_attr)
+        entities = db.execute(
+            select(model).where(column.like("/uploads/%"), column.notlike("/uploads/blobs/%"))
+        ).scalars().all()
+        for entity in entities:
+            path = _legacy_path(getattr(entity, url_attr))
+            if path is None:
+                continue
+            if path not in moved:
+                moved[path] = store_file(path)
+            setattr(entity, url_attr, moved[path])
+            db.commit()
+            hooks.entity_saved(db, entity)
+            rows += 1
+    images.wait_for_renders()
+
+    # Originais e variantes antigas (<nome>.<hash>.<variante>.<formato>), já sem referências
+    for path in moved:
+        directory, filename = os.path.split(path)
+        stem = os.path.splitext(filename)[0]
+        for existing in os.listdir(directory):
+            parts = existing.split(".")
+            if existing == filename or (len(parts) == 4 and parts[0] == stem):
+                os.remove(os.path.join(directory, existing))
+        if not os.listdir(directory):
+            os.rmdir(directory)  # pasta da entidade (company_logos/<id>, ...) já vazia
+    return rows, len(moved), len(set(moved.values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Armazenamento dos uploads por conteúdo")
+    parser.add_argument("command", choices=("migrate", "gc"))
+    args = parser.parse_args()
+
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+    try:
+        if args.command == "migrate":
+            rows, files, blobs = migrate(db)
+            print(f"✅ {files} ficheiros movidos para /uploads/blobs ({blobs} distintos, {rows} referências atualizadas)")
+        else:
+            print(f"✅ {collect_garbage(db)} ficheiros sem referências removidos")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
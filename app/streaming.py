@@ -0,0 +1,157 @@
+"""
+Streaming exports (NDJSON or CSV) of whole tables.
+
+Rows are read through a server-side cursor (``yield_per``) in chunks of
+``EXPORT_CHUNK_ROWS``; each chunk is encoded and sent before the next one is
+fetched, so a worker's memory does not depend on the size of the table. The
+body generator is synchronous, so Starlette runs it in the threadpool and
+the event loop keeps serving other requests.
+
+An export opens its own session when the body starts (the request's session
+is closed before the response is sent) and keeps one pooled connection
+until it ends, so a worker runs at most ``EXPORT_MAX_CONCURRENT`` exports:
+the slot is taken when the response is built (503 past the cap) and given
+back when the body ends, or after the response when the body never started.
+"""
+import csv
+import io
+import json
+import threading
+from datetime import datetime
+from typing import Iterator
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import Select, select
+
+from .database import get_session_local
+from .models import Company, CompanyCredit, CreditTransaction, Service
+from .settings import settings
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+SERVICE_COLUMNS = (
+    Service.id, Service.company_id, Service.title, Service.description, Service.price, Service.category,
+    Service.tags, Service.status, Service.is_promoted, Service.views, Service.leads, Service.likes,
+    Service.image_url, Service.created_at, Service.updated_at,
+)
+COMPANY_COLUMNS = (
+    Company.id, Company.name, Company.description, Company.owner_id, Company.nuit, Company.nationality,
+    Company.province, Company.district, Company.address, Company.website, Company.email, Company.whatsapp,
+    Company.logo_url, Company.cover_url, Company.created_at,
+)
+TRANSACTION_COLUMNS = (
+    CreditTransaction.id, CompanyCredit.company_id, CreditTransaction.type, CreditTransaction.amount,
+    CreditTransaction.description, CreditTransaction.balance_before, CreditTransaction.balance_after,
+    CreditTransaction.created_at,
+)
+
+
+def services_query() -> Select:
+    return select(*SERVICE_COLUMNS).order_by(Service.id)
+
+
+def companies_query() -> Select:
+    return select(*COMPANY_COLUMNS).order_by(Company.id)
+
+
+def transactions_query() -> Select:
+    return (
+        select(*TRANSACTION_COLUMNS)
+        .join(CompanyCredit, CompanyCredit.id == CreditTransaction.company_credit_id)
+        .order_by(CreditTransaction.id)
+    )
+
+
+class _ExportSlots:
+    """Exports running in this worker, at most ``EXPORT_MAX_CONCURRENT``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.active = 0
+
+    def try_enter(self) -> bool:
+        """Take a slot; False when every slot is taken."""
+        with self._lock:
+            if self.active >= settings.EXPORT_MAX_CONCURRENT:
+                return False
+            self.active += 1
+            return True
+
+    def leave(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+
+class _Slot:
+    """One taken slot, given back once (by the body or by the response's background task)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._held = True
+
+    def release(self) -> None:
+        with self._lock:
+            held, self._held = self._held, False
+        if held:
+            export_slots.leave()
+
+
+export_slots = _ExportSlots()
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return ",".join(str(item) for item in value)
+    return _json_value(value)
+
+
+def _encode(columns: list[str], rows, fmt: str, header: bool = False) -> bytes:
+    if fmt == "ndjson":
+        return "".join(
+            json.dumps({column: _json_value(value) for column, value in zip(columns, row)}, ensure_ascii=False) + "\n"
+            for row in rows
+        ).encode()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    writer.writerows([_csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+
+def _stream_rows(query: Select, fmt: str, slot: _Slot) -> Iterator[bytes]:
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+    try:
+        result = db.execute(query.execution_options(yield_per=settings.EXPORT_CHUNK_ROWS))
+        columns = list(result.keys())
+        if fmt == "csv":
+            yield _encode(columns, [], fmt, header=True)
+        for rows in result.partitions():
+            yield _encode(columns, rows, fmt)
+    finally:
+        db.close()
+        slot.release()
+
+
+def export_response(query: Select, fmt: str, name: str) -> StreamingResponse:
+    """``StreamingResponse`` with every row of ``query`` as NDJSON or CSV (download named after ``name``)."""
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format '{fmt}' (use ndjson or csv)")
+    if not export_slots.try_enter():
+        raise HTTPException(status_code=503, detail="Too many exports in progress", headers={"Retry-After": "30"})
+    slot = _Slot()
+    filename = f"{name}-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}"
+    return StreamingResponse(
+        _stream_rows(query, fmt, slot),
+        media_type=FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        # Corpo nunca iniciado (cliente desligou antes): o slot volta depois da resposta
+        background=BackgroundTask(slot.release),
+    )
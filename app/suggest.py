@@ -0,0 +1,248 @@
+"""
+In-memory prefix index for search-as-you-type (``/search/suggest``).
+
+Suggestions come from service titles, categories and tags (active services)
+and company names. Every term is indexed under its normalized form
+(lowercase, no accents) and under each of its word suffixes, so "maputo"
+finds "Canalizações Maputo". Keys live in a sorted list: a lookup is one
+``bisect`` plus a short forward scan, without touching the database.
+Prefixes of up to ``SHORT_PREFIX_CHARS`` characters match too many keys
+for a bounded scan, so their most popular terms (``BUCKET_SIZE`` per type)
+are computed over the whole range once and kept until a write changes them.
+
+The index is built at startup and kept current by ``hooks`` on every
+write of this worker; a periodic rebuild picks up writes made by other
+workers.
+"""
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .models import Company, Service
+from .search_backend import _WORD_RE, normalize_query
+
+# Tipo de termo -> ordem de apresentação em caso de empate
+TERM_KINDS = ("service", "company", "category", "tag")
+
+Term = tuple[str, str]  # (tipo, texto original)
+
+SHORT_PREFIX_CHARS = 3
+BUCKET_SIZE = 20  # limite máximo de /search/suggest: cada tipo tem sempre sugestões suficientes
+
+
+def _keys(text: str) -> set[tuple[str, bool]]:
+    """``(key, starts_term)`` for the normalized text and each suffix starting at a word boundary."""
+    words = _WORD_RE.findall(normalize_query(text))
+    return {(" ".join(words[start:]), start == 0) for start in range(len(words))}
+
+
+def _service_terms(title: Optional[str], category: Optional[str], tags: Optional[Iterable[str]]) -> set[Term]:
+    terms = set()
+    if title:
+        terms.add(("service", title.strip()))
+    if category:
+        terms.add(("category", category.strip()))
+    for tag in tags or ():
+        if tag and tag.strip():
+            terms.add(("tag", tag.strip()))
+    return terms
+
+
+class PrefixIndex:
+    """Sorted-array prefix index with reference-counted terms.
+
+    Each source entity (``("service", id)`` / ``("company", id)``)
+    contributes a set of terms; a term stays indexed while at least one
+    source uses it, and its number of sources is its popularity.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys: list[tuple[str, str, str, bool]] = []  # (chave normalizada, tipo, texto, início do termo)
+        self._counts: Counter[Term] = Counter()
+        self._sources: dict[tuple[str, int], set[Term]] = {}
+        self._canonical: dict[tuple[str, str], Term] = {}  # (tipo, normalizado) -> termo exibido
+        # Prefixo curto -> termos mais populares de cada tipo (calculado na primeira leitura)
+        self._buckets: dict[str, list[tuple[Term, bool]]] = {}
+        self.built = False
+
+    # ---- escrita -------------------------------------------------------
+
+    def _canonical_term(self, term: Term) -> Term:
+        # "Música" e "musica" são o mesmo termo; mostra-se a primeira grafia vista
+        kind, text = term
+        return self._canonical.setdefault((kind, normalize_query(text)), term)
+
+    def _invalidate_buckets(self, text: str) -> None:
+        # A popularidade (ou presença) do termo mudou nos prefixos curtos de todas as suas chaves
+        for key, _ in _keys(text):
+            for length in range(1, SHORT_PREFIX_CHARS + 1):
+                self._buckets.pop(key[:length], None)
+
+    def _add_term(self, term: Term) -> None:
+        self._counts[term] += 1
+        self._invalidate_buckets(term[1])
+        if self._counts[term] == 1:
+            kind, text = term
+            for key, start in _keys(text):
+                insort(self._keys, (key, kind, text, start))
+
+    def _remove_term(self, term: Term) -> None:
+        self._counts[term] -= 1
+        self._invalidate_buckets(term[1])
+        if self._counts[term] > 0:
+            return
+        del self._counts[term]
+        kind, text = term
+        del self._canonical[(kind, normalize_query(text))]
+        for entry in _keys(text):
+            entry = (entry[0], kind, text, entry[1])
+            position = bisect_left(self._keys, entry)
+            if position < len(self._keys) and self._keys[position] == entry:
+                del self._keys[position]
+
+    def _set_source(self, source: tuple[str, int], terms: set[Term]) -> None:
+        old = self._sources.pop(source, set())
+        new = {self._canonical_term(term) for term in terms}
+        for term in new - old:
+            self._add_term(term)
+        for term in old - new:
+            self._remove_term(term)
+        if new:
+            self._sources[source] = new
+
+    def put(self, source: tuple[str, int], terms: set[Term]) -> None:
+        """Replace the terms contributed by ``source`` (empty set removes it)."""
+        with self._lock:
+            self._set_source(source, terms)
+
+    def replace_all(self, sources: dict[tuple[str, int], set[Term]]) -> None:
+        """Rebuild the whole index from ``{source: terms}``.
+
+        Counts are gathered first and the keys sorted once (``insort`` per
+        key would be quadratic); the swap is the only step under the lock.
+        """
+        fresh = PrefixIndex()
+        for source, terms in sources.items():
+            canonical = {fresh._canonical_term(term) for term in terms}
+            fresh._counts.update(canonical)
+            if canonical:
+                fresh._sources[source] = canonical
+        fresh._keys = [
+            (key, kind, text, start) for kind, text in fresh._counts for key, start in _keys(text)
+        ]
+        fresh._keys.sort()
+        with self._lock:
+            self._keys, self._counts = fresh._keys, fresh._counts
+            self._sources, self._canonical = fresh._sources, fresh._canonical
+            self._buckets = {}
+            self.built = True
+
+    # ---- leitura -------------------------------------------------------
+
+    def _matches(self, key: str, scan_limit: Optional[int]) -> dict[Term, bool]:
+        # Termos com uma chave a começar por ``key`` -> se algum deles começa o termo
+        found: dict[Term, bool] = {}
+        position = bisect_left(self._keys, (key,))
+        end = len(self._keys) if scan_limit is None else position + scan_limit
+        for entry_key, kind, text, start in self._keys[position:end]:
+            if not entry_key.startswith(key):
+                break
+            # Termo que começa pelo prefixo vale mais do que uma palavra do meio
+            found[(kind, text)] = found.get((kind, text), False) or start
+        return found
+
+    def _rank(self, found: dict[Term, bool]) -> list[Term]:
+        return sorted(
+            found,
+            key=lambda term: (not found[term], -self._counts[term], TERM_KINDS.index(term[0]), len(term[1]), term[1]),
+        )
+
+    def _bucket(self, key: str) -> list[tuple[Term, bool]]:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            found = self._matches(key, None)
+            per_kind = Counter()
+            bucket = []
+            for term in self._rank(found):
+                if per_kind[term[0]] < BUCKET_SIZE:
+                    per_kind[term[0]] += 1
+                    bucket.append((term, found[term]))
+            self._buckets[key] = bucket
+        return bucket
+
+    def suggest(self, prefix: str, limit: int = 8, kinds: Optional[Iterable[str]] = None,
+                scan_limit: int = 500) -> list[dict]:
+        """Most popular terms having a word starting with ``prefix`` (``limit`` at most ``BUCKET_SIZE``).
+
+        Short prefixes are ranked over every matching term (cached bucket);
+        longer ones over the first ``scan_limit`` matching index entries,
+        which is every match unless a prefix has more than that.
+        """
+        key = " ".join(normalize_query(prefix).split())
+        if not key:
+            return []
+        kinds = set(kinds) if kinds else None
+        with self._lock:
+            if len(key) <= SHORT_PREFIX_CHARS:
+                found = dict(self._bucket(key))
+            else:
+                found = self._matches(key, scan_limit)
+            if kinds is not None:
+                found = {term: start for term, start in found.items() if term[0] in kinds}
+            ranked = self._rank(found)[:limit]
+            counts = {term: self._counts[term] for term in ranked}
+        return [{"text": text, "type": kind, "count": counts[(kind, text)]} for kind, text in ranked]
+
+    def stats(self) -> dict:
+        with self._lock:
+            by_kind = Counter(kind for kind, _ in self._counts)
+            return {
+                "built": self.built,
+                "keys": len(self._keys),
+                "terms": len(self._counts),
+                "sources": len(self._sources),
+                "cached_prefixes": len(self._buckets),
+                "terms_by_type": dict(by_kind),
+            }
+
+
+suggest_index = PrefixIndex()
+
+
+def build_suggest_index(db: Session) -> None:
+    """Load every suggestion term from the database (column projection only)."""
+    sources: dict[tuple[str, int], set[Term]] = {}
+    rows = db.execute(
+        select(Service.id, Service.title, Service.category, Service.tags).where(Service.status == "Ativo")
+    )
+    for service_id, title, category, tags in rows:
+        sources[("service", service_id)] = _service_terms(title, category, tags)
+    for company_id, name in db.execute(select(Company.id, Company.name)):
+        if name:
+            sources[("company", company_id)] = {("company", name.strip())}
+    db.rollback()
+    suggest_index.replace_all(sources)
+
+
+def index_entity(entity) -> None:
+    """Refresh the terms of a Service or Company after it was written."""
+    if isinstance(entity, Service):
+        terms = _service_terms(entity.title, entity.category, entity.tags) if entity.status == "Ativo" else set()
+        suggest_index.put(("service", entity.id), terms)
+    elif isinstance(entity, Company):
+        suggest_index.put(("company", entity.id), {("company", entity.name.strip())} if entity.name else set())
+
+
+def unindex_entity(entity) -> None:
+    """Drop the terms of a Service or Company that is being deleted (with its services)."""
+    if isinstance(entity, Service):
+        suggest_index.put(("service", entity.id), set())
+    elif isinstance(entity, Company):
+        for service in entity.services:
+            suggest_index.put(("service", service.id), set())
+        suggest_index.put(("company", entity.id), set())
@@ -0,0 +1,54 @@
+"""
+Periodic background jobs.
+
+Jobs run on the worker's event loop; the blocking database work of each
+run is pushed to the threadpool with its own session, so requests are
+never held up by it.
+"""
+import asyncio
+from typing import Callable
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .database import get_session_local
+
+_tasks: list[asyncio.Task] = []
+
+
+def _run_with_session(job: Callable[[Session], None]) -> None:
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+    try:
+        job(db)
+    finally:
+        db.close()
+
+
+async def _run_periodically(name: str, interval: float, job: Callable[[Session], None], delay: bool) -> None:
+    if delay:
+        await asyncio.sleep(interval)
+    while True:
+        try:
+            await run_in_threadpool(_run_with_session, job)
+        except Exception as e:
+            print(f"⚠️ Background job '{name}' failed: {e}")
+        await asyncio.sleep(interval)
+
+
+async def run_once(job: Callable[[Session], None]) -> None:
+    """Run ``job(db)`` once in the threadpool and wait for it (e.g. during startup)."""
+    await run_in_threadpool(_run_with_session, job)
+
+
+def start_periodic(name: str, interval: float, job: Callable[[Session], None], delay: bool = False) -> None:
+    """Run ``job(db)`` now (or after ``interval`` with ``delay``) and then every ``interval`` seconds until shutdown."""
+    _tasks.append(asyncio.create_task(_run_periodically(name, interval, job, delay), name=name))
+
+
+async def stop_all() -> None:
+    """Cancel every periodic job (called on application shutdown)."""
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Gerador de um corpus sintético de negócios moçambicanos para os benchmarks.
+
+Cria utilizadores, empresas (com província/distrito reais), serviços (com
+categoria, tags, preço e estado) e portfólios, de forma reprodutível
+(``--seed``). Os dados são inseridos com COPY; as colunas geradas
+(search_vector, *_norm) são calculadas pelo PostgreSQL.
+
+Usa a base de dados configurada em DATABASE_URL (app/settings.py), que deve
+ser uma base dedicada aos benchmarks: ``--reset`` apaga TODOS os dados das
+tabelas do catálogo.
+Exemplo:
+    python -m benchmarks.corpus --services 100000 --reset
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from sqlalchemy import text
+
+from app.database import get_engine, get_session_local
+from app.feed import rebuild_feed_items
+
+# Províncias -> distritos (amostra real)
+PROVINCES = {
+    "Maputo Cidade": ["KaMpfumo", "Nlhamankulu", "KaMaxakeni", "KaMavota", "KaMubukwana", "KaTembe"],
+    "Maputo": ["Matola", "Boane", "Marracuene", "Manhiça", "Namaacha"],
+    "Gaza": ["Xai-Xai", "Chókwè", "Chibuto", "Bilene"],
+    "Inhambane": ["Inhambane", "Maxixe", "Vilankulo", "Massinga"],
+    "Sofala": ["Beira", "Dondo", "Nhamatanda", "Búzi"],
+    "Manica": ["Chimoio", "Gondola", "Manica", "Sussundenga"],
+    "Tete": ["Tete", "Moatize", "Angónia", "Cahora-Bassa"],
+    "Zambézia": ["Quelimane", "Mocuba", "Gurué", "Milange"],
+    "Nampula": ["Nampula", "Nacala", "Angoche", "Ilha de Moçambique"],
+    "Cabo Delgado": ["Pemba", "Montepuez", "Mocímboa da Praia"],
+    "Niassa": ["Lichinga", "Cuamba", "Mandimba"],
+}
+
+# Categoria -> (títulos de serviço, tags, faixa de preço em MT)
+CATEGORIES = {
+    "Canalização": (["Canalizador profissional", "Reparação de fugas", "Instalação de esquentadores", "Desentupimento"],
+                    ["canos", "reparação", "água", "urgente"], (500, 8000)),
+    "Eletrónica": (["Reparação de telemóveis", "Instalação eletrónica", "Montagem de painéis solares", "Reparação de TV"],
+                   ["eletrónica", "telemóveis", "solar", "instalação"], (300, 25000)),
+    "Transporte": (["Mudanças e fretes", "Transporte de mercadorias", "Chapa para eventos", "Entrega de encomendas"],
+                   ["transporte", "entrega", "camião", "mudanças"], (250, 40000)),
+    "Saúde": (["Entrega de medicamentos", "Consultas ao domicílio", "Farmácia de turno", "Fisioterapia"],
+              ["farmácia", "saúde", "medicamentos", "domicílio"], (200, 15000)),
+    "Design": (["Design gráfico", "Criação de logótipos", "Impressão de capulanas personalizadas", "Fotografia de eventos"],
+               ["design", "logótipo", "fotografia", "impressão"], (1000, 50000)),
+    "Construção": (["Pedreiro e acabamentos", "Pintura de casas", "Serralharia", "Carpintaria por medida"],
+                   ["construção", "pintura", "obras", "madeira"], (1500, 200000)),
+    "Alimentação": (["Catering para casamentos", "Bolos por encomenda", "Matapa e xima ao domicílio", "Mariscos frescos"],
+                    ["comida", "catering", "eventos", "marisco"], (150, 60000)),
+    "Educação": (["Explicações de matemática", "Aulas de inglês", "Curso de informática", "Preparação para exames"],
+                 ["explicações", "aulas", "informática", "inglês"], (300, 10000)),
+    "Tecnologia": (["Desenvolvimento de sites", "Suporte informático", "Instalação de redes", "Pagamentos M-Pesa e e-Mola"],
+                   ["software", "redes", "m-pesa", "internet"], (2000, 150000)),
+    "Beleza": (["Salão de cabeleireiro", "Tranças e extensões", "Manicure ao domicílio", "Maquilhagem para noivas"],
+               ["beleza", "cabelo", "tranças", "maquilhagem"], (200, 12000)),
+}
+
+FIRST_NAMES = ["João", "Maria", "Armando", "Celeste", "Félix", "Luísa", "Samora", "Graça", "Tomás", "Ana", "Edson",
+               "Júlia", "Arlindo", "Nélia", "Hélder", "Sónia", "Benedito", "Inês", "Zacarias", "Lurdes"]
+SURNAMES = ["Cossa", "Mondlane", "Machel", "Sitoe", "Nhantumbo", "Macuácua", "Tembe", "Muianga", "Chissano",
+            "Langa", "Matsinhe", "Mabunda", "Macamo", "Tivane", "Massingue", "Chauque", "Zandamela", "Guambe"]
+COMPANY_SUFFIXES = ["Serviços", "& Filhos", "Lda", "Comercial", "Soluções", "Express", "Moçambique", "Group"]
+DESCRIPTION_WORDS = ["qualidade", "rápido", "confiança", "preço justo", "atendimento", "experiência", "garantia",
+                     "profissionais", "certificados", "disponível", "fim de semana", "orçamento grátis"]
+
+# Proporções em relação ao número de serviços
+COMPANIES_PER_SERVICE = 0.1
+EXTRA_USERS_PER_SERVICE = 0.05
+PORTFOLIOS_PER_SERVICE = 0.2
+
+CATALOGUE_TABLES = (
+    "credit_transactions, company_credits, services, company_portfolios, companies, users, feed_items, "
+    "service_likes, user_preferences"
+)
+
+
+def _description(rng: random.Random, *subjects: str) -> str:
+    words = rng.sample(DESCRIPTION_WORDS, 4)
+    return f"{' '.join(subjects)}: {', '.join(words)}."
+
+
+def _created_at(rng: random.Random, now: datetime) -> datetime:
+    return now - timedelta(seconds=rng.randint(0, 2 * 365 * 24 * 3600))
+
+
+def _array_literal(values: list[str]) -> str:
+    return "{" + ",".join('"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"' for value in values) + "}"
+
+
+def _users(rng: random.Random, count: int, start_id: int, run: str, now: datetime) -> Iterator[tuple]:
+    for user_id in range(start_id, start_id + count):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(SURNAMES)}"
+        yield (user_id, f"user{user_id}.{run}@bench.bizlink.co.mz", name, "benchmark-not-a-hash", True,
+               rng.choice(["Masculino", "Feminino", "Outro"]), _created_at(rng, now))
+
+
+def _companies(rng: random.Random, count: int, start_id: int, owners: list[int], run: str,
+               now: datetime) -> Iterator[tuple]:
+    for offset, company_id in enumerate(range(start_id, start_id + count)):
+        province = rng.choice(list(PROVINCES))
+        district = rng.choice(PROVINCES[province])
+        category = rng.choice(list(CATEGORIES))
+        name = f"{rng.choice(SURNAMES)} {category} {rng.choice(COMPANY_SUFFIXES)} {company_id}{run}"
+        yield (company_id, name, _description(rng, category, district), owners[offset % len(owners)],
+               "Moçambicana", province, district, f"Av. {rng.choice(SURNAMES)}, {rng.randint(1, 2000)}",
+               f"+25884{rng.randint(1000000, 9999999)}", _created_at(rng, now))
+
+
+def _services(rng: random.Random, count: int, start_id: int, company_ids: list[int], now: datetime) -> Iterator[tuple]:
+    categories = list(CATEGORIES)
+    for service_id in range(start_id, start_id + count):
+        category = rng.choice(categories)
+        titles, tags, (low, high) = CATEGORIES[category]
+        title = rng.choice(titles)
+        province = rng.choice(list(PROVINCES))
+        created_at = _created_at(rng, now)
+        yield (service_id, rng.choice(company_ids), f"{title} em {rng.choice(PROVINCES[province])}",
+               _description(rng, title, province), round(rng.uniform(low, high), 2), category,
+               _array_literal(rng.sample(tags, rng.randint(1, 3))), "Ativo" if rng.random() < 0.85 else "Pausado",
+               int(rng.paretovariate(1.2)) * 3, rng.randint(0, 40), rng.randint(0, 200), rng.random() < 0.05,
+               created_at, created_at)
+
+
+def _portfolios(rng: random.Random, count: int, start_id: int, company_ids: list[int], now: datetime) -> Iterator[tuple]:
+    categories = list(CATEGORIES)
+    for portfolio_id in range(start_id, start_id + count):
+        titles, _, _ = CATEGORIES[rng.choice(categories)]
+        title = f"Projeto: {rng.choice(titles)}"
+        yield (portfolio_id, rng.choice(company_ids), title, _description(rng, title), _created_at(rng, now))
+
+
+def _copy(cursor, table: str, columns: str, rows: Iterator[tuple]) -> int:
+    written = 0
+    with cursor.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+        for row in rows:
+            copy.write_row(row)
+            written += 1
+    return written
+
+
+def generate(services: int, seed: int = 42, reset: bool = False) -> dict[str, int]:
+    """Insert a corpus sized by its number of services; returns the row counts per table."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    n_companies = max(1, int(services * COMPANIES_PER_SERVICE))
+    n_users = n_companies + int(services * EXTRA_USERS_PER_SERVICE)
+    n_portfolios = int(services * PORTFOLIOS_PER_SERVICE)
+
+    engine = get_engine()
+    with engine.begin() as conn:
+        if reset:
+            conn.execute(text(f"TRUNCATE {CATALOGUE_TABLES} RESTART IDENTITY CASCADE"))
+        # Ids explícitos a seguir aos existentes: permite acrescentar a um corpus já carregado
+        starts = {
+            table: conn.execute(text(f"SELECT coalesce(max(id), 0) + 1 FROM {table}")).scalar()
+            for table in ("users", "companies", "services", "company_portfolios")
+        }
+        run = "" if reset else f"-{seed}-{int(time.time())}"
+
+        cursor = conn.connection.cursor()
+        counts = {}
+        user_ids = list(range(starts["users"], starts["users"] + n_users))
+        company_ids = list(range(starts["companies"], starts["companies"] + n_companies))
+        counts["users"] = _copy(cursor, "users", "id, email, full_name, hashed_password, is_active, gender, created_at",
+                                _users(rng, n_users, starts["users"], run, now))
+        counts["companies"] = _copy(
+            cursor, "companies",
+            "id, name, description, owner_id, nationality, province, district, address, whatsapp, created_at",
+            _companies(rng, n_companies, starts["companies"], user_ids, run, now),
+        )
+        counts["services"] = _copy(
+            cursor, "services",
+            "id, company_id, title, description, price, category, tags, status, views, leads, likes, is_promoted, "
+            "created_at, updated_at",
+            _services(rng, services, starts["services"], company_ids, now),
+        )
+        counts["company_portfolios"] = _copy(
+            cursor, "company_portfolios", "id, company_id, title, description, created_at",
+            _portfolios(rng, n_portfolios, starts["company_portfolios"], company_ids, now),
+        )
+        for table in counts:
+            conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"))
+
+    # Tabelas derivadas (o COPY não passa pelos hooks dos routers)
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+    try:
+        rebuild_feed_items(db)
+    finally:
+        db.close()
+
+    # Estatísticas do planner e agregados derivados
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE"))
+        conn.execute(text("REFRESH MATERIALIZED VIEW service_tag_stats"))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um corpus sintético de negócios moçambicanos")
+    parser.add_argument("--services", type=int, default=10_000, help="Número de serviços (o resto é proporcional)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="Apaga os dados do catálogo antes de gerar")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = generate(args.services, seed=args.seed, reset=args.reset)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Corpus gerado em {elapsed:.1f}s: " + ", ".join(f"{table}={count}" for table, count in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
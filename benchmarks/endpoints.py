@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos endpoints de pesquisa e do feed com pedidos guionados.
+
+Por omissão os pedidos passam pela aplicação em processo (TestClient: routing,
+validação, serialização, base de dados de DATABASE_URL); com ``--base-url``
+são enviados a um servidor já a correr, opcionalmente com ``--concurrency``.
+Os caches de pesquisa são limpos antes de cada pedido em processo (salvo
+``--warm-cache``), para medir o custo real das queries.
+
+O cenário "ilike (baseline)" repete as 4 queries ``ILIKE '%termo%'`` do
+desenho original da pesquisa, como referência.
+Exemplo:
+    python -m benchmarks.endpoints --iterations 200
+    python -m benchmarks.endpoints --base-url http://localhost:8000 --concurrency 8
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from sqlalchemy import or_
+
+from app.database import get_session_local
+from app.models import Company, CompanyPortfolio, Service, User
+from benchmarks.timing import print_table, summarize, timer
+
+SEARCH_TERMS = ["canalizador", "farmácia", "maputo", "eletronica", "transporte de mercadorias", "design gráfico",
+                "catering", "beira", "painéis solares", "explicações"]
+FUZZY_TERMS = ["canalisador", "farmacia", "mapto", "eletronca", "trasporte", "desing"]
+ADVANCED_QUERIES = [
+    {"q": "reparação", "category": "eletronica", "min_price": 500},
+    {"q": "transporte", "location": "Sofala", "tags": "entrega,camião"},
+    {"q": "catering", "tags": "eventos", "tags_mode": "all", "max_price": 20000},
+    {"q": "aulas", "location": "nampula", "category": "Educação"},
+]
+SUGGEST_PREFIXES = ["ca", "far", "map", "ele", "tra", "des", "bel", "m-p", "con", "expl"]
+
+
+class Target:
+    """Envia pedidos GET à aplicação em processo ou a um servidor remoto."""
+
+    def __init__(self, base_url: Optional[str] = None, warm_cache: bool = False):
+        self.warm_cache = warm_cache
+        if base_url:
+            import httpx
+            self.client = httpx.Client(base_url=base_url, timeout=60)
+            self.remote = True
+        else:
+            from fastapi.testclient import TestClient
+            from app.main import app
+            self.client = TestClient(app)
+            self.client.__enter__()  # eventos de startup (índice de sugestões, tarefas)
+            self.remote = False
+
+    def get(self, path: str, params: Optional[dict] = None) -> dict:
+        if not self.remote and not self.warm_cache:
+            from app.cache import search_facets_cache, search_results_cache
+            search_results_cache.clear()
+            search_facets_cache.clear()
+        response = self.client.get(path, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    def close(self) -> None:
+        if self.remote:
+            self.client.close()
+        else:
+            self.client.__exit__(None, None, None)
+
+
+def _search_pages(target: Target, term: str, pages: int) -> None:
+    """Percorre ``pages`` páginas de serviços seguindo os cursores."""
+    params = {"q": term, "limit": 20}
+    for _ in range(pages):
+        cursor = target.get("/search/", params).get("next_cursors", {}).get("services")
+        if not cursor:
+            return
+        params = {"q": term, "limit": 20, "cursor": cursor}
+
+
+def _feed_walk(target: Target, pages: int, mode: str = "recent") -> None:
+    """Percorre ``pages`` páginas do feed a partir do topo."""
+    params = {"limit": 20, "mode": mode}
+    for _ in range(pages):
+        page = target.get("/search/feed", params)
+        next_page = page.get("next_page_info")
+        if not page.get("has_more") or not next_page:
+            return
+        params = {"limit": 20, "mode": mode, "cursor": next_page["cursor"]}
+
+
+def _ilike_baseline(term: str, limit: int = 20) -> None:
+    """As 4 queries ILIKE do desenho original (sem índices utilizáveis)."""
+    pattern = f"%{term}%"
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+    try:
+        db.query(Service).filter(or_(
+            Service.title.ilike(pattern), Service.description.ilike(pattern), Service.category.ilike(pattern)
+        )).limit(limit).all()
+        db.query(Company).filter(or_(
+            Company.name.ilike(pattern), Company.description.ilike(pattern), Company.province.ilike(pattern),
+            Company.district.ilike(pattern), Company.address.ilike(pattern), Company.nationality.ilike(pattern)
+        )).limit(limit).all()
+        db.query(User).filter(or_(User.full_name.ilike(pattern), User.email.ilike(pattern))).limit(limit).all()
+        db.query(CompanyPortfolio).filter(or_(
+            CompanyPortfolio.title.ilike(pattern), CompanyPortfolio.description.ilike(pattern)
+        )).limit(limit).all()
+    finally:
+        db.close()
+
+
+def scenarios(target: Target, pages: int) -> dict[str, Callable[[int], None]]:
+    """Cenário -> função que executa o i-ésimo pedido (ou sequência de pedidos)."""
+    def pick(items, i):
+        return items[i % len(items)]
+
+    return {
+        "ilike (baseline)": lambda i: _ilike_baseline(pick(SEARCH_TERMS, i)),
+        "/search fts": lambda i: target.get("/search/", {"q": pick(SEARCH_TERMS, i)}),
+        "/search fuzzy": lambda i: target.get("/search/", {"q": pick(FUZZY_TERMS, i), "mode": "fuzzy"}),
+        "/search/advanced": lambda i: target.get("/search/advanced", pick(ADVANCED_QUERIES, i)),
+        f"/search paginação x{pages}": lambda i: _search_pages(target, pick(SEARCH_TERMS, i), pages),
+        "/search/suggest": lambda i: target.get("/search/suggest", {"prefix": pick(SUGGEST_PREFIXES, i)}),
+        "/search/tags": lambda i: target.get("/search/tags", {"prefix": pick(SUGGEST_PREFIXES, i)[:2]}),
+        f"/search/feed walk x{pages}": lambda i: _feed_walk(target, pages),
+        f"/search/feed ranked walk x{pages}": lambda i: _feed_walk(target, pages, "ranked"),
+    }
+
+
+def _measure(step: Callable[[int], None], iterations: int, concurrency: int) -> dict:
+    # Aquecimento: planos, cache de páginas e ligações do pool
+    for i in range(min(5, iterations)):
+        step(i)
+    samples: list[float] = []
+    start = time.perf_counter()
+    if concurrency > 1:
+        def timed(i):
+            with timer(samples):
+                step(i)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(timed, range(iterations)))
+    else:
+        for i in range(iterations):
+            with timer(samples):
+                step(i)
+    return summarize(samples, wall_seconds=time.perf_counter() - start)
+
+
+def run(iterations: int = 100, pages: int = 5, base_url: Optional[str] = None, concurrency: int = 1,
+        warm_cache: bool = False, only: Optional[list[str]] = None) -> dict[str, dict]:
+    target = Target(base_url, warm_cache)
+    try:
+        results = {}
+        for name, step in scenarios(target, pages).items():
+            if only and not any(fragment in name for fragment in only):
+                continue
+            if base_url and name == "ilike (baseline)":
+                continue  # corre localmente, não faz sentido contra um servidor remoto
+            results[name] = _measure(step, iterations, concurrency)
+        return results
+    finally:
+        target.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede latência e throughput dos endpoints de pesquisa e do feed")
+    parser.add_argument("--iterations", type=int, default=100, help="Pedidos (ou sequências) por cenário")
+    parser.add_argument("--pages", type=int, default=5, help="Páginas por sequência de paginação/feed")
+    parser.add_argument("--base-url", help="Servidor a testar (por omissão: aplicação em processo)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Pedidos simultâneos (com --base-url)")
+    parser.add_argument("--warm-cache", action="store_true", help="Não limpar os caches entre pedidos")
+    parser.add_argument("--only", action="append", help="Apenas cenários cujo nome contém este texto (repetível)")
+    args = parser.parse_args()
+
+    results = run(args.iterations, args.pages, args.base_url, args.concurrency, args.warm_cache, args.only)
+    print_table(f"Endpoints (iterations={args.iterations}, concurrency={args.concurrency})", results)
+
+
+if __name__ == "__main__":
+    main()
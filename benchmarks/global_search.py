@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Benchmark da pesquisa global: 4 queries sequenciais vs. um único UNION ALL.
+
+Usa a base de dados configurada em DATABASE_URL (app/settings.py).
+Exemplo:
+    python -m benchmarks.global_search --iterations 300 --limit 20
+"""
+import argparse
+
+from app.database import get_session_local
+from app.search_backend import build_tsquery, search_all
+from benchmarks.timing import print_table, summarize, timer
+
+DEFAULT_QUERIES = ["transporte", "farmácia", "canalizador", "maputo", "eletrónica", "design gráfico"]
+
+
+def run(queries: list[str], iterations: int, limit: int, mode: str) -> dict[str, dict]:
+    SessionLocal = get_session_local()
+    results = {}
+    for strategy, single_query in (("sequencial (4 queries)", False), ("union all (1 query)", True)):
+        samples: list[float] = []
+        db = SessionLocal()
+        try:
+            # Aquecimento: planos e cache de páginas
+            for term in queries:
+                search_all(db, term, build_tsquery(term), mode=mode, limit=limit, single_query=single_query)
+            for i in range(iterations):
+                term = queries[i % len(queries)]
+                with timer(samples):
+                    search_all(db, term, build_tsquery(term), mode=mode, limit=limit, single_query=single_query)
+                db.rollback()
+        finally:
+            db.close()
+        results[strategy] = summarize(samples)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara as estratégias de execução da pesquisa global")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--mode", choices=["fts", "fuzzy"], default="fts")
+    parser.add_argument("--query", action="append", dest="queries", help="Termo a pesquisar (repetível)")
+    args = parser.parse_args()
+
+    results = run(args.queries or DEFAULT_QUERIES, args.iterations, args.limit, args.mode)
+    print_table(f"Pesquisa global ({args.mode}, limit={args.limit})", results)
+
+
+if __name__ == "__main__":
+    main()
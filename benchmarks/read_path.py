@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Custo por pedido do caminho de leitura dos cartões (feed e pesquisa): CPU,
+memória e tamanho da resposta.
+
+Cada cenário faz pedidos à aplicação em processo (TestClient, caches de
+pesquisa limpos) e mede, por pedido, o tempo de CPU do processo
+(``time.process_time``: driver, ORM, serialização), o pico de memória
+alocada (``tracemalloc``) e os bytes do corpo da resposta.
+
+Os cenários "search_all" medem só a camada de dados da pesquisa, nas duas
+estratégias de execução (4 queries sequenciais ou um UNION ALL).
+Exemplo:
+    python -m benchmarks.read_path --iterations 100
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Callable
+
+from app.database import get_session_local
+from app.search_backend import build_tsquery, search_all
+from benchmarks.endpoints import SEARCH_TERMS, Target
+from benchmarks.timing import percentile
+
+SPARSE_FIELDS = "id,title,name,full_name,price,category,province,image_url,logo_url"
+
+
+def _search_layer(term: str, single_query: bool, fields=None) -> int:
+    """``search_all`` sem HTTP: só a query e a construção dos cartões."""
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+    try:
+        extra = {"fields": fields} if fields else {}
+        found, _ = search_all(db, term, build_tsquery(term), single_query=single_query, **extra)
+        return len(json.dumps(found, default=str))
+    finally:
+        db.close()
+
+
+def scenarios(target: Target) -> dict[str, Callable[[int], int]]:
+    """Cenário -> função que executa o i-ésimo pedido e devolve o tamanho da resposta."""
+    def term(i):
+        return SEARCH_TERMS[i % len(SEARCH_TERMS)]
+
+    def get(path, params):
+        return lambda i: len(target.client.get(path, params=params(i)).content)
+
+    return {
+        "search_all sequencial": lambda i: _search_layer(term(i), False),
+        "search_all union": lambda i: _search_layer(term(i), True),
+        "search_all fields=": lambda i: _search_layer(term(i), True, SPARSE_FIELDS.split(",")),
+        "/search": get("/search/", lambda i: {"q": term(i)}),
+        "/search fields=": get("/search/", lambda i: {"q": term(i), "fields": SPARSE_FIELDS}),
+        "/search/feed": get("/search/feed", lambda i: {"limit": 50}),
+        "/search/feed fields=": get("/search/feed", lambda i: {"limit": 50, "fields": SPARSE_FIELDS}),
+    }
+
+
+def _measure(step: Callable[[int], int], iterations: int) -> dict:
+    from app.cache import search_facets_cache, search_results_cache
+    for i in range(min(5, iterations)):
+        step(i)
+    cpu, peaks, sizes = [], [], []
+    for i in range(iterations):
+        search_results_cache.clear()
+        search_facets_cache.clear()
+        tracemalloc.start()
+        start = time.process_time()
+        sizes.append(step(i))
+        cpu.append((time.process_time() - start) * 1000)
+        peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+    return {
+        "n": iterations,
+        "cpu_p50_ms": round(percentile(cpu, 50), 2),
+        "cpu_mean_ms": round(sum(cpu) / len(cpu), 2),
+        "mem_peak_p50_kib": round(percentile(peaks, 50), 1),
+        "bytes_mean": round(sum(sizes) / len(sizes)),
+    }
+
+
+def run(iterations: int = 50) -> dict[str, dict]:
+    target = Target()
+    try:
+        return {name: _measure(step, iterations) for name, step in scenarios(target).items()}
+    finally:
+        target.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede CPU, memória e bytes por pedido dos cartões do feed e da pesquisa")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    results = run(args.iterations)
+    print(f"\n📊 Caminho de leitura (iterations={args.iterations}; tracemalloc ativo)")
+    print(f"{'cenário':<24}{'CPU p50 ms':>12}{'CPU média':>12}{'mem pico KiB':>14}{'bytes':>10}")
+    for name, stats in results.items():
+        print(
+            f"{name:<24}{stats['cpu_p50_ms']:>12}{stats['cpu_mean_ms']:>12}"
+            f"{stats['mem_peak_p50_kib']:>14}{stats['bytes_mean']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
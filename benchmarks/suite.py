@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Suite completa: gera o corpus em cada escala e mede os endpoints.
+
+Para cada escala (número de serviços; empresas, utilizadores e portfólios
+são proporcionais) o catálogo é apagado e regenerado com a mesma semente,
+e todos os cenários de ``benchmarks.endpoints`` são executados. Os
+resultados podem ser guardados em JSON para comparar entre commits.
+
+ATENÇÃO: apaga os dados do catálogo da base em DATABASE_URL.
+Exemplo:
+    python -m benchmarks.suite --scales 10000,100000,1000000 --output resultados.json
+"""
+import argparse
+import json
+import subprocess
+import time
+
+from benchmarks import corpus, endpoints
+from benchmarks.timing import print_table
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Corpus sintético + benchmark dos endpoints em várias escalas")
+    parser.add_argument("--scales", default="10000,100000,1000000", help="Números de serviços, separados por vírgula")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", action="append", help="Apenas cenários cujo nome contém este texto (repetível)")
+    parser.add_argument("--output", help="Ficheiro JSON com os resultados")
+    args = parser.parse_args()
+
+    report = {"revision": _git_revision(), "seed": args.seed, "iterations": args.iterations, "scales": {}}
+    for scale in [int(value) for value in args.scales.split(",") if value.strip()]:
+        start = time.perf_counter()
+        counts = corpus.generate(scale, seed=args.seed, reset=True)
+        print(f"\n✅ Corpus de {scale} serviços gerado em {time.perf_counter() - start:.1f}s: {counts}")
+        results = endpoints.run(args.iterations, args.pages, only=args.only)
+        print_table(f"{scale} serviços", results)
+        report["scales"][scale] = {"rows": counts, "results": results}
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultados guardados em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Helpers de medição partilhados pelos benchmarks.
+"""
+import time
+from contextlib import contextmanager
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Percentil por interpolação linear (pct entre 0 e 100)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+@contextmanager
+def timer(samples: list[float]):
+    """Acrescenta a duração do bloco (em ms) à lista de amostras."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        samples.append((time.perf_counter() - start) * 1000)
+
+
+def summarize(samples: list[float], wall_seconds: float | None = None) -> dict:
+    """p50/p95/p99/média em ms e throughput (req/s).
+
+    Sem ``wall_seconds`` o throughput é o sequencial (soma das durações);
+    com pedidos concorrentes passa-se o tempo de relógio total.
+    """
+    total_ms = sum(samples)
+    elapsed = wall_seconds if wall_seconds is not None else total_ms / 1000
+    return {
+        "n": len(samples),
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "mean_ms": round(total_ms / len(samples), 3) if samples else 0.0,
+        "rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def print_table(title: str, rows: dict[str, dict]) -> None:
+    print(f"\n📊 {title}")
+    print(f"{'cenário':<28}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'média':>10}{'req/s':>10}")
+    for name, stats in rows.items():
+        print(
+            f"{name:<28}{stats['n']:>7}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}"
+            f"{stats['mean_ms']:>10}{stats['rps']:>10}"
+        )
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app.pagination import decode_cursor, encode_cursor
+from app.routers.search import _feed_cursor, _parse_feed_cursor, _parse_search_cursor
+from app.routers.services import _parse_company_cursor, _parse_shuffle_cursor
+
+
+def assert_invalid(parse, *args):
+    with pytest.raises(HTTPException) as error:
+        parse(*args)
+    assert error.value.status_code == 400
+    assert error.value.detail == "Invalid cursor"
+
+
+def test_cursor_round_trip():
+    position = {"t": "services", "s": 0.25, "i": 42}
+    token = encode_cursor(position)
+    assert "=" not in token
+    assert decode_cursor(token) == position
+
+
+@pytest.mark.parametrize("token", ["not a cursor!", encode_cursor({}) + "%", "W10", "bnVsbA"])
+def test_decode_rejects_malformed(token):
+    # Base64 inválido, JSON inválido, lista ([]) e null
+    assert_invalid(decode_cursor, token)
+
+
+def test_search_cursor():
+    assert _parse_search_cursor(None) is None
+    position = {"t": "companies", "s": 1.5, "i": 7}
+    assert _parse_search_cursor(encode_cursor(position)) == position
+    assert_invalid(_parse_search_cursor, encode_cursor({"t": "planets", "s": 1.5, "i": 7}))
+    assert_invalid(_parse_search_cursor, encode_cursor({"t": "services", "s": "high", "i": 7}))
+    assert_invalid(_parse_search_cursor, encode_cursor({"t": "services", "s": 1.5}))
+
+
+def test_feed_cursor_round_trip():
+    assert _parse_feed_cursor(None, "recent") is None
+    recent = (datetime(2026, 10, 18, 9, 30, 15, 123456), 12)
+    assert _parse_feed_cursor(_feed_cursor(recent, "recent"), "recent") == recent
+    ranked = (3.75, 12)
+    assert _parse_feed_cursor(_feed_cursor(ranked, "ranked"), "ranked") == ranked
+
+
+def test_feed_cursor_rejects_other_mode_and_bad_values():
+    recent = _feed_cursor((datetime(2026, 10, 18), 12), "recent")
+    assert_invalid(_parse_feed_cursor, recent, "ranked")
+    assert_invalid(_parse_feed_cursor, _feed_cursor((3.75, 12), "ranked"), "recent")
+    assert_invalid(_parse_feed_cursor, encode_cursor({"c": "yesterday", "i": 12}), "recent")
+    assert_invalid(_parse_feed_cursor, encode_cursor({"c": "2026-10-18T00:00:00", "i": "12"}), "recent")
+
+
+def test_company_cursor():
+    position = {"c": "2026-10-18T09:30:15", "i": 5}
+    assert _parse_company_cursor(encode_cursor(position)) == (datetime(2026, 10, 18, 9, 30, 15), 5)
+    assert_invalid(_parse_company_cursor, encode_cursor({"c": "soon", "i": 5}))
+    assert_invalid(_parse_company_cursor, encode_cursor({"i": 5}))
+
+
+def test_shuffle_cursor():
+    token = encode_cursor({"seed": 9, "k": 0.5, "i": 3, "w": True})
+    assert _parse_shuffle_cursor(token) == (9, (0.5, 3, True))
+    for position in (
+        {"k": 0.5, "i": 3, "w": True},
+        {"seed": "9", "k": 0.5, "i": 3, "w": True},
+        {"seed": 9, "k": None, "i": 3, "w": True},
+        {"seed": 9, "k": 0.5, "i": 3, "w": 1},
+    ):
+        assert_invalid(_parse_shuffle_cursor, encode_cursor(position))
@@ -0,0 +1,121 @@
+import pytest
+from sqlalchemy import select
+
+from app import engagement
+from app.cache import engagement_seen_cache, preference_cache
+from app.models import FeedItem, Service, UserPreference
+from app.routers import services as services_router
+from app.search_backend import normalize_query
+from app.settings import settings
+
+
+@pytest.fixture
+def buffer(monkeypatch):
+    buffer = engagement.CounterBuffer()
+    monkeypatch.setattr(engagement, "engagement_buffer", buffer)
+    monkeypatch.setattr(services_router, "engagement_buffer", buffer)
+    engagement_seen_cache.clear()
+    preference_cache.clear()
+    yield buffer
+    engagement_seen_cache.clear()
+    preference_cache.clear()
+
+
+@pytest.fixture
+def two_services(db):
+    services = db.execute(select(Service).order_by(Service.id).limit(2)).scalars().all()
+    if len(services) < 2:
+        pytest.skip("needs two services")
+    return services
+
+
+def counters(db, service):
+    db.refresh(service)
+    return service.views, service.leads, service.likes
+
+
+def test_flush_applies_every_delta_in_one_update(db, buffer, two_services):
+    first, second = two_services
+    before = [counters(db, service) for service in two_services]
+    buffer.add(first.id, views=3, leads=1)
+    buffer.add(second.id, views=1, likes=2)
+    buffer.add(first.id, likes=-1)
+    engagement.flush_engagement(db)
+    assert counters(db, first) == (before[0][0] + 3, before[0][1] + 1, max(before[0][2] - 1, 0))
+    assert counters(db, second) == (before[1][0] + 1, before[1][1], before[1][2] + 2)
+    assert buffer.stats()["pending_services"] == 0
+    assert buffer.flushed_rows == 2
+
+
+def test_flush_rescores_the_feed_rows(db, buffer, two_services):
+    service = two_services[0]
+    item = db.execute(
+        select(FeedItem).where(FeedItem.type == "service", FeedItem.entity_id == service.id)
+    ).scalar_one_or_none()
+    if item is None:
+        pytest.skip("service has no feed row")
+    score = item.score
+    buffer.add(service.id, views=100000, leads=1000)
+    engagement.flush_engagement(db)
+    db.refresh(item)
+    assert item.score > score
+
+
+def test_failed_flush_restores_the_deltas(db, buffer, two_services, monkeypatch):
+    service = two_services[0]
+    before = counters(db, service)
+
+    def fail(db, service_ids):
+        raise RuntimeError("feed unavailable")
+
+    monkeypatch.setattr(engagement, "rescore_feed_items", fail)
+    buffer.add(service.id, views=2)
+    with pytest.raises(RuntimeError):
+        engagement.flush_engagement(db)
+    assert counters(db, service) == before
+    assert buffer.failures == 1
+    assert buffer.drain() == {service.id: [2, 0, 0]}
+
+
+def test_buffer_cap_drops_views_but_not_likes(buffer, monkeypatch):
+    monkeypatch.setattr(settings, "ENGAGEMENT_MAX_PENDING", 1)
+    assert buffer.add(1, views=1)
+    assert not buffer.add(2, views=1)
+    assert buffer.add(1, views=1)
+    assert buffer.add(2, likes=1, capped=False)
+    assert buffer.stats()["dropped"] == 1
+    assert buffer.drain() == {1: [2, 0, 0], 2: [0, 0, 1]}
+
+
+def test_views_and_leads_count_once_per_client(client, buffer, two_services):
+    service_id = two_services[0].id
+    assert client.post(f"/services/{service_id}/view").json() == {"ok": True, "counted": True}
+    assert client.post(f"/services/{service_id}/view").json() == {"ok": True, "counted": False}
+    assert client.post(f"/services/{service_id}/lead").json() == {"ok": True, "counted": True}
+    assert client.post(f"/services/{service_id}/lead").json() == {"ok": True, "counted": False}
+    assert buffer.drain() == {service_id: [1, 1, 0]}
+
+
+def test_unknown_service_is_not_buffered(client, buffer):
+    assert client.post("/services/2147483647/view").status_code == 404
+    assert client.post("/services/2147483647/lead").status_code == 404
+    assert buffer.drain() == {}
+
+
+def test_repeated_view_does_not_raise_the_preference_again(signed_in, db, buffer, user, two_services):
+    service = two_services[0]
+    if not normalize_query(service.category or ""):
+        pytest.skip("service has no category")
+    for _ in range(3):
+        signed_in.post(f"/services/{service.id}/view")
+    row = db.get(UserPreference, user.id)
+    assert list(row.categories.values()) == [1.0]
+
+
+def test_likes_are_buffered_past_the_cap(signed_in, db, buffer, two_services, monkeypatch):
+    first, second = two_services
+    monkeypatch.setattr(settings, "ENGAGEMENT_MAX_PENDING", 1)
+    buffer.add(first.id, views=1)
+    assert signed_in.post(f"/services/{second.id}/like").json() == {"liked": True, "changed": True}
+    assert signed_in.post(f"/services/{second.id}/like").json() == {"liked": True, "changed": False}
+    assert buffer.drain() == {first.id: [1, 0, 0], second.id: [0, 0, 1]}
@@ -0,0 +1,84 @@
+import asyncio
+import csv
+import io
+import json
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from app.models import Service
+from app.settings import settings
+from app.streaming import export_response, export_slots, services_query
+
+
+@pytest.fixture
+def one_slot(monkeypatch):
+    monkeypatch.setattr(settings, "EXPORT_MAX_CONCURRENT", 1)
+    assert export_slots.active == 0
+    yield
+    assert export_slots.active == 0
+
+
+@pytest.fixture
+def company_id(db):
+    company_id = db.execute(
+        select(Service.company_id).group_by(Service.company_id).order_by(func.count().desc()).limit(1)
+    ).scalar()
+    if company_id is None:
+        pytest.skip("needs services")
+    return company_id
+
+
+@pytest.mark.parametrize("path", ["/services/export", "/companies/export"])
+def test_exports_require_a_user(client, path):
+    assert client.get(path).status_code == 401
+
+
+def test_ndjson_export_streams_every_row(signed_in, db, company_id, one_slot):
+    response = signed_in.get("/services/export", params={"company_id": company_id})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    want = db.execute(select(Service.id).where(Service.company_id == company_id).order_by(Service.id)).scalars().all()
+    assert [row["id"] for row in rows] == want
+
+
+def test_csv_export_has_a_header(signed_in, company_id, one_slot):
+    response = signed_in.get("/services/export", params={"company_id": company_id, "format": "csv"})
+    header, *rows = list(csv.reader(io.StringIO(response.text)))
+    assert header[:3] == ["id", "company_id", "title"]
+    assert rows and all(int(row[1]) == company_id for row in rows)
+
+
+def test_slot_is_taken_when_the_response_is_built(one_slot):
+    first = export_response(services_query(), "ndjson", "services")
+    with pytest.raises(HTTPException) as error:
+        export_response(services_query(), "ndjson", "services")
+    assert error.value.status_code == 503
+    # Corpo nunca iniciado: a tarefa de fundo devolve o slot, uma única vez
+    asyncio.run(first.background())
+    asyncio.run(first.background())
+    assert export_slots.active == 0
+
+
+async def read_body(response) -> bytes:
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+def test_slot_is_given_back_when_the_body_ends(engine, one_slot):
+    response = export_response(services_query().limit(3), "ndjson", "services")
+    assert len(asyncio.run(read_body(response)).splitlines()) == 3
+    assert export_slots.active == 0
+    asyncio.run(response.background())
+    assert export_slots.active == 0
+
+
+def test_busy_worker_answers_503(signed_in, one_slot):
+    assert export_slots.try_enter()
+    try:
+        response = signed_in.get("/companies/export")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "30"
+    finally:
+        export_slots.leave()
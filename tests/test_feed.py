@@ -0,0 +1,85 @@
+import pytest
+from sqlalchemy import select, tuple_
+
+from app.models import FeedItem
+
+LIMIT = 7
+PAGES = 3
+
+
+def expected(db, key, count):
+    rows = db.execute(
+        select(FeedItem.type, FeedItem.entity_id).order_by(key.desc(), FeedItem.id.desc()).limit(count)
+    ).all()
+    if len(rows) < count:
+        pytest.skip(f"needs {count} feed rows")
+    return [tuple(row) for row in rows]
+
+
+def walk(client, mode, pages=PAGES, **params):
+    served, cursor = [], None
+    for _ in range(pages):
+        response = client.get("/search/feed", params={
+            "mode": mode, "limit": LIMIT, **params, **({"cursor": cursor} if cursor else {}),
+        })
+        assert response.status_code == 200
+        body = response.json()
+        assert body["mode"] == mode
+        served.extend((item["type"], item["id"]) for item in body["items"])
+        cursor = body["next_page_info"]["cursor"]
+    return served, body
+
+
+@pytest.mark.parametrize("mode, key", [("recent", FeedItem.created_at), ("ranked", FeedItem.score)])
+def test_cursor_walk_follows_the_index_order(client, db, mode, key):
+    want = expected(db, key, LIMIT * PAGES)
+    served, _ = walk(client, mode)
+    assert served == want
+
+
+def test_ranked_items_carry_descending_scores(client, db):
+    expected(db, FeedItem.score, LIMIT * PAGES)
+    _, body = walk(client, "ranked", pages=1)
+    scores = [item["score"] for item in body["items"]]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_fields_keep_the_cursor_walk(client, db):
+    want = expected(db, FeedItem.created_at, LIMIT * PAGES)
+    served, body = walk(client, "recent", fields="title")
+    assert served == want
+    assert all(set(item) <= {"id", "type", "title"} for item in body["items"])
+
+
+def test_cursor_of_the_other_mode_is_rejected(client, db):
+    expected(db, FeedItem.created_at, LIMIT * PAGES)
+    _, body = walk(client, "recent", pages=1)
+    response = client.get("/search/feed", params={"mode": "ranked", "cursor": body["next_page_info"]["cursor"]})
+    assert response.status_code == 400
+
+
+def test_last_id_keeps_paging_the_recent_feed(client, db):
+    expected(db, FeedItem.created_at, LIMIT * PAGES)
+    first = client.get("/search/feed", params={"limit": LIMIT}).json()
+    last_id = first["next_page_info"]["last_id"]
+    assert last_id == first["items"][-1]["id"]
+    response = client.get("/search/feed", params={"limit": LIMIT, "last_id": last_id})
+    assert response.status_code == 200
+    assert response.headers["Deprecation"] == "true"
+    # Continua a seguir à linha mais recente com esse id (de qualquer tipo)
+    newest = db.execute(
+        select(FeedItem.created_at, FeedItem.id).where(FeedItem.entity_id == last_id)
+        .order_by(FeedItem.created_at.desc(), FeedItem.id.desc()).limit(1)
+    ).one()
+    want = db.execute(
+        select(FeedItem.type, FeedItem.entity_id)
+        .where(tuple_(FeedItem.created_at, FeedItem.id) < tuple_(*newest))
+        .order_by(FeedItem.created_at.desc(), FeedItem.id.desc()).limit(LIMIT)
+    ).all()
+    assert [(item["type"], item["id"]) for item in response.json()["items"]] == [tuple(row) for row in want]
+
+
+def test_unknown_last_id_serves_the_first_page(client, db):
+    want = expected(db, FeedItem.created_at, LIMIT)
+    response = client.get("/search/feed", params={"limit": LIMIT, "last_id": 2147483647})
+    assert [(item["type"], item["id"]) for item in response.json()["items"]] == want
@@ -0,0 +1,127 @@
+import io
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+from app.import_services import detect_format, import_services, read_records, validate_row
+from app.models import Company, Service
+from app.settings import settings
+
+MISSING_COMPANY_ID = 2**31 - 1
+
+
+def test_detect_format():
+    assert detect_format("servicos.CSV") == "csv"
+    assert detect_format("servicos.ndjson") == "jsonl"
+    assert detect_format("servicos.txt", "jsonl") == "jsonl"
+    with pytest.raises(ValueError):
+        detect_format("servicos.xlsx")
+    with pytest.raises(ValueError):
+        detect_format(None)
+
+
+def test_read_csv_records_with_line_numbers():
+    stream = io.StringIO('title,price\nLimpeza,100\n"Jardinagem\ncom poda",50\nCanalização,\n')
+    records = list(read_records(stream, "csv"))
+    assert [(line, record["title"]) for line, record, _ in records] == [
+        (2, "Limpeza"), (4, "Jardinagem\ncom poda"), (5, "Canalização"),
+    ]
+    assert all(error is None for _, _, error in records)
+
+
+def test_read_jsonl_records_reports_bad_lines():
+    stream = io.StringIO('{"title": "Limpeza"}\n\n{"title": \n[1, 2]\n{"title": "Pintura"}\n')
+    records = list(read_records(stream, "jsonl"))
+    assert [(line, record) for line, record, error in records if error is None] == [
+        (1, {"title": "Limpeza"}), (5, {"title": "Pintura"}),
+    ]
+    errors = [(line, error) for line, _, error in records if error is not None]
+    assert [line for line, _ in errors] == [3, 4]
+    assert errors[0][1].startswith("Invalid JSON")
+    assert errors[1][1] == "Invalid JSON: expected an object"
+
+
+def test_validate_row_cleans_values():
+    row = validate_row({"title": " Limpeza ", "price": "100.5", "tags": "casa, escritório,,", "category": ""}, 3)
+    assert row["company_id"] == 3
+    assert row["title"] == "Limpeza"
+    assert row["price"] == 100.5
+    assert row["tags"] == ["casa", "escritório"]
+    assert row["category"] is None
+    assert row["status"] == "Ativo"
+    assert row["is_promoted"] is False
+
+
+@pytest.mark.parametrize("record, message", [
+    ({"title": "Limpeza", "status": "Rascunho"}, "status: must be one of Ativo, Pausado"),
+    ({"title": "Limpeza", "price": "-1"}, "price: must be a non-negative number"),
+    ({"title": "x" * 1000}, "title: at most"),
+    ({"price": "10"}, "title"),
+    ({"title": "Limpeza", "price": "barato"}, "price"),
+])
+def test_validate_row_rejects(record, message):
+    with pytest.raises(ValueError) as error:
+        validate_row(record, 3)
+    assert message in str(error.value)
+
+
+@pytest.fixture
+def company_id(db):
+    company_id = db.execute(select(Company.id).order_by(Company.id).limit(1)).scalar()
+    if company_id is None:
+        pytest.skip("needs a company")
+    return company_id
+
+
+def count_services(db, title_prefix):
+    return db.execute(select(func.count()).where(Service.title.like(f"{title_prefix}%"))).scalar_one()
+
+
+def test_import_reports_errors_per_line(db, company_id):
+    lines = [
+        json.dumps({"title": "import-test ok 1", "price": 10}),
+        json.dumps({"title": "import-test bad status", "status": "Rascunho"}),
+        "not json",
+        json.dumps({"title": "import-test ok 2", "company_id": MISSING_COMPANY_ID}),
+        json.dumps({"title": "import-test ok 3", "tags": ["a", "b"]}),
+    ]
+    report = import_services(db, io.StringIO("\n".join(lines)), "jsonl", default_company_id=company_id)
+    assert report["imported"] == 2
+    assert report["failed"] == 3
+    assert [error["line"] for error in report["errors"]] == [2, 3, 4]
+    assert report["errors"][2]["error"] == f"company_id {MISSING_COMPANY_ID}: Company not found"
+    assert count_services(db, "import-test ok") == 2
+
+
+def test_failed_copy_falls_back_to_one_row_at_a_time(db, company_id, monkeypatch):
+    monkeypatch.setattr(settings, "IMPORT_BATCH_SIZE", 100)
+    stream = io.StringIO(
+        "company_id,title,price\n"
+        + "".join(f"{company_id},import-test row {n},{n}\n" for n in range(5))
+        # Aceite pelo pré-filtro (empresa "do utilizador"), rejeitado pela chave estrangeira
+        + f"{MISSING_COMPANY_ID},import-test orphan,1\n"
+        + "".join(f"{company_id},import-test row {n},{n}\n" for n in range(5, 10))
+    )
+    report = import_services(db, stream, "csv", owned_company_ids={company_id, MISSING_COMPANY_ID})
+    assert report["imported"] == 10
+    assert report["failed"] == 1
+    assert report["errors"][0]["line"] == 7
+    assert "foreign key" in report["errors"][0]["error"]
+    assert count_services(db, "import-test row") == 10
+    assert count_services(db, "import-test orphan") == 0
+
+
+def test_import_stops_at_row_limit(db, company_id):
+    stream = io.StringIO("".join(json.dumps({"title": f"import-test limit {n}"}) + "\n" for n in range(5)))
+    report = import_services(db, stream, "jsonl", default_company_id=company_id, max_rows=3)
+    assert report["imported"] == 3
+    assert report["stopped"].startswith("Row limit of 3 reached at line 4")
+    assert count_services(db, "import-test limit") == 3
+
+
+def test_import_stops_at_invalid_utf8(db, company_id):
+    raw = b"title\nimport-test utf8 ok\nimport-test \xff\n"
+    stream = io.TextIOWrapper(io.BytesIO(raw), encoding="utf-8")
+    report = import_services(db, stream, "csv", default_company_id=company_id)
+    assert report["stopped"] == "File is not valid UTF-8; the rest of the file was not read"
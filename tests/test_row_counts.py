@@ -0,0 +1,78 @@
+import io
+
+import pytest
+from sqlalchemy import delete, func, select, text, update
+
+from app.cache import count_cache
+from app.counts import exact_count
+from app.import_services import import_services
+from app.models import Company, CompanyPortfolio, RowCount, Service
+
+
+def counter(db, name):
+    return db.execute(select(func.sum(RowCount.value)).where(RowCount.name == name)).scalar_one()
+
+
+def rows(db, *where, model=Service):
+    return db.execute(select(func.count()).select_from(model).where(*where)).scalar_one()
+
+
+@pytest.fixture
+def company(db, user):
+    company = Company(name="row-counts test company", owner_id=user.id)
+    db.add(company)
+    db.flush()
+    return company
+
+
+def test_insert_and_delete_move_the_counter(db, company):
+    before = counter(db, "companies")
+    db.add(Company(name="row-counts test company 2", owner_id=company.owner_id))
+    db.flush()
+    assert counter(db, "companies") == before + 1
+    db.execute(delete(Company).where(Company.name == "row-counts test company 2"))
+    assert counter(db, "companies") == before
+
+
+def test_status_updates_move_the_active_counter(db, company):
+    db.add_all([Service(company_id=company.id, title=f"row-counts {n}", status="Pausado") for n in range(3)])
+    db.flush()
+    assert counter(db, "services") == rows(db)
+    assert counter(db, "services:active") == rows(db, Service.status == "Ativo")
+    before = counter(db, "services:active")
+    db.execute(update(Service).where(Service.company_id == company.id).values(status="Ativo"))
+    assert counter(db, "services:active") == before + 3
+    db.execute(delete(Service).where(Service.company_id == company.id, Service.title == "row-counts 0"))
+    assert counter(db, "services:active") == before + 2 == rows(db, Service.status == "Ativo")
+
+
+def test_copy_import_is_counted(db, company):
+    before = counter(db, "services")
+    stream = io.StringIO("title,status\n" + "".join(f"row-counts copy {n},Ativo\n" for n in range(10)))
+    assert import_services(db, stream, "csv", default_company_id=company.id)["imported"] == 10
+    assert counter(db, "services") == before + 10 == rows(db)
+    assert counter(db, "services:active") == rows(db, Service.status == "Ativo")
+
+
+def test_truncate_resets_the_counter(db):
+    if not counter(db, "company_portfolios"):
+        pytest.skip("needs portfolios")
+    db.execute(text("TRUNCATE company_portfolios"))
+    assert counter(db, "company_portfolios") == 0 == rows(db, model=CompanyPortfolio)
+
+
+def shards(db, name):
+    return dict(db.execute(select(RowCount.shard, RowCount.value).where(RowCount.name == name)).all())
+
+
+def test_statements_spread_over_shards_and_reads_sum_them(db, company):
+    count_cache.clear()
+    before, shards_before = exact_count(db, "companies"), shards(db, "companies")
+    for n in range(32):
+        db.execute(text("INSERT INTO companies (name, owner_id) VALUES (:name, :owner_id)"),
+                   {"name": f"row-counts shard {n}", "owner_id": company.owner_id})
+    count_cache.clear()
+    assert exact_count(db, "companies") == before + 32 == rows(db, model=Company)
+    count_cache.clear()
+    changed = [shard for shard, value in shards(db, "companies").items() if value != shards_before[shard]]
+    assert len(changed) > 1
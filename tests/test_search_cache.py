@@ -0,0 +1,43 @@
+import pytest
+
+from app import hooks
+from app.cache import TTLCache, search_facets_cache, search_results_cache
+from app.models import Service, User
+
+
+@pytest.fixture
+def caches():
+    search_results_cache.clear()
+    search_facets_cache.clear()
+    yield
+    search_results_cache.clear()
+    search_facets_cache.clear()
+
+
+def test_invalidate_drops_only_the_tagged_entries():
+    cache = TTLCache(maxsize=2)
+    cache.set("users", 1, tags={"users"})
+    cache.set("both", 2, tags={"users", "services"})
+    cache.invalidate("users")
+    assert cache.get("users") is None and cache.get("both") is None
+    cache.set("services", 3, tags={"services"})
+    cache.set("plain", 4)
+    cache.set("other", 5)  # evicts "services", and its tag with it
+    cache.invalidate("services")
+    assert (cache.get("plain"), cache.get("other")) == (4, 5)
+    assert cache._tagged == {}
+
+
+def test_user_write_keeps_facets_and_other_type_pages(client, caches):
+    response = client.get("/search/advanced", params={"q": "limpeza"})
+    assert response.status_code == 200
+    key = next(key for key in search_results_cache._data)
+    search_results_cache.set(("services page",), {}, tags={"services"})
+    hooks._invalidate_search(hooks._search_type(User()))
+    # A primeira página também lista utilizadores; as facetas e a página de serviços ficam
+    assert search_results_cache.get(key) is None
+    assert search_results_cache.get(("services page",)) == {}
+    assert len(search_facets_cache) == 1
+    hooks._invalidate_search(hooks._search_type(Service()))
+    assert len(search_facets_cache) == 0
+    assert search_results_cache.get(("services page",)) is None
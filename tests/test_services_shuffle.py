@@ -0,0 +1,113 @@
+import random
+
+import pytest
+from sqlalchemy import event, func, select
+
+from app.models import Service
+from app.pagination import decode_cursor, encode_cursor
+
+# Não divide o número de serviços: as páginas atravessam o ponto onde a ordem dá a volta
+LIMIT = 97
+
+
+def walk_by_cursor(client, seed):
+    ids, cursors = [], []
+    response = client.get("/services/", params={"seed": seed, "limit": LIMIT})
+    while True:
+        assert response.status_code == 200
+        assert response.headers["X-Shuffle-Seed"] == str(seed)
+        ids.extend(service["id"] for service in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids, cursors
+        cursors.append(decode_cursor(cursor))
+        response = client.get("/services/", params={"cursor": cursor, "limit": LIMIT})
+
+
+def walk_by_page(client, seed):
+    ids = []
+    page = 1
+    while True:
+        response = client.get("/services/", params={"seed": seed, "page": page, "limit": LIMIT})
+        assert response.status_code == 200
+        services = response.json()
+        if not services:
+            return ids
+        ids.extend(service["id"] for service in services)
+        page += 1
+
+
+def wrapping_seed(db):
+    """A seed whose starting point is past the smallest random_key, so the walk wraps around."""
+    smallest = db.execute(select(Service.random_key).order_by(Service.random_key).limit(1)).scalar()
+    for seed in range(1000):
+        if random.Random(seed).random() > smallest:
+            return seed
+    pytest.fail("no seed starts past the smallest random_key")
+
+
+@pytest.fixture
+def all_ids(db):
+    ids = set(db.execute(select(Service.id)).scalars())
+    if len(ids) <= LIMIT:
+        pytest.skip(f"needs more than {LIMIT} services")
+    return ids
+
+
+def test_cursor_walk_covers_every_service_once(client, db, all_ids):
+    seed = wrapping_seed(db)
+    ids, cursors = walk_by_cursor(client, seed)
+    assert len(ids) == len(set(ids))
+    assert set(ids) == all_ids
+    # A volta acontece a meio, num cursor, e não se desfaz
+    flags = [cursor["w"] for cursor in cursors]
+    assert True in flags and False in flags
+    assert flags == sorted(flags)
+    assert all(cursor["seed"] == seed for cursor in cursors)
+
+
+def test_page_walk_matches_cursor_walk(client, db, all_ids):
+    seed = wrapping_seed(db)
+    by_page = walk_by_page(client, seed)
+    assert len(by_page) == len(set(by_page))
+    assert set(by_page) == all_ids
+    by_cursor, _ = walk_by_cursor(client, seed)
+    assert by_page == by_cursor
+
+
+def test_deep_page_counts_at_most_the_offset(client, db, all_ids):
+    seed = wrapping_seed(db)
+    start = random.Random(seed).random()
+    first_arc = db.execute(select(func.count()).where(Service.random_key >= start)).scalar_one()
+    page = first_arc // LIMIT + 2  # já no segundo arco
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.bind, "before_cursor_execute", record)
+    try:
+        response = client.get("/services/", params={"seed": seed, "page": page, "limit": LIMIT})
+    finally:
+        event.remove(db.bind, "before_cursor_execute", record)
+    assert response.status_code == 200
+    counts = [statement for statement in statements if "count(" in statement]
+    assert counts and all("LIMIT" in statement for statement in counts)
+
+
+def test_same_seed_same_order(client):
+    first = client.get("/services/", params={"seed": 7, "limit": 20}).json()
+    again = client.get("/services/", params={"seed": 7, "limit": 20}).json()
+    assert [service["id"] for service in first] == [service["id"] for service in again]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    encode_cursor([1, 2]),
+    encode_cursor({"seed": 1, "k": 0.5, "i": 3}),
+    encode_cursor({"seed": 1, "k": "0.5", "i": 3, "w": False}),
+])
+def test_invalid_cursor_is_rejected(client, cursor):
+    response = client.get("/services/", params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
@@ -0,0 +1,96 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app import storage
+from app.models import UploadBlob
+from app.settings import settings
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "UPLOADS_DIR", str(tmp_path))
+    monkeypatch.setattr(storage, "BLOBS_DIR", str(tmp_path / "blobs"))
+    return tmp_path
+
+
+def blob(store, data: bytes, age: timedelta) -> tuple[str, str]:
+    """A stored file last written ``age`` ago, with one variant; returns ``(url, path)``."""
+    source = store / "source.png"
+    source.write_bytes(data)
+    url = storage.store_file(str(source))
+    path = os.path.join(store, *url[len("/uploads/"):].split("/"))
+    digest = os.path.basename(path).split(".")[0]
+    variant = os.path.join(os.path.dirname(path), f"{digest}.3f2a9c1e07b4.thumb.webp")
+    open(variant, "wb").close()
+    when = (datetime.utcnow() - age).timestamp()
+    os.utime(path, (when, when))
+    return url, path
+
+
+def release(db, url: str, age: timedelta) -> None:
+    db.add(UploadBlob(url=url, refs=0, released_at=datetime.utcnow() - age))
+    db.flush()
+
+
+def rows(db, url: str) -> list[UploadBlob]:
+    return db.execute(select(UploadBlob).where(UploadBlob.url == url)).scalars().all()
+
+
+def test_store_file_is_content_addressed(store):
+    url, path = blob(store, PNG, timedelta(0))
+    assert url == storage.blob_url(hashlib.sha256(PNG).hexdigest(), ".png")
+    assert storage.store_file(str(store / "source.png")) == url
+    assert [name for name in os.listdir(store / "blobs") if name.startswith(".upload.")] == []
+
+
+def test_gc_removes_released_files_and_variants(db, store):
+    grace = timedelta(seconds=settings.UPLOAD_GC_GRACE_SECONDS)
+    url, path = blob(store, PNG, 2 * grace)
+    release(db, url, 2 * grace)
+    storage.collect_garbage(db)
+    assert os.listdir(os.path.dirname(path)) == []
+    assert rows(db, url) == []
+
+
+def test_gc_keeps_files_uploaded_again(db, store):
+    grace = timedelta(seconds=settings.UPLOAD_GC_GRACE_SECONDS)
+    url, path = blob(store, PNG, timedelta(0))
+    release(db, url, 2 * grace)
+    storage.collect_garbage(db)
+    assert os.path.exists(path)
+    assert len(os.listdir(os.path.dirname(path))) == 2
+    # A linha volta: sem a referência, é candidata outra vez depois do prazo
+    assert [row.refs for row in rows(db, url)] == [0]
+
+
+def test_gc_waits_for_the_grace_period(db, store):
+    grace = timedelta(seconds=settings.UPLOAD_GC_GRACE_SECONDS)
+    url, path = blob(store, PNG, 2 * grace)
+    release(db, url, grace / 2)
+    storage.collect_garbage(db)
+    assert os.path.exists(path)
+    assert len(rows(db, url)) == 1
+
+
+def test_commit_blob_restores_a_file_removed_after_utime(store, monkeypatch):
+    url, path = blob(store, PNG, timedelta(0))
+    utime = os.utime
+
+    def utime_then_collected(target, *args, **kwargs):
+        utime(target, *args, **kwargs)
+        os.remove(target)  # limpeza entre o utime e a remoção da cópia temporária
+
+    monkeypatch.setattr(storage.os, "utime", utime_then_collected)
+    out, temp_path = storage._temp_file()
+    out.write(PNG)
+    storage._finish(out)
+    assert storage._commit_blob(temp_path, hashlib.sha256(PNG).hexdigest(), ".png") == url
+    with open(path, "rb") as f:
+        assert f.read() == PNG
+    assert not os.path.exists(temp_path)